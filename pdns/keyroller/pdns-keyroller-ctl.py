@@ -1,17 +1,49 @@
 #!/usr/bin/env python3
+import time
+_start = time.perf_counter()
+
 import argparse
 import logging
 import sys
-from pdnskeyroller import domainstate, domainconfig, keyrollerdomain
-from pdnskeyroller.config import KeyrollerConfig
-from pdnskeyroller.prepublishkeyroll import PrePublishKeyRoll
-from pdnsapi.api import PDNSApi
-from datetime import datetime, timedelta
-import random
+
+# Everything else is imported once we know what to do, so e.g. --help and usage errors stay fast. The API client
+# (requests) and the YAML parser are needed by every subcommand and make up most of the startup time.
 
 logger = logging.getLogger('pdns-keyroller')
 
+
+class Timing:
+    """
+    Records how long each phase of a run took, for --timing
+    """
+
+    def __init__(self, start):
+        self._last = start
+        self.start = start
+        self.phases = []
+        self.first_request = None
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def request_hook(self, duration, **kwargs):
+        if self.first_request is None:
+            self.first_request = time.perf_counter() - duration - self.start
+
+    def report(self):
+        for phase, duration in self.phases:
+            sys.stderr.write('{:<24} {:8.1f} ms\n'.format(phase, duration * 1000))
+        if self.first_request is not None:
+            sys.stderr.write('{:<24} {:8.1f} ms\n'.format('until first API request', self.first_request * 1000))
+        sys.stderr.write('{:<24} {:8.1f} ms\n'.format('total', (time.perf_counter() - self.start) * 1000))
+
+
 def display_keyrollerdomain_infos(zone, api):
+    from datetime import datetime, timedelta
+    from pdnskeyroller import keyrollerdomain
+
     zoneconf = keyrollerdomain.KeyrollerDomain(zone, api)
     if zoneconf.state :
         if zoneconf.state.is_rolling:
@@ -30,83 +62,9 @@ def display_keyrollerdomain_infos(zone, api):
     else :
         logger.info('{} is not rolling'.format(zone))
 
-if __name__ == '__main__':
-    argp = argparse.ArgumentParser(
-        prog='pdns-keyroller-ctl', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-        description='PowerDNS DNSSEC key-roller')
-    argp.add_argument('--config', '-c', metavar='PATH', type=str, default='/etc/powerdns/pdns-keyroller.conf',
-                      help='Load this configuration file')
-    argp.add_argument('--baseurl', '-b', required=False, metavar='BASEURL', help='The base-URL for the authoritative webserver'
-                      'Overrides the one set in the config-file')
-    argp.add_argument('--apikey', '-k', required=False, metavar='API-KEY', help='The key needed to access the API')
-    argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
-    argp.set_defaults(command='none')
-
-    sub_parsers = argp.add_subparsers()
-
-    configs_parser = sub_parsers.add_parser('configs', help='Lists configured domains')
-    configs_parser.set_defaults(command='configs', action='list')
-
-    configs_subparsers = configs_parser.add_subparsers()
-
-    configs_show_parser = configs_subparsers.add_parser('show', help='Show the roll configuration of the current domain')
-    configs_show_parser.set_defaults(action='show')
-    configs_show_parser.add_argument('domain', metavar='DOMAIN')
-
-    configs_roll_parser = configs_subparsers.add_parser('roll', help='Setup the domain for autoroll')
-    configs_roll_parser.set_defaults(action='roll')
-    configs_roll_parser.add_argument('domain', metavar='DOMAIN')
-
-    configs_roll_parser.add_argument('--force', '-f', required=False, default=False, action="store_true", help='Force creation even if a configuration already exists')
-    configs_roll_parser.add_argument('--ksk-frequency', required=False)
-    configs_roll_parser.add_argument('--ksk-algo', required=False)
-    configs_roll_parser.add_argument('--zsk-algo', required=False)
-    configs_roll_parser.add_argument('--zsk-frequency', required=False)
-
-    configs_list_parser = configs_subparsers.add_parser('list', help='List all configured domains')
-    configs_list_parser.set_defaults(action='list')
-
-
-
-    # roll
-    roll_parser = sub_parsers.add_parser('roll', help='Manipulate current rolls')
-    roll_parser.set_defaults(command='roll', action='waiting')
-
-    roll_subparsers = roll_parser.add_subparsers()
-
-    roll_waiting_parser = roll_subparsers.add_parser('waiting', help='List waiting zones (KSK rolls waiting for DS change)')
-    roll_waiting_parser.set_defaults(action='waiting')
-
-    roll_step_parser = roll_subparsers.add_parser('step', help='Step waiting roll')
-    roll_step_parser.set_defaults(action='step')
-
-    roll_step_parser.add_argument('domain', metavar='DOMAIN')
-    roll_step_parser.add_argument('ttl', metavar='TTL')
-
-    arguments = argp.parse_args()
-
-    if arguments.verbose:
-        if arguments.verbose == 1:
-            logging.basicConfig(level=logging.INFO)
-        else:
-            logging.basicConfig(level=logging.DEBUG)
-
-    config = KeyrollerConfig(arguments.config)
-    api_config = config.api()
-    try:
-        if arguments.baseurl:
-            api_config['baseurl'] = arguments.baseurl
-        if arguments.apikey:
-            api_config['apikey'] = arguments.apikey
-        api = PDNSApi(**api_config)
-    except ConnectionError as e:
-        logger.error("Unable to connect to PowerDNS: {}".format(e))
-        sys.exit(1)
-
-    if arguments.command == 'none':
-        argp.print_help()
-        sys.exit(1)
 
+def run_command(arguments, config, api, store=None):
+    # Every branch imports only what it uses, e.g. 'roll due' with a state_db needs none of the roll logic
     if arguments.command == 'configs':
         if arguments.action == 'list':
             for zone in api.get_zones():
@@ -118,6 +76,7 @@ if __name__ == '__main__':
                 except Exception as e:
                     logger.error("Unable to get config for domain {}: {}".format(zone.id, e))
         if arguments.action == 'show':
+            from pdnskeyroller import domainconfig
             try:
                 domaincfg = domainconfig.from_api(arguments.domain, api)
                 logger.info(
@@ -130,10 +89,11 @@ if __name__ == '__main__':
                 display_keyrollerdomain_infos(arguments.domain, api)
             except FileNotFoundError:
                 logger.error("{} is not under automatic keyroll".format(arguments.domain))
-            except ConnectionError:
+            except ConnectionError as e:
+                # The API is no longer checked up front, so this can also be an unreachable server
                 logger.error(
-                    'No such domain {}'.format(
-                        arguments.domain
+                    'No such domain {}: {}'.format(
+                        arguments.domain, e
                     )
                 )
             except Exception as e:
@@ -141,6 +101,7 @@ if __name__ == '__main__':
 
 
         if arguments.action == 'roll':
+            from pdnskeyroller import domainconfig
             docreate = False
             try:
                 domaincfg = domainconfig.from_api(arguments.domain, api)
@@ -154,10 +115,10 @@ if __name__ == '__main__':
                     docreate = True
             except FileNotFoundError:
                 docreate = True
-            except ConnectionError:
+            except ConnectionError as e:
                 logger.error(
-                    'No such domain {}'.format(
-                        arguments.domain
+                    'No such domain {}: {}'.format(
+                        arguments.domain, e
                     )
                 )
 
@@ -172,7 +133,7 @@ if __name__ == '__main__':
                         domaincfg.zsk_frequency = arguments.zsk_frequency
                     if arguments.zsk_algo:
                         domaincfg.zsk_algo = arguments.zsk_algo
-                    domainconfig.to_api(arguments.domain, api, domaincfg)
+                    domainconfig.to_api(arguments.domain, api, domaincfg, store=store)
                     logger.info(
                         'Successfully created configuration for {}: KSK {}, ZSK {}'.format(
                             arguments.domain,
@@ -188,6 +149,7 @@ if __name__ == '__main__':
                     )
     if arguments.command == 'roll':
         if arguments.action == 'waiting':
+            from pdnskeyroller import keyrollerdomain
             for zone in api.get_zones():
                 try:
                     zoneconf = keyrollerdomain.KeyrollerDomain(zone.id, api)
@@ -195,9 +157,33 @@ if __name__ == '__main__':
                         logger.info('{} is waiting for DS replacement'.format(zone.id))
                 except FileNotFoundError:
                     continue
+        elif arguments.action == 'due':
+            from datetime import datetime, timedelta
+            from pytimeparse.timeparse import timeparse
+            within = timeparse(arguments.within)
+            if within is None:
+                logger.error('Unable to parse {}'.format(arguments.within))
+                return
+            before = datetime.now() + timedelta(seconds=within)
+            if store is not None:
+                due = store.due(before)
+            else:
+                from pdnskeyroller import keyrollerdomain
+                due = []
+                for zone in api.get_zones():
+                    try:
+                        when = keyrollerdomain.KeyrollerDomain(zone.id, api).next_action_datetime
+                    except FileNotFoundError:
+                        continue
+                    if when is not None and when <= before:
+                        due.append((zone.id, when))
+                due.sort(key=lambda d: d[1])
+            for zone, when in due:
+                logger.info('{} is due {}'.format(zone, when))
         elif arguments.action == 'step':
+            from pdnskeyroller import keyrollerdomain
             try:
-                zoneconf = keyrollerdomain.KeyrollerDomain(arguments.domain, api)
+                zoneconf = keyrollerdomain.KeyrollerDomain(arguments.domain, api, store=store)
                 if zoneconf.state and zoneconf.state.current_roll.is_waiting_ds():
                     zoneconf.step(force=True, customttl=int(arguments.ttl))
                     logger.info(
@@ -213,3 +199,109 @@ if __name__ == '__main__':
                         arguments.domain
                     )
                 )
+
+if __name__ == '__main__':
+    argp = argparse.ArgumentParser(
+        prog='pdns-keyroller-ctl', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='PowerDNS DNSSEC key-roller')
+    argp.add_argument('--config', '-c', metavar='PATH', type=str, default='/etc/powerdns/pdns-keyroller.conf',
+                      help='Load this configuration file')
+    argp.add_argument('--baseurl', '-b', required=False, metavar='BASEURL', help='The base-URL for the authoritative webserver'
+                      'Overrides the one set in the config-file')
+    argp.add_argument('--apikey', '-k', required=False, metavar='API-KEY', help='The key needed to access the API')
+    argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
+    argp.add_argument('--timing', action='store_true', default=False,
+                      help='Print the time spent on imports, setup and the command to stderr')
+    argp.set_defaults(command='none')
+
+    sub_parsers = argp.add_subparsers()
+
+    configs_parser = sub_parsers.add_parser('configs', help='Lists configured domains')
+    configs_parser.set_defaults(command='configs', action='list')
+
+    configs_subparsers = configs_parser.add_subparsers()
+
+    configs_show_parser = configs_subparsers.add_parser('show', help='Show the roll configuration of the current domain')
+    configs_show_parser.set_defaults(action='show')
+    configs_show_parser.add_argument('domain', metavar='DOMAIN')
+
+    configs_roll_parser = configs_subparsers.add_parser('roll', help='Setup the domain for autoroll')
+    configs_roll_parser.set_defaults(action='roll')
+    configs_roll_parser.add_argument('domain', metavar='DOMAIN')
+
+    configs_roll_parser.add_argument('--force', '-f', required=False, default=False, action="store_true", help='Force creation even if a configuration already exists')
+    configs_roll_parser.add_argument('--ksk-frequency', required=False)
+    configs_roll_parser.add_argument('--ksk-algo', required=False)
+    configs_roll_parser.add_argument('--zsk-algo', required=False)
+    configs_roll_parser.add_argument('--zsk-frequency', required=False)
+
+    configs_list_parser = configs_subparsers.add_parser('list', help='List all configured domains')
+    configs_list_parser.set_defaults(action='list')
+
+
+
+    # roll
+    roll_parser = sub_parsers.add_parser('roll', help='Manipulate current rolls')
+    roll_parser.set_defaults(command='roll', action='waiting')
+
+    roll_subparsers = roll_parser.add_subparsers()
+
+    roll_waiting_parser = roll_subparsers.add_parser('waiting', help='List waiting zones (KSK rolls waiting for DS change)')
+    roll_waiting_parser.set_defaults(action='waiting')
+
+    roll_due_parser = roll_subparsers.add_parser('due', help='List the zones that are due for a roll or a step')
+    roll_due_parser.set_defaults(action='due')
+    roll_due_parser.add_argument('--within', metavar='DURATION', default='0s',
+                                 help='Also list the zones that become due within this time')
+
+    roll_step_parser = roll_subparsers.add_parser(
+        'step', help='Step waiting roll. A resident pdns-keyroller notices the step on its next reload, or right away '
+                     'on SIGHUP')
+    roll_step_parser.set_defaults(action='step')
+
+    roll_step_parser.add_argument('domain', metavar='DOMAIN')
+    roll_step_parser.add_argument('ttl', metavar='TTL')
+
+    timing = Timing(_start)
+    arguments = argp.parse_args()
+    timing.mark('startup and arguments')
+
+    if arguments.verbose:
+        if arguments.verbose == 1:
+            logging.basicConfig(level=logging.INFO)
+        else:
+            logging.basicConfig(level=logging.DEBUG)
+
+    if arguments.command == 'none':
+        argp.print_help()
+        sys.exit(1)
+
+    from pdnskeyroller.config import KeyrollerConfig
+    from pdnsapi.api import PDNSApi
+    timing.mark('imports')
+
+    config = KeyrollerConfig(arguments.config)
+    api_config = config.api()
+    if arguments.baseurl:
+        api_config['baseurl'] = arguments.baseurl
+    if arguments.apikey:
+        api_config['apikey'] = arguments.apikey
+    # Every command starts with a request, that request tells us soon enough whether the API is reachable
+    api = PDNSApi(validate=False, **api_config)
+    if arguments.timing:
+        api.metrics.add_hook(timing.request_hook)
+    store = None
+    if config.keyroller()['state_db']:
+        from pdnskeyroller.statestore import StateStore
+        store = StateStore(config.keyroller()['state_db'])
+    timing.mark('config and API setup')
+
+    try:
+        run_command(arguments, config, api, store)
+    except ConnectionError as e:
+        logger.error("Unable to connect to PowerDNS: {}".format(e))
+        sys.exit(1)
+    finally:
+        timing.mark('command')
+        if arguments.timing:
+            timing.report()
@@ -2,6 +2,7 @@
 import argparse
 import logging
 import pdnskeyroller.daemon
+import signal
 import sys
 import traceback
 
@@ -14,6 +15,8 @@ if __name__ == '__main__':
     argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
     argp.add_argument('--config', '-c', metavar='PATH', type=str, default='/etc/powerdns/pdns-keyroller.conf',
                       help='Load this configuration file')
+    argp.add_argument('--resident', action='store_true', default=False,
+                      help='Keep running and act on every domain when it is due, instead of running once')
 
     arguments = argp.parse_args()
 
@@ -25,13 +28,22 @@ if __name__ == '__main__':
 
     d = None
     try:
-        d = pdnskeyroller.daemon.Daemon(arguments.config)
+        # A single run has no reloads to pick up metadata changes the state_db does not know about, so it reads all zones
+        d = pdnskeyroller.daemon.Daemon(arguments.config, full_load=not arguments.resident)
     except ConnectionError as e:
         logger.fatal('Unable to start: {}'.format(e))
         sys.exit(1)
 
+    if arguments.resident:
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: d.stop())
+        signal.signal(signal.SIGHUP, lambda signum, frame: d.request_reload())
+
     try:
-        d.run()
+        if arguments.resident:
+            d.run_forever()
+        else:
+            d.run()
     except Exception as e:
         print(traceback.extract_tb(e))
         logger.error("Unable to run: {}".format(e))
@@ -1,15 +1,36 @@
+import io
 import re
+import codecs
+import time
 import logging
 import urllib.parse
 import requests
+import requests.adapters
 
 import pdnsapi.cryptokey
 from pdnsapi.cryptokey import CryptoKey
-from pdnsapi.zone import Zone
+from pdnsapi.zone import Zone, RRSet
 from pdnsapi.metadata import ZoneMetadata
 
 logger = logging.getLogger(__name__)
 
+_LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+class HTTPStatusError(ConnectionError):
+    """
+    Raised when the API answered with an HTTP error status. Like all other failed requests, this is a
+    :class:`ConnectionError`.
+    """
+
+    def __init__(self, message, status_code):
+        """
+        :param str message: The error message
+        :param int status_code: The HTTP status code of the response
+        """
+        super().__init__(message)
+        self.status_code = status_code
+
 
 # FIXME: clients should not be doing this escaping. We need to switch this to the appropriate zone ID lookup API.
 def _sanitize_dnsname(name):
@@ -32,18 +53,31 @@ class PDNSApi:
     """
     A wrapper-class that connects to the PowerDNS REST API to perform data manipulations
 
-    TODO: We should probably try to do some caching
+    Responses for cryptokeys, zones and zone metadata can optionally be cached (see the `cache_ttl` parameter). Entries
+    for a zone are dropped whenever this client changes that zone. Note that cached objects are shared between callers.
     """
 
-    def __init__(self, apikey, version=1, baseurl='http://localhost:8081', server='localhost', timeout=2):
+    def __init__(self, apikey, version=1, baseurl='http://localhost:8081', server='localhost', timeout=2,
+                 connect_timeout=None, pool_connections=1, pool_maxsize=10, trust_env=None, cache_ttl=0,
+                 cache_size=1024, metrics=None, validate=True):
         """
         :param apikey: The API Key needed to access the API (`api-key` setting)
         :param version: The version of the API used, only 1 is supported at the moment
         :param baseurl: The URL where the lives, without the `/api....`
         :param server: The name of the server, 'localhost' by default. Use this when connecting to the API through e.g.
                        pdnscontrol or zone-control
-        :param timeout: The timeout in seconds for a request
-        :raises: ConnectionError when the API is not reachable
+        :param timeout: The (read) timeout in seconds for a request
+        :param connect_timeout: The timeout in seconds to establish a connection, defaults to `timeout`
+        :param pool_connections: The number of connection pools (one per host) to keep around
+        :param pool_maxsize: The maximum number of keep-alive connections kept open to a single host
+        :param trust_env: Whether to look at the environment for proxy settings and .netrc credentials. When None, this
+                          is skipped for loopback URLs, saving a lookup for every request
+        :param cache_ttl: The number of seconds to cache responses for, 0 disables the cache
+        :param cache_size: The maximum number of cached responses
+        :param metrics: A :class:`pdnsapi.metrics.ApiMetrics` to record requests in, a new one is created when None
+        :param validate: Whether to check that the API is reachable right away. When False, no request is made until the
+                         first call and an unreachable API is only noticed then
+        :raises: ConnectionError when `validate` is set and the API is not reachable
         """
         api_suffix = {
             0: '',
@@ -55,40 +89,110 @@ class PDNSApi:
         if apikey is None:
             raise Exception('apikey may not be None!')
         self.apikey = apikey
-        self.timeout = timeout
+        # The config file hands these to us as strings
+        self.timeout = float(timeout)
+        self.connect_timeout = float(connect_timeout) if connect_timeout is not None else self.timeout
+        self.pool_connections = int(pool_connections)
+        self.pool_maxsize = int(pool_maxsize)
+        if trust_env is None:
+            trust_env = urllib.parse.urlparse(baseurl).hostname not in _LOOPBACK_HOSTS
+        self.trust_env = bool(trust_env)
+        # The helper modules are imported where they are used, so importing this module stays cheap
+        from pdnsapi.metrics import ApiMetrics
+        self.metrics = metrics if metrics is not None else ApiMetrics()
+        self.cache = None
+        if float(cache_ttl) > 0:
+            from pdnsapi.cache import ResponseCache
+            self.cache = ResponseCache(maxsize=cache_size, ttl=cache_ttl)
 
         # needed for __repr__
         self._version = version
         self._baseurl = baseurl
         self._server = server
 
-        # Test the API, raises in _do_request
-        self._do_request('', 'GET')
+        self._session = self._make_session()
+
+        if validate:
+            # Test the API, raises in _do_request
+            self._do_request('', 'GET')
 
     def __repr__(self):
-        return '{}.PDNSApi(apikey="{}", version={}, baseurl="{}", server="{}", timeout={})'.format(
-            __name__,
-            self.apikey,
-            self._version,
-            self._baseurl,
-            self._server,
-            self.timeout
-        )
+        return '{}.PDNSApi(apikey="{}", version={}, baseurl="{}", server="{}", timeout={}, connect_timeout={}, ' \
+               'pool_connections={}, pool_maxsize={}, trust_env={}, cache_ttl={}, cache_size={})'.format(
+                   __name__,
+                   self.apikey,
+                   self._version,
+                   self._baseurl,
+                   self._server,
+                   self.timeout,
+                   self.connect_timeout,
+                   self.pool_connections,
+                   self.pool_maxsize,
+                   self.trust_env,
+                   self.cache.ttl if self.cache else 0,
+                   self.cache.maxsize if self.cache else 1024
+               )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _make_session(self):
+        """
+        Creates the :class:`requests.Session` used for all requests. Connections to the webserver are kept alive and
+        pooled, so subsequent requests do not pay for the TCP (and TLS) setup.
+
+        :return: The session
+        :rtype: requests.Session
+        """
+        session = requests.Session()
+        session.trust_env = self.trust_env
+        session.headers.update({
+            'Accept': 'application/json',
+            'X-API-Key': self.apikey,
+        })
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_connections,
+                                                pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        """
+        Closes all pooled connections to the API
+        """
+        self._session.close()
+
+    def _cache_get(self, zone, resource, kind=''):
+        if self.cache is None:
+            return False, None
+        return self.cache.get(_sanitize_dnsname(zone), resource, kind)
 
-    def _do_request(self, uri, method, data=None):
+    def _cache_put(self, zone, resource, kind, value):
+        if self.cache is not None:
+            self.cache.put(_sanitize_dnsname(zone), resource, kind, value)
+
+    def _invalidate(self, zone):
+        """
+        Drops all cached responses for `zone`, must be called after every change to the zone
+        """
+        if self.cache is not None:
+            self.cache.invalidate_zone(_sanitize_dnsname(zone))
+
+    def _do_request(self, uri, method, data=None, params=None):
         """
         Does the actual API call.
 
         :param uri: Sub-path for the request, e.g. '/zones'
         :param method: HTTP method to use
         :param data: dict or list of data to send along with the request
+        :param params: dict of query parameters
         :return: a tuple containing the HTTP status code and the JSON response in Python format (i.e. list/dict)
         :rtype: tuple(int, str)
         """
-        headers = {
-            'Accept': 'application/json',
-            'X-API-Key': self.apikey,
-        }
+        headers = {}
 
         full_url = self.url + uri
 
@@ -98,31 +202,108 @@ class PDNSApi:
             if method.upper() != 'GET':
                 headers.update({'Content-Type': 'application/json'})
 
-        logger.debug('Attempting {} request to {} with data: {}'.format(method, full_url, data))
+        logger.debug('Attempting %s request to %s with data: %s', method, full_url, data)
 
         ret = None
+        res = None
+        start = time.monotonic()
         try:
-            res = requests.request(method, full_url, headers=headers, json=data)
+            res = self._session.request(method, full_url, headers=headers, json=data, params=params,
+                                        timeout=(self.connect_timeout, self.timeout))
             try:
                 ret = res.json()
             except ValueError:
                 # We don't care that the response was empty
                 pass
             res.raise_for_status()
-            logger.debug("Success! Got a {} response with data: {}".format(res.status_code, ret))
-            return res.status_code, ret
         except requests.ConnectionError as e:
-            logger.debug("Got a Connection error: {}".format(str(e)))
+            self._observe(method, uri, start, res, e)
+            logger.debug("Got a Connection error: %s", e)
             raise ConnectionError("Unable to connect to {}: {}".format(full_url, e))
         except requests.HTTPError as e:
-            logger.debug("Got an HTTP {} Error: {}".format(e.response.status_code, ret))
-            raise ConnectionError("HTTP error code {} received for {}: {}".format(
-                e.response.status_code, e.request.url, ret.get('error', ret)))
+            self._observe(method, uri, start, res, e)
+            logger.debug("Got an HTTP %s Error: %s", e.response.status_code, ret)
+            raise HTTPStatusError("HTTP error code {} received for {}: {}".format(
+                e.response.status_code, e.request.url, ret.get('error', ret)), e.response.status_code)
         except Exception as e:
+            self._observe(method, uri, start, res, e)
             msg = "Error doing {} request to {}: {}".format(method, full_url, e)
             logger.debug(msg)
             raise ConnectionError(msg)
 
+        # Outside of the try, an exception raised by a metrics hook is not a failed request
+        self._observe(method, uri, start, res)
+        logger.debug("Success! Got a %s response with data: %s", res.status_code, ret)
+        return res.status_code, ret
+
+    def _observe(self, method, uri, start, res=None, exception=None, bytes_in=None):
+        """
+        Records a finished request in :attr:`metrics`
+
+        :param str method: The HTTP method
+        :param str uri: Sub-path of the request
+        :param float start: The :func:`time.monotonic` value from when the request started
+        :param requests.Response res: The response, if any
+        :param Exception exception: The exception raised during the request, if any
+        :param int bytes_in: The size of the response body, read from `res` when None
+        """
+        from pdnsapi.metrics import endpoint_template, error_class
+        status = None
+        bytes_out = 0
+        if res is not None:
+            status = res.status_code
+            body = res.request.body
+            bytes_out = len(body) if body else 0
+            if bytes_in is None:
+                bytes_in = len(res.content)
+        self.metrics.observe(method, endpoint_template(uri), status, time.monotonic() - start, bytes_out,
+                             bytes_in or 0, error_class(status, exception))
+
+    def _do_stream_request(self, uri, params=None, accept=None):
+        """
+        Does a GET request without reading the response body, which must be consumed by the caller from
+        :meth:`requests.Response.iter_content`. The caller is responsible for closing the response.
+
+        :param uri: Sub-path for the request, e.g. '/zones'
+        :param params: dict of query parameters
+        :param accept: The media type to ask for, JSON when None
+        :return: The response
+        :rtype: requests.Response
+        """
+        full_url = self.url + uri
+        logger.debug('Attempting streaming GET request to %s with params: %s', full_url, params)
+
+        headers = {'Accept-Encoding': 'gzip'}
+        if accept is not None:
+            headers['Accept'] = accept
+
+        start = time.monotonic()
+        try:
+            res = self._session.get(full_url, params=params, headers=headers, stream=True,
+                                    timeout=(self.connect_timeout, self.timeout))
+        except requests.ConnectionError as e:
+            self._observe('GET', uri, start, exception=e)
+            logger.debug("Got a Connection error: %s", e)
+            raise ConnectionError("Unable to connect to {}: {}".format(full_url, e))
+        except Exception as e:
+            self._observe('GET', uri, start, exception=e)
+            msg = "Error doing GET request to {}: {}".format(full_url, e)
+            logger.debug(msg)
+            raise ConnectionError(msg)
+
+        if res.status_code >= 400:
+            try:
+                ret = res.json()
+            except ValueError:
+                ret = {}
+            finally:
+                res.close()
+            self._observe('GET', uri, start, res)
+            logger.debug("Got an HTTP %s Error: %s", res.status_code, ret)
+            raise HTTPStatusError("HTTP error code {} received for {}: {}".format(
+                res.status_code, res.url, ret.get('error', ret)), res.status_code)
+        return res
+
     def get_cryptokeys(self, zone):
         """
         Get all CryptoKeys for `zone`
@@ -131,6 +312,10 @@ class PDNSApi:
         :return: All the cryptokeys for the zone
         :rtype: list(CryptoKey)
         """
+        hit, cryptokeys = self._cache_get(zone, 'cryptokeys')
+        if hit:
+            return list(cryptokeys)
+
         code, resp = self._do_request('/zones/{}/cryptokeys'.format(_sanitize_dnsname(zone)),
                                       'GET')
 
@@ -139,7 +324,8 @@ class PDNSApi:
             for k in resp:
                 k.pop('type')
                 cryptokeys.append(CryptoKey(**k))
-            return cryptokeys
+            self._cache_put(zone, 'cryptokeys', '', cryptokeys)
+            return list(cryptokeys)
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
@@ -160,16 +346,22 @@ class PDNSApi:
         if keyid == -1:
             raise Exception("cryptokey is not a CryptoKey, nor a str or int")
 
+        hit, key = self._cache_get(zone, 'cryptokey', str(keyid))
+        if hit:
+            return key
+
         code, resp = self._do_request('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
                                       'GET')
 
         if code == 200:
             resp.pop('type')
-            return CryptoKey(**resp)
+            key = CryptoKey(**resp)
+            self._cache_put(zone, 'cryptokey', str(keyid), key)
+            return key
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
-    def set_cryptokey_active(self, zone, cryptokey, active=True):
+    def set_cryptokey_active(self, zone, cryptokey, active=True, readback=True):
         """
         Sets the `active` field of a CryptoKey
 
@@ -177,7 +369,8 @@ class PDNSApi:
         :param cryptokey: The :class:`pdnsapi.cryptokey.CryptoKey` or a string of the `id` field
                           Note: the `active`-field of this object is ignored!
         :param active: A boolean for the `active` field
-        :return: the new :class:`pdnsapi.cryptokey.Cryptokey`
+        :param readback: Whether to retrieve and return the changed CryptoKey
+        :return: the new :class:`pdnsapi.cryptokey.Cryptokey` if `readback` is True, None otherwise
         :raises: Exception on failure
         """
         keyid = -1
@@ -191,22 +384,26 @@ class PDNSApi:
         code, resp = self._do_request('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
                                       'PUT',
                                       {'active': active})
+        self._invalidate(zone)
         if code == 422:
             raise Exception('Failed to set cryptokey {} in zone {} to {}: {}'.format(
                 keyid, zone, 'active' if active else 'inactive', resp))
         if code == 204:
-            return self.get_cryptokey(zone, cryptokey)
+            if readback:
+                return self.get_cryptokey(zone, cryptokey)
+            return None
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
-    def set_cryptokey_published(self, zone, cryptokey, published=True):
+    def set_cryptokey_published(self, zone, cryptokey, published=True, readback=True):
         """
         Sets the `published` field of a CryptoKey
 
         :param zone: The name of the zone
         :param cryptokey: The :class:`pdnsapi.cryptokey.CryptoKey` or a string of the `id` field
         :param published: A boolean for the `published` field
-        :return: the new :class:`pdnsapi.cryptokey.Cryptokey`
+        :param readback: Whether to retrieve and return the changed CryptoKey
+        :return: the new :class:`pdnsapi.cryptokey.Cryptokey` if `readback` is True, None otherwise
         :raises: Exception on failure
         """
         keyid = -1
@@ -221,21 +418,24 @@ class PDNSApi:
                                       'PUT',
                                       {'published': published,
                                        'active': True})
+        self._invalidate(zone)
         if code == 422:
             raise Exception('Failed to set cryptokey {} in zone {} to {}: {}'.format(
                 keyid, zone, 'published' if published else 'unpublished', resp))
         if code == 204:
-            return self.get_cryptokey(zone, cryptokey)
+            if readback:
+                return self.get_cryptokey(zone, cryptokey)
+            return None
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
-    def publish_cryptokey(self, zone, cryptokey):
+    def publish_cryptokey(self, zone, cryptokey, readback=True):
 
-        return  self.set_cryptokey_published(zone, cryptokey, published=True)
+        return  self.set_cryptokey_published(zone, cryptokey, published=True, readback=readback)
 
-    def unpublish_cryptokey(self, zone, cryptokey):
+    def unpublish_cryptokey(self, zone, cryptokey, readback=True):
 
-        return  self.set_cryptokey_published(zone, cryptokey, published=False)
+        return  self.set_cryptokey_published(zone, cryptokey, published=False, readback=readback)
 
     def delete_cryptokey(self, zone, cryptokey):
         """
@@ -256,6 +456,7 @@ class PDNSApi:
             raise Exception("cryptokey is not a CryptoKey, nor a str or int")
         code, resp = self._do_request('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
                                       'DELETE')
+        self._invalidate(zone)
         if code == 422:
             raise Exception('Failed to remove cryptokey {} in zone {}: {}'.format(
                 keyid, zone, resp))
@@ -297,6 +498,7 @@ class PDNSApi:
         code, resp = self._do_request('/zones/{}/cryptokeys'.format(_sanitize_dnsname(zone)),
                                       'POST',
                                       data)
+        self._invalidate(zone)
 
         if code == 422:
             raise Exception('Unable to create CryptoKey in zone {}: {}'.format(zone, resp))
@@ -320,6 +522,54 @@ class PDNSApi:
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    def search(self, q, object_type='all', max_results=None, page_size=1000, alphabet=None):
+        """
+        Searches zones, records and comments on the server, without downloading any zone. '*' matches any number of
+        characters, '?' a single character.
+
+        Searches ending in '*' that hit ``page_size`` are split into narrower searches, see :mod:`pdnsapi.search`.
+        Results are yielded as they arrive and only once.
+
+        :param str q: The search, e.g. 'www.*' or '*192.0.2.1*'
+        :param str object_type: One of 'all', 'zone', 'record' or 'comment'
+        :param int max_results: Stop after this many results, None for all
+        :param int page_size: The maximum number of results per request
+        :param str alphabet: The characters to narrow searches with, :data:`pdnsapi.search.DEFAULT_ALPHABET` when None
+        :return: A generator of :class:`pdnsapi.search.SearchResult`
+        :raises: ValueError for an unknown object_type
+        """
+        import pdnsapi.search
+        if alphabet is None:
+            alphabet = pdnsapi.search.DEFAULT_ALPHABET
+        if object_type not in pdnsapi.search.OBJECT_TYPES:
+            raise ValueError('object_type must be one of {}, not {}'.format(
+                ', '.join(pdnsapi.search.OBJECT_TYPES), object_type))
+        seen = set()
+        queue = [q]
+        while queue:
+            current = queue.pop()
+            code, resp = self._do_request('/search-data', 'GET',
+                                          params={'q': current, 'max': page_size, 'object_type': object_type})
+            if code != 200:
+                raise Exception('Unexpected response: {}: {}'.format(code, resp))
+
+            for item in resp:
+                result = pdnsapi.search.to_result(item)
+                if result in seen:
+                    continue
+                seen.add(result)
+                yield result
+                if max_results is not None and len(seen) >= max_results:
+                    return
+
+            if len(resp) >= page_size:
+                narrower = pdnsapi.search.narrow(current, alphabet)
+                if not narrower:
+                    logger.warning('Search for %s returned %d results and can not be narrowed further, results may be '
+                                   'missing', current, len(resp))
+                # Depth first, so the queue stays short
+                queue.extend(reversed(narrower))
+
     def get_zone(self, zone):
         """
         Gets the full zone contents
@@ -327,58 +577,203 @@ class PDNSApi:
         :param str zone: The zone we want the full contents for
         :return: a :class:`pdnsapi.zone.Zone`
         """
+        hit, ret = self._cache_get(zone, 'zone')
+        if hit:
+            return ret
+
         code, resp = self._do_request('/zones/{}'.format(_sanitize_dnsname(zone)),
                                       'GET')
 
         if code == 200:
-            return Zone(**resp)
+            ret = Zone(**resp)
+            self._cache_put(zone, 'zone', '', ret)
+            return ret
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
-    def bump_soa(self, zone, serial=None):
+    def iter_rrsets(self, zone, chunk_size=65536):
+        """
+        Yields the RRSets of `zone` one by one, while the response is being read. Unlike :meth:`get_zone`, the zone is
+        never held in memory as a whole, so this is suitable for very large zones. Stopping the iteration early closes
+        the connection, the rest of the zone is not transferred.
+
+        :param str zone: The zone we want the RRSets for
+        :param int chunk_size: The number of bytes to read from the connection at a time
+        :return: a generator of :class:`pdnsapi.zone.RRSet`
+        """
+        from pdnsapi.stream import iter_array
+        uri = '/zones/{}'.format(_sanitize_dnsname(zone))
+        start = time.monotonic()
+        res = self._do_stream_request(uri)
+        received = 0
+
+        def chunks():
+            nonlocal received
+            for chunk in res.iter_content(chunk_size):
+                received += len(chunk)
+                yield chunk
+
+        error = None
+        try:
+            for rrset in iter_array(chunks(), 'rrsets'):
+                yield RRSet(**rrset)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            res.close()
+            self._observe('GET', uri, start, res, error, bytes_in=received)
+
+    def export_zone(self, zone, fp, chunk_size=65536):
+        """
+        Writes `zone` in AXFR format to `fp`, streaming it from the server in chunks
+
+        :param str zone: The zone to export
+        :param fp: A file object, opened in binary or text mode
+        :param int chunk_size: The number of bytes to read from the connection at a time
+        :return: The number of bytes written
+        :rtype: int
+        """
+        uri = '/zones/{}/export'.format(_sanitize_dnsname(zone))
+        start = time.monotonic()
+        res = self._do_stream_request(uri, accept='text/plain')
+        # A character can be split over two chunks
+        decoder = codecs.getincrementaldecoder('utf-8')() if isinstance(fp, io.TextIOBase) else None
+        written = 0
+        error = None
+        try:
+            for chunk in res.iter_content(chunk_size):
+                fp.write(decoder.decode(chunk) if decoder is not None else chunk)
+                written += len(chunk)
+            if decoder is not None:
+                fp.write(decoder.decode(b'', final=True))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            res.close()
+            self._observe('GET', uri, start, res, error, bytes_in=written)
+        return written
+
+    def import_zonefile(self, zone, fp, **kwargs):
+        """
+        Uploads the records in a zonefile to `zone`, replacing the RRSets that are in the file. The zonefile is parsed
+        incrementally and sent in batches, see :class:`pdnsapi.batch.ZoneChangeBatch`. RRSets that are not in the file
+        are left alone, use :func:`pdnsapi.diff.sync_zone` to also remove those.
+
+        The import is not atomic: batches are sent while the file is parsed. When parsing fails or a batch can not be
+        sent, the import stops and the batches before it stay applied. Importing the same file again is safe.
+
+        :param str zone: The zone to import into, also the origin of the zonefile
+        :param fp: A file object or any other iterable of lines. The records of an RRSet must be adjacent
+        :param kwargs: Passed to :class:`pdnsapi.batch.ZoneChangeBatch`
+        :return: The result of every request
+        :rtype: list(pdnsapi.batch.ChunkResult)
+        :raises: ValueError when the zonefile can not be parsed, ConnectionError when a batch could not be sent
+        """
+        from pdnsapi import zonefile
+        from pdnsapi.batch import ZoneChangeBatch
+        batch = ZoneChangeBatch(self, zone, **kwargs)
+        results = []
+
+        def flush():
+            for result in batch.flush():
+                results.append(result)
+                if result.error is not None:
+                    raise ConnectionError('Unable to import {} changes into {} after {} attempts: {}'.format(
+                        result.changes, zone, result.attempts, result.error)) from result.error
+
+        for rrset in zonefile.iter_rrsets(fp, origin=zone):
+            batch.replace_rrset(rrset)
+            if len(batch) >= batch.max_changes:
+                flush()
+        flush()
+        return results
+
+    def get_rrset(self, zone, name, rtype):
+        """
+        Gets a single RRSet, using the server-side filtering of the zone contents. Servers that do not support this
+        filtering send the full zone, the RRSet is still found in that case.
+
+        :param str zone: The zone the RRSet is in
+        :param str name: The owner name of the RRSet, compared case-insensitively
+        :param str rtype: The type of the RRSet
+        :return: a :class:`pdnsapi.zone.RRSet` or None when the RRSet does not exist
+        """
+        name = (_sanitize_dnsname(name) if name != '.' else name).lower()
+        rtype = rtype.upper()
+        hit, ret = self._cache_get(zone, 'rrset', (name, rtype))
+        if hit:
+            return ret
+
+        code, resp = self._do_request('/zones/{}'.format(_sanitize_dnsname(zone)),
+                                      'GET', params={'rrset_name': name, 'rrset_type': rtype})
+
+        if code == 200:
+            ret = None
+            for rrset in resp.get('rrsets', []):
+                if rrset['name'].lower() == name and rrset['type'].upper() == rtype:
+                    ret = RRSet(**rrset)
+                    break
+            self._cache_put(zone, 'rrset', (name, rtype), ret)
+            return ret
+
+        raise Exception('Unexpected response: {}: {}'.format(code, resp))
+
+    def bump_soa(self, zone, serial=None, readback=True, soa=None):
         """
         Bump zone SOA serial number
 
         :param str zone: The zone we want to bump
         :param str serial: The new serial otherwise will update to existing serial+1
-        :return: a :class:`pdnsapi.zone.Zone`
+        :param bool readback: Whether to retrieve and return the full zone after the update
+        :param pdnsapi.zone.RRSet soa: The current SOA RRSet when the caller has it already, fetched otherwise
+        :return: a :class:`pdnsapi.zone.Zone` if `readback` is True, the new serial as sent to the server otherwise
         """
 
-        soa = None
-        content = self.get_zone(zone)
-        for rrset in content.rrsets:
-            if rrset.rtype == "SOA" :
-                soa = rrset
-                break
+        if soa is None:
+            soa = self.get_rrset(zone, zone, 'SOA')
 
         if soa is None:
             raise Exception('No such SOA record')
 
-        
         newcontent = soa.records[0].content.split(" ")
         if serial != None:
             newcontent[2] = serial
         else:
             newcontent[2] = str(int(newcontent[2]) + 1)
+        self.patch_rrsets(zone, [{
+            "name": soa.name,
+            "type": soa.rtype,
+            "ttl": soa.ttl,
+            "changetype": "REPLACE",
+            "records": [
+                {
+                    "content": " ".join(newcontent),
+                    "disabled": soa.records[0].disabled
+                }
+            ]
+        }])
+
+        if readback:
+            return self.get_zone(zone)
+        return int(newcontent[2])
+
+    def patch_rrsets(self, zone, rrsets):
+        """
+        Changes RRSets in a zone with a single PATCH request. Use :class:`pdnsapi.batch.ZoneChangeBatch` to send a
+        large number of changes.
+
+        :param str zone: The zone to change
+        :param list rrsets: The RRSet changes as dicts, with a 'changetype' of 'REPLACE' or 'DELETE'
+        :raises: Exception on failure
+        """
         code, resp = self._do_request('/zones/{}'.format(_sanitize_dnsname(zone)),
-                                      'PATCH',
-                                      {
-                                          "rrsets": [{
-                                              "name": soa.name,
-                                              "type": soa.rtype,
-                                              "ttl": soa.ttl,
-                                              "changetype": "REPLACE",
-                                              "records": [
-                                                  {
-                                                      "content": " ".join(newcontent),
-                                                      "disabled": soa.records[0].disabled
-                                                  }
-                                              ]
-                                          }]
-                                      })
+                                      'PATCH', {'rrsets': rrsets})
+        self._invalidate(zone)
 
         if code == 204:
-            return self.get_zone(zone)
+            return
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
@@ -393,6 +788,7 @@ class PDNSApi:
         zonename = _sanitize_dnsname(zone)
         code, resp = self._do_request('/zones/{}'.format(zonename),
                                       'PUT', {param: value})
+        self._invalidate(zone)
 
         if code == 204:
             return self.get_zone(zonename)
@@ -407,14 +803,22 @@ class PDNSApi:
         :param kind: The zone metadata kind to retrieve. If this is an empty string, all zone metadata is retrieved
         :return: A list of :class:`pdnsapi.metadata.ZoneMetadata` objects
         """
+        hit, ret = self._cache_get(zone, 'metadata', kind)
+        if hit:
+            return list(ret) if kind == '' else ret
+
         code, resp = self._do_request('/zones/{}/metadata{}'.format(_sanitize_dnsname(zone), '/' + kind if len(kind) else ''),
                                       'GET')
 
         if code == 200:
             if kind == '':
-                return [ZoneMetadata(r['kind'], r['metadata']) for r in resp]
+                ret = [ZoneMetadata(r['kind'], r['metadata']) for r in resp]
+                self._cache_put(zone, 'metadata', kind, ret)
+                return list(ret)
             else:
-                return ZoneMetadata(resp['kind'], resp['metadata'])
+                ret = ZoneMetadata(resp['kind'], resp['metadata'])
+                self._cache_put(zone, 'metadata', kind, ret)
+                return ret
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
@@ -425,6 +829,7 @@ class PDNSApi:
         code, resp = self._do_request('/zones/{}/metadata/{}'.format(_sanitize_dnsname(zone), kind),
                                       'PUT',
                                       obj)
+        self._invalidate(zone)
 
         if code == 422:
             raise Exception('Failed to set metadata {} in zone {} to {}: {}'.format(kind, zone, metadata, resp))
@@ -436,6 +841,7 @@ class PDNSApi:
     def delete_zone_metadata(self, zone, kind):
         code, resp = self._do_request('/zones/{}/metadata/{}'.format(_sanitize_dnsname(zone), kind),
                                       'DELETE')
+        self._invalidate(zone)
 
         if code == 422:
             raise Exception('Failed to remove metadata {} in zone {}: {}'.format(kind, zone, resp))
@@ -443,3 +849,39 @@ class PDNSApi:
             return
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
+
+    def get_statistics(self, statistic=None, includerings=False):
+        """
+        Gets the statistics of the server
+
+        :param str statistic: Only get this statistic, None for all
+        :param bool includerings: Whether to include the ring statistics (top-N lists), they are large
+        :return: The value per statistic: an int for plain statistics, a dict for map statistics and a list of
+                 (name, value) tuples for rings, see :func:`pdnsapi.statistics.parse_statistics`
+        :rtype: OrderedDict
+        """
+        import pdnsapi.statistics
+        params = {'includerings': 'true' if includerings else 'false'}
+        if statistic is not None:
+            params['statistic'] = statistic
+        code, resp = self._do_request('/statistics', 'GET', params=params)
+
+        if code == 200:
+            return pdnsapi.statistics.parse_statistics(resp)
+
+        raise Exception('Unexpected response: {}: {}'.format(code, resp))
+
+    def flush_cache(self, domain):
+        """
+        Flushes `domain` and all names below it from the packet and query caches of the server
+
+        :param str domain: The name to flush
+        :return: The number of flushed cache entries
+        :rtype: int
+        """
+        code, resp = self._do_request('/cache/flush', 'PUT', params={'domain': _sanitize_dnsname(domain)})
+
+        if code == 200:
+            return int(resp.get('count', 0))
+
+        raise Exception('Unexpected response: {}: {}'.format(code, resp))
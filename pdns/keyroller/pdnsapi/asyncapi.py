@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import concurrent.futures
+
+from pdnsapi.api import PDNSApi
+from pdnsapi.zone import Zone
+
+logger = logging.getLogger(__name__)
+
+
+def _zone_id(zone):
+    """
+    Returns the name to use in API calls for `zone`
+
+    :param zone: A zone name or a :class:`pdnsapi.zone.Zone`
+    :rtype: str
+    """
+    if isinstance(zone, Zone):
+        return zone.id
+    return zone
+
+
+class AsyncPDNSApi:
+    """
+    An asyncio front-end for :class:`pdnsapi.api.PDNSApi`. All methods of the synchronous client are available as
+    coroutines, the requests themselves are done from a bounded pool of worker threads sharing one pooled session.
+    Use :meth:`connect` to create an instance from within a running event loop.
+    """
+
+    def __init__(self, api, concurrency=10):
+        """
+        :param pdnsapi.api.PDNSApi api: The synchronous API client to use
+        :param int concurrency: The maximum number of requests in flight at the same time
+        """
+        if not isinstance(api, PDNSApi):
+            raise Exception('api is not a PDNSApi')
+        self.concurrency = int(concurrency)
+        if self.concurrency < 1:
+            raise ValueError('concurrency must be at least 1, not {}'.format(concurrency))
+        if api.pool_maxsize < self.concurrency:
+            logger.warning('Connection pool size (%d) is smaller than the concurrency (%d), connections will not be '
+                           're-used', api.pool_maxsize, self.concurrency)
+        self.api = api
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency,
+                                                               thread_name_prefix='pdnsapi')
+        self._semaphore = None
+
+    @classmethod
+    async def connect(cls, concurrency=10, **kwargs):
+        """
+        Creates a new :class:`pdnsapi.api.PDNSApi` without blocking the event loop and wraps it. Unless given,
+        ``pool_maxsize`` is set to ``concurrency``, so every worker gets its own keep-alive connection.
+
+        :param int concurrency: The maximum number of requests in flight at the same time
+        :param kwargs: Passed to :class:`pdnsapi.api.PDNSApi`
+        :return: The client
+        :rtype: AsyncPDNSApi
+        """
+        kwargs.setdefault('pool_maxsize', concurrency)
+        loop = asyncio.get_running_loop()
+        api = await loop.run_in_executor(None, lambda: PDNSApi(**kwargs))
+        return cls(api, concurrency=concurrency)
+
+    def __repr__(self):
+        return '{}.AsyncPDNSApi({!r}, concurrency={})'.format(__name__, self.api, self.concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stops the worker threads and closes the underlying connections
+        """
+        self._executor.shutdown(wait=True)
+        self.api.close()
+
+    async def _call(self, func, *args, **kwargs):
+        # The semaphore is created lazily so it binds to the loop we are actually running in
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def get_cryptokeys(self, zone):
+        return await self._call(self.api.get_cryptokeys, _zone_id(zone))
+
+    async def get_cryptokey(self, zone, cryptokey):
+        return await self._call(self.api.get_cryptokey, _zone_id(zone), cryptokey)
+
+    async def set_cryptokey_active(self, zone, cryptokey, active=True, readback=True):
+        return await self._call(self.api.set_cryptokey_active, _zone_id(zone), cryptokey, active=active,
+                                readback=readback)
+
+    async def set_cryptokey_published(self, zone, cryptokey, published=True, readback=True):
+        return await self._call(self.api.set_cryptokey_published, _zone_id(zone), cryptokey, published=published,
+                                readback=readback)
+
+    async def publish_cryptokey(self, zone, cryptokey, readback=True):
+        return await self._call(self.api.publish_cryptokey, _zone_id(zone), cryptokey, readback=readback)
+
+    async def unpublish_cryptokey(self, zone, cryptokey, readback=True):
+        return await self._call(self.api.unpublish_cryptokey, _zone_id(zone), cryptokey, readback=readback)
+
+    async def delete_cryptokey(self, zone, cryptokey):
+        return await self._call(self.api.delete_cryptokey, _zone_id(zone), cryptokey)
+
+    async def add_cryptokey(self, zone, keytype='zsk', active=False, content=None, algo=None, bits=None,
+                            published=True):
+        return await self._call(self.api.add_cryptokey, _zone_id(zone), keytype=keytype, active=active,
+                                content=content, algo=algo, bits=bits, published=published)
+
+    async def get_zones(self):
+        return await self._call(self.api.get_zones)
+
+    async def get_zone(self, zone):
+        return await self._call(self.api.get_zone, _zone_id(zone))
+
+    async def get_rrset(self, zone, name, rtype):
+        return await self._call(self.api.get_rrset, _zone_id(zone), name, rtype)
+
+    async def bump_soa(self, zone, serial=None, readback=True, soa=None):
+        return await self._call(self.api.bump_soa, _zone_id(zone), serial=serial, readback=readback, soa=soa)
+
+    async def set_zone_param(self, zone, param, value):
+        return await self._call(self.api.set_zone_param, _zone_id(zone), param, value)
+
+    async def get_zone_metadata(self, zone, kind=''):
+        return await self._call(self.api.get_zone_metadata, _zone_id(zone), kind)
+
+    async def set_zone_metadata(self, zone, kind, metadata):
+        return await self._call(self.api.set_zone_metadata, _zone_id(zone), kind, metadata)
+
+    async def delete_zone_metadata(self, zone, kind):
+        return await self._call(self.api.delete_zone_metadata, _zone_id(zone), kind)
+
+    async def gather(self, coro_func, zones, return_exceptions=True):
+        """
+        Runs ``coro_func(zone)`` for every zone in ``zones``, with at most ``concurrency`` calls in flight. Only that
+        many coroutines exist at any time, so this is safe to use with hundreds of thousands of zones.
+
+        :param coro_func: A coroutine function taking a zone, e.g. :meth:`get_cryptokeys`
+        :param zones: An iterable of zone names or :class:`pdnsapi.zone.Zone` objects
+        :param bool return_exceptions: When True, an exception for a zone is stored as its result. Otherwise the first
+                                       exception is raised, once the calls that are in flight were cancelled
+        :return: The results, keyed by zone name, in the order of ``zones``
+        :rtype: dict
+        """
+        results = {}
+        order = []
+        zones = iter(zones)
+
+        async def worker():
+            for zone in zones:
+                zone = _zone_id(zone)
+                order.append(zone)
+                try:
+                    results[zone] = await coro_func(zone)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    logger.debug('%s failed for %s: %s', getattr(coro_func, '__name__', coro_func), zone, e)
+                    results[zone] = e
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # Do not leave the other workers taking zones in the background
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        return {zone: results[zone] for zone in order}
+
+    async def gather_zone_metadata(self, zones, kind='', return_exceptions=True):
+        """
+        Retrieves the ``kind`` metadata for all ``zones`` concurrently
+
+        :param zones: An iterable of zone names or :class:`pdnsapi.zone.Zone` objects
+        :param str kind: The metadata kind, or an empty string for all metadata
+        :param bool return_exceptions: See :meth:`gather`
+        :return: The :class:`pdnsapi.metadata.ZoneMetadata` (or a list thereof), keyed by zone name
+        :rtype: dict
+        """
+        return await self.gather(lambda zone: self.get_zone_metadata(zone, kind), zones,
+                                 return_exceptions=return_exceptions)
+
+    async def gather_cryptokeys(self, zones, return_exceptions=True):
+        """
+        Retrieves the cryptokeys for all ``zones`` concurrently
+
+        :param zones: An iterable of zone names or :class:`pdnsapi.zone.Zone` objects
+        :param bool return_exceptions: See :meth:`gather`
+        :return: A list of :class:`pdnsapi.cryptokey.CryptoKey` objects, keyed by zone name
+        :rtype: dict
+        """
+        return await self.gather(self.get_cryptokeys, zones, return_exceptions=return_exceptions)
@@ -0,0 +1,192 @@
+import json
+import time
+import logging
+from collections import OrderedDict, namedtuple
+
+from pdnsapi.zone import Record, RRSet
+
+logger = logging.getLogger(__name__)
+
+ChunkResult = namedtuple('ChunkResult', ['changes', 'size', 'attempts', 'duration', 'error'])
+ChunkResult.__doc__ = """
+The outcome of sending one PATCH request of a :class:`ZoneChangeBatch`
+
+:param int changes: The number of RRSet changes in the request
+:param int size: The size of the encoded changes in bytes
+:param int attempts: The number of times the request was sent
+:param float duration: The number of seconds spent on all attempts
+:param Exception error: The error of the last attempt, None on success. The changes of a failed chunk are dropped.
+"""
+
+
+def _canonical(name):
+    if not name.endswith('.'):
+        return name + '.'
+    return name
+
+
+def _retryable(error):
+    """
+    :param Exception error: The error of a PATCH request
+    :return: Whether sending the same request again can succeed. The server rejects an invalid change (a 4xx status)
+             every time, except when it asks to slow down
+    :rtype: bool
+    """
+    status = getattr(error, 'status_code', None)
+    return status is None or status == 429 or status >= 500
+
+
+def _to_record(record):
+    if isinstance(record, str):
+        return {'content': record, 'disabled': False}
+    if isinstance(record, Record):
+        return {'content': record.content, 'disabled': record.disabled}
+    if isinstance(record, dict):
+        return {'content': record['content'], 'disabled': bool(record.get('disabled', False))}
+    raise ValueError('record must be a str, dict or Record, not a {}'.format(type(record)))
+
+
+class ZoneChangeBatch:
+    """
+    Collects RRSet changes for a zone and sends them in as few PATCH requests as possible.
+
+    Only the last change for a (name, type) pair is kept. Changes are sent in chunks of at most ``max_changes`` RRSets
+    and ``max_size`` bytes. Chunks that fail with a connection error or a 5xx status are retried, chunks the server
+    rejected (a 4xx status) are not. The changes of a chunk that failed are dropped, its :class:`ChunkResult` has the
+    error. When used as a context manager, the batch is flushed on a clean exit.
+    """
+
+    def __init__(self, api, zone, max_changes=1000, max_size=1024 * 1024, retries=2, retry_delay=1):
+        """
+        :param pdnsapi.api.PDNSApi api: The API to send the changes to
+        :param str zone: The zone to change
+        :param int max_changes: The maximum number of RRSet changes per request
+        :param int max_size: The maximum size of the encoded changes per request in bytes
+        :param int retries: How often a failed request is retried
+        :param float retry_delay: The number of seconds to wait before the first retry, doubled for every next retry
+        """
+        if int(max_changes) < 1:
+            raise ValueError('max_changes must be at least 1, not {}'.format(max_changes))
+        self.api = api
+        self.zone = zone
+        self.max_changes = int(max_changes)
+        self.max_size = int(max_size)
+        self.retries = int(retries)
+        self.retry_delay = float(retry_delay)
+        self._changes = OrderedDict()
+
+    def __repr__(self):
+        return 'ZoneChangeBatch({!r}, "{}", max_changes={}, max_size={}, retries={}, retry_delay={})'.format(
+            self.api, self.zone, self.max_changes, self.max_size, self.retries, self.retry_delay)
+
+    def __len__(self):
+        return len(self._changes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    def replace(self, name, rtype, ttl, records, comments=None):
+        """
+        Queues the replacement of an RRSet
+
+        :param str name: The owner name of the RRSet
+        :param str rtype: The type of the RRSet
+        :param int ttl: The TTL of the RRSet
+        :param list records: The record contents as strings, dicts or :class:`pdnsapi.zone.Record` objects
+        :param list comments: If not None, the comments as dicts with 'content' and 'account'
+        """
+        change = {
+            'name': _canonical(name),
+            'type': rtype.upper(),
+            'ttl': int(ttl),
+            'changetype': 'REPLACE',
+            'records': [_to_record(r) for r in records],
+        }
+        if comments is not None:
+            change['comments'] = comments
+        self._add(change)
+
+    def replace_rrset(self, rrset):
+        """
+        Queues the replacement of an RRSet with the contents of ``rrset``
+
+        :param pdnsapi.zone.RRSet rrset: The new RRSet
+        """
+        if not isinstance(rrset, RRSet):
+            raise ValueError('rrset must be an RRSet, not a {}'.format(type(rrset)))
+        self.replace(rrset.name, rrset.rtype, rrset.ttl, rrset.records)
+
+    def delete(self, name, rtype):
+        """
+        Queues the removal of an RRSet
+
+        :param str name: The owner name of the RRSet
+        :param str rtype: The type of the RRSet
+        """
+        self._add({
+            'name': _canonical(name),
+            'type': rtype.upper(),
+            'changetype': 'DELETE',
+        })
+
+    def _add(self, change):
+        key = (change['name'].lower(), change['type'])
+        # Re-insert, so the order of the requests follows the order of the last change
+        self._changes.pop(key, None)
+        self._changes[key] = change
+
+    def _chunks(self):
+        chunk = []
+        size = 0
+        for key, change in self._changes.items():
+            change_size = len(json.dumps(change)) + 1
+            if chunk and (len(chunk) >= self.max_changes or size + change_size > self.max_size):
+                yield chunk, size
+                chunk = []
+                size = 0
+            chunk.append(key)
+            size += change_size
+        if chunk:
+            yield chunk, size
+
+    def flush(self):
+        """
+        Sends all queued changes. Afterwards the batch is empty, also when requests failed.
+
+        :return: The result of every request that was done, check their ``error``
+        :rtype: list(ChunkResult)
+        """
+        results = []
+        for keys, size in list(self._chunks()):
+            rrsets = [self._changes[key] for key in keys]
+            attempts = 0
+            error = None
+            start = time.monotonic()
+            while attempts <= self.retries:
+                if attempts:
+                    time.sleep(self.retry_delay * 2 ** (attempts - 1))
+                attempts += 1
+                try:
+                    self.api.patch_rrsets(self.zone, rrsets)
+                    error = None
+                    break
+                except Exception as e:
+                    logger.debug('PATCH of %d changes to %s failed (attempt %d): %s', len(rrsets), self.zone,
+                                 attempts, e)
+                    error = e
+                    if not _retryable(e):
+                        break
+            duration = time.monotonic() - start
+
+            # Failed changes are not kept either, every later flush would send them (and retry them) again
+            for key in keys:
+                del self._changes[key]
+            if error is not None:
+                logger.error('Unable to send %d changes to %s after %d attempts, dropping them: %s', len(rrsets),
+                             self.zone, attempts, error)
+            results.append(ChunkResult(len(rrsets), size, attempts, duration, error))
+        return results
@@ -0,0 +1,118 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache with a TTL for API responses. Entries are keyed by a (zone, resource, kind) tuple, so all
+    entries for a zone can be dropped at once when that zone is changed.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, clock=time.monotonic):
+        """
+        :param int maxsize: The maximum number of entries, the least recently used entry is evicted when this is reached
+        :param float ttl: The number of seconds an entry is valid
+        :param clock: A function returning the current time in seconds
+        """
+        if int(maxsize) < 1:
+            raise ValueError('maxsize must be at least 1, not {}'.format(maxsize))
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._zones = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __repr__(self):
+        return 'ResponseCache(maxsize={}, ttl={})'.format(self.maxsize, self.ttl)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, zone, resource, kind=''):
+        """
+        Looks up an entry
+
+        :param str zone: The zone name
+        :param str resource: The type of resource, e.g. 'zone' or 'metadata'
+        :param kind: Further qualification of the resource, e.g. the metadata kind
+        :return: A tuple of a bool that is True on a hit and the cached value (None on a miss)
+        :rtype: tuple(bool, object)
+        """
+        key = (zone, resource, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, zone, resource, kind, value):
+        """
+        Stores an entry
+
+        :param str zone: The zone name
+        :param str resource: The type of resource, e.g. 'zone' or 'metadata'
+        :param kind: Further qualification of the resource, e.g. the metadata kind
+        :param value: The value to store
+        """
+        key = (zone, resource, kind)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._zones.setdefault(zone, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_zone(self, zone):
+        """
+        Removes all entries for ``zone``
+
+        :param str zone: The zone name
+        """
+        with self._lock:
+            for key in self._zones.pop(zone, ()):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Removes all entries, the counters are left alone
+        """
+        with self._lock:
+            self._entries.clear()
+            self._zones.clear()
+
+    def stats(self):
+        """
+        :return: The hit, miss, eviction and invalidation counters and the current size
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        del self._entries[key]
+        keys = self._zones.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._zones[key[0]]
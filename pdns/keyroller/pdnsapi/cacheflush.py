@@ -0,0 +1,144 @@
+"""
+Flushes the caches of the server for many names at once.
+
+The server flushes a name and everything below it, so names are first coalesced into the apex of the closest zone
+they are in: a thousand changed records in one zone become one request. The requests are then sent concurrently, at a
+limited rate so the server is not hit by a flush storm.
+"""
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import namedtuple, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+FlushResult = namedtuple('FlushResult', ['flushed', 'counts', 'errors', 'duration'])
+FlushResult.__doc__ = """
+The outcome of :meth:`CacheFlusher.flush`
+
+:param int flushed: The total number of flushed cache entries
+:param dict counts: The number of flushed entries per flushed name
+:param dict errors: The exception per name that could not be flushed
+:param float duration: The number of seconds all flushes took
+"""
+
+
+def _canonical(name):
+    name = name.lower()
+    return name if name.endswith('.') else name + '.'
+
+
+def _parents(name):
+    """
+    Yields ``name`` and all its ancestors, closest first, up to and including the root
+    """
+    while True:
+        yield name
+        if name == '.':
+            return
+        name = name.split('.', 1)[1] or '.'
+
+
+def coalesce(names, zones=()):
+    """
+    Reduces ``names`` to the set of names to flush. Names in one of ``zones`` are replaced by the apex of the closest
+    zone, other names are dropped when one of their ancestors is flushed already.
+
+    :param names: An iterable of DNS names
+    :param zones: An iterable of zone names
+    :return: The names to flush, in the order they were first needed
+    :rtype: list(str)
+    """
+    zones = set(_canonical(zone) for zone in zones)
+    targets = OrderedDict()
+    for name in names:
+        name = _canonical(name)
+        target = next((parent for parent in _parents(name) if parent in zones), name)
+        targets[target] = None
+
+    # A flush covers everything below the flushed name
+    return [target for target in targets
+            if not any(parent in targets for parent in _parents(target) if parent != target)]
+
+
+class _RateLimiter:
+    """
+    A token bucket, thread-safe
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CacheFlusher:
+    """
+    Coalesces, rate-limits and parallelizes cache flushes, see the module documentation
+    """
+
+    def __init__(self, api, zones=None, rate=20, burst=None, max_workers=4):
+        """
+        :param pdnsapi.api.PDNSApi api: The API to flush through
+        :param zones: The zone names to coalesce into, fetched from the server on the first flush when None
+        :param float rate: The maximum number of flush requests per second, 0 for no limit
+        :param int burst: The number of requests that may be sent at once before the rate applies, ``rate`` by default
+        :param int max_workers: The number of concurrent requests, should not exceed the pool_maxsize of ``api``
+        """
+        self.api = api
+        self.zones = set(_canonical(zone) for zone in zones) if zones is not None else None
+        self.max_workers = int(max_workers)
+        self._limiter = None
+        if rate:
+            self._limiter = _RateLimiter(rate, burst if burst is not None else max(1, rate))
+
+    def __repr__(self):
+        return '{}.CacheFlusher({!r}, <{} zones>, max_workers={})'.format(
+            __name__, self.api, len(self.zones) if self.zones is not None else None, self.max_workers)
+
+    def _flush_one(self, name):
+        if self._limiter is not None:
+            self._limiter.acquire()
+        return self.api.flush_cache(name)
+
+    def flush(self, names):
+        """
+        Flushes ``names`` from the caches of the server
+
+        :param names: An iterable of DNS names, e.g. the owner names of changed records
+        :rtype: FlushResult
+        """
+        if self.zones is None:
+            self.zones = set(_canonical(zone.name) for zone in self.api.get_zones())
+        targets = coalesce(names, self.zones)
+        start = time.monotonic()
+        counts = OrderedDict()
+        errors = OrderedDict()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                   thread_name_prefix='cacheflush') as executor:
+            futures = OrderedDict((name, executor.submit(self._flush_one, name)) for name in targets)
+            for name, future in futures.items():
+                try:
+                    counts[name] = future.result()
+                except Exception as e:
+                    logger.warning('Flushing %s failed: %s', name, e)
+                    errors[name] = e
+        duration = time.monotonic() - start
+        flushed = sum(counts.values())
+        logger.debug('Flushed %d cache entries for %d names in %.3fs', flushed, len(targets), duration)
+        return FlushResult(flushed, counts, errors, duration)
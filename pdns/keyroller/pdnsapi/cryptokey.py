@@ -30,7 +30,8 @@ class CryptoKey:
     """
     _algo = None
 
-    def __init__(self, id, active, keytype, flags=None, algo=None, dnskey=None, ds=None, privatekey=None, **kwargs):
+    def __init__(self, id, active, keytype, flags=None, algo=None, dnskey=None, ds=None, privatekey=None,
+                 published=None, **kwargs):
         """
         Construct a new CryptoKey
 
@@ -42,6 +43,7 @@ class CryptoKey:
         :param string dnskey: The DNSKEY zonefile content
         :param list(string) ds: The DS records for this key
         :param string privatekey: The private key content
+        :param bool published: Whether or not the DNSKEY is published, None when the server does not report it
         :param dict kwargs: for compatibility with (future) API responses, ignored
         """
         self.id = id
@@ -51,6 +53,7 @@ class CryptoKey:
         self.dnskey = dnskey
         self.ds = ds
         self.privatekey = privatekey
+        self.published = published
         self.algo = algo or dnskey.split(' ')[2]
 
     def __repr__(self):
@@ -67,6 +70,7 @@ class CryptoKey:
             'dnskey': self.dnskey,
             'ds': self.ds,
             'privatekey': self.privatekey,
+            'published': self.published,
             'algo': self.algo,
         })
 
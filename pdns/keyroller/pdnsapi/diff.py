@@ -0,0 +1,181 @@
+"""
+Computes the RRSet changes needed to turn a live zone into a desired zone.
+
+The live zone is reduced to a 16 byte fingerprint per RRSet while it is streamed from the API, the desired zone is then
+compared against these fingerprints in a single pass. A desired zonefile is parsed during that pass, so neither zone is
+held in memory as a whole. Only RRSets that differ are sent back.
+
+Record contents are compared in the form the server uses (see :func:`normalize`), so e.g. an AAAA record written in
+upper case or a CNAME target without the trailing dot is not sent again.
+"""
+import hashlib
+import logging
+import ipaddress
+from collections import namedtuple
+
+from pdnsapi.zone import Zone, RRSet
+from pdnsapi.batch import ZoneChangeBatch
+from pdnsapi import zonefile
+
+logger = logging.getLogger(__name__)
+
+SyncResult = namedtuple('SyncResult', ['replaced', 'deleted', 'unchanged', 'chunks'])
+SyncResult.__doc__ = """
+The outcome of :func:`sync_zone`
+
+:param int replaced: The number of RRSets that were added or changed
+:param int deleted: The number of RRSets that were removed
+:param int unchanged: The number of RRSets that were already as desired
+:param list chunks: The :class:`pdnsapi.batch.ChunkResult` for every request
+"""
+
+
+def _canonical(name):
+    if not name.endswith('.'):
+        return name + '.'
+    return name
+
+
+def normalize(rtype, content):
+    """
+    Returns ``content`` in the form the server returns it in: addresses in their shortest form and, for the types in
+    :data:`pdnsapi.zonefile.RDATA_NAMES`, the domain names in the rdata absolute and in lower case and single spaces
+    between the fields. Other contents are returned as they are.
+
+    :param str rtype: The type of the record
+    :param str content: The content of the record
+    :rtype: str
+    """
+    rtype = rtype.upper()
+    if rtype in ('A', 'AAAA'):
+        try:
+            return str(ipaddress.ip_address(content.strip()))
+        except ValueError:
+            return content
+    positions = zonefile.RDATA_NAMES.get(rtype)
+    if positions is None:
+        return content
+    fields = content.split()
+    for pos in positions:
+        if pos < len(fields):
+            fields[pos] = _canonical(fields[pos]).lower()
+    return ' '.join(fields)
+
+
+def fingerprint(rrset):
+    """
+    Returns a digest of the TTL and records of ``rrset``, independent of the order of the records and of the way their
+    contents are written, see :func:`normalize`
+
+    :param pdnsapi.zone.RRSet rrset: The RRSet
+    :rtype: bytes
+    """
+    h = hashlib.blake2b(str(rrset.ttl).encode(), digest_size=16)
+    for content in sorted('{}{}'.format('-' if r.disabled else '+', normalize(rrset.rtype, r.content))
+                          for r in rrset.records):
+        h.update(b'\0')
+        h.update(content.encode())
+    return h.digest()
+
+
+def _key(rrset):
+    return _canonical(rrset.name).lower(), rrset.rtype.upper()
+
+
+def desired_rrsets(desired, origin='.'):
+    """
+    Returns the RRSets of ``desired``
+
+    :param desired: A :class:`pdnsapi.zone.Zone`, a zone dict in API format, zonefile text, a file object of a zonefile
+                    or an iterable of :class:`pdnsapi.zone.RRSet`. The records of an RRSet must be adjacent in a
+                    zonefile, as they are in AXFR output
+    :param str origin: The origin for zonefiles
+    :return: An iterable of :class:`pdnsapi.zone.RRSet`, zonefiles are parsed while it is consumed
+    """
+    if isinstance(desired, Zone):
+        return desired.rrsets
+    if isinstance(desired, dict):
+        return (RRSet(**rrset) for rrset in desired.get('rrsets', []))
+    if isinstance(desired, str) or hasattr(desired, 'readline'):
+        lines = desired.splitlines() if isinstance(desired, str) else desired
+        return zonefile.iter_rrsets(lines, origin=origin)
+    return desired
+
+
+def diff_rrsets(desired, live, ignore_types=('SOA',)):
+    """
+    Compares two sets of RRSets and yields the changes to make ``live`` equal to ``desired``. This is linear in the
+    number of RRSets, and only a fingerprint of each live RRSet is kept in memory.
+
+    :param desired: An iterable of :class:`pdnsapi.zone.RRSet` as they should be
+    :param live: An iterable of :class:`pdnsapi.zone.RRSet` as they are, e.g. :meth:`pdnsapi.api.PDNSApi.iter_rrsets`
+    :param ignore_types: RRSet types that are never changed
+    :return: A generator of ('REPLACE', :class:`pdnsapi.zone.RRSet`) and ('DELETE', (name, type)) tuples
+    """
+    ignore_types = set(t.upper() for t in ignore_types)
+    index = {}
+    for rrset in live:
+        if rrset.rtype not in ignore_types:
+            index[_key(rrset)] = fingerprint(rrset)
+
+    for rrset in desired:
+        if rrset.rtype in ignore_types:
+            continue
+        if index.pop(_key(rrset), None) != fingerprint(rrset):
+            yield 'REPLACE', rrset
+
+    for key in index:
+        yield 'DELETE', key
+
+
+def sync_zone(api, zone, desired, dry_run=False, ignore_types=('SOA',), **kwargs):
+    """
+    Makes ``zone`` on the server equal to ``desired``, sending only the RRSets that differ.
+
+    Changes are sent while ``desired`` is read. When a zonefile turns out to be invalid part-way, e.g. because the
+    records of an RRSet are not adjacent, the changes before that point were sent already; no RRSets are deleted in that
+    case. Chunks that failed are in the ``chunks`` of the result, their changes are not sent again.
+
+    :param pdnsapi.api.PDNSApi api: The API to use
+    :param str zone: The zone to update
+    :param desired: The desired contents, anything accepted by :func:`desired_rrsets`
+    :param bool dry_run: When True, only count the changes
+    :param ignore_types: RRSet types that are never changed
+    :param kwargs: Passed to :class:`pdnsapi.batch.ZoneChangeBatch`
+    :rtype: SyncResult
+    :raises: ValueError when ``desired`` is a zonefile that can not be parsed
+    """
+    ignore_types = tuple(t.upper() for t in ignore_types)
+    batch = ZoneChangeBatch(api, zone, **kwargs)
+    chunks = []
+    total = 0
+    replaced = 0
+    deleted = 0
+
+    def counted(rrsets):
+        nonlocal total
+        for rrset in rrsets:
+            if rrset.rtype not in ignore_types:
+                total += 1
+            yield rrset
+
+    desired = counted(desired_rrsets(desired, origin=zone))
+    for change, obj in diff_rrsets(desired, api.iter_rrsets(zone), ignore_types=ignore_types):
+        if change == 'REPLACE':
+            replaced += 1
+        else:
+            deleted += 1
+        if dry_run:
+            continue
+        if change == 'REPLACE':
+            batch.replace_rrset(obj)
+        else:
+            batch.delete(*obj)
+        if len(batch) >= batch.max_changes:
+            chunks.extend(batch.flush())
+    if not dry_run:
+        chunks.extend(batch.flush())
+
+    logger.debug('%s: %d RRSets replaced, %d deleted, %d unchanged', zone, replaced, deleted,
+                 total - replaced)
+    return SyncResult(replaced, deleted, total - replaced, chunks)
@@ -0,0 +1,149 @@
+"""
+A minimal DNS wire format encoder and decoder, just enough to send SOA queries and read the serial from the answers.
+"""
+import struct
+
+TYPE_SOA = 6
+CLASS_IN = 1
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+RCODE_REFUSED = 5
+
+FLAG_QR = 0x8000
+FLAG_AA = 0x0400
+FLAG_TC = 0x0200
+
+_header = struct.Struct('!HHHHHH')
+_question = struct.Struct('!HH')
+_rr = struct.Struct('!HHIH')
+
+
+def encode_name(name):
+    """
+    :param str name: A DNS name, with or without trailing dot
+    :return: The name in wire format, without compression
+    :rtype: bytes
+    :raises: ValueError for labels longer than 63 octets
+    """
+    ret = bytearray()
+    for label in name.rstrip('.').split('.'):
+        if not label:
+            continue
+        label = label.encode('idna') if not label.isascii() else label.encode()
+        if len(label) > 63:
+            raise ValueError('Label too long in {}'.format(name))
+        ret.append(len(label))
+        ret += label
+    ret.append(0)
+    return bytes(ret)
+
+
+def decode_name(data, offset):
+    """
+    Decodes a possibly compressed name
+
+    :param bytes data: The whole message
+    :param int offset: The offset of the name
+    :return: A tuple of the name (lowercase, with trailing dot) and the offset of the first octet after it
+    :rtype: tuple(str, int)
+    :raises: ValueError for malformed names
+    """
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError('Name runs past the end of the message')
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                raise ValueError('Truncated compression pointer')
+            if end is None:
+                end = offset + 2
+            jumps += 1
+            if jumps > 64:
+                raise ValueError('Compression loop')
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        if length & 0xC0:
+            raise ValueError('Unsupported label type')
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', 'replace').lower())
+        offset += length
+    return '.'.join(labels) + '.', end if end is not None else offset
+
+
+def soa_query(qid, zone):
+    """
+    :param int qid: The query id
+    :param str zone: The zone name
+    :return: A query for the SOA of ``zone``, without recursion desired
+    :rtype: bytes
+    """
+    return _header.pack(qid, 0, 1, 0, 0, 0) + encode_name(zone) + _question.pack(TYPE_SOA, CLASS_IN)
+
+
+def parse_soa_response(data):
+    """
+    Parses the answer to a query made with :func:`soa_query`
+
+    :param bytes data: The message
+    :return: A tuple of the query id, the question name, the rcode, the flags and the SOA serial (None when there is no
+             SOA in the answer section)
+    :rtype: tuple(int, str, int, int, int)
+    :raises: ValueError for malformed messages
+    """
+    if len(data) < _header.size:
+        raise ValueError('Message shorter than a header')
+    qid, flags, qdcount, ancount, _, _ = _header.unpack_from(data)
+    if not flags & FLAG_QR:
+        raise ValueError('Not a response')
+    if qdcount != 1:
+        raise ValueError('Expected one question, got {}'.format(qdcount))
+    qname, offset = decode_name(data, _header.size)
+    offset += _question.size
+    serial = None
+    for _ in range(ancount):
+        name, offset = decode_name(data, offset)
+        if offset + _rr.size > len(data):
+            raise ValueError('Truncated resource record')
+        rtype, rclass, _, rdlength = _rr.unpack_from(data, offset)
+        offset += _rr.size
+        if offset + rdlength > len(data):
+            raise ValueError('Truncated resource record')
+        if rtype == TYPE_SOA and rclass == CLASS_IN and name == qname:
+            # MNAME and RNAME, then SERIAL
+            _, rdata = decode_name(data, offset)
+            _, rdata = decode_name(data, rdata)
+            if rdata + 4 > offset + rdlength:
+                raise ValueError('Truncated SOA')
+            serial = struct.unpack_from('!I', data, rdata)[0]
+        offset += rdlength
+    return qid, qname, flags & 0xF, flags, serial
+
+
+def soa_response(query, serial=None, rcode=RCODE_NOERROR, mname='ns1.', rname='hostmaster.', ttl=3600):
+    """
+    Builds the answer to an SOA query, used by the mock server of the tests
+
+    :param bytes query: The query
+    :param int serial: The serial to answer with, None for an empty answer section
+    :param int rcode: The rcode
+    :return: The response
+    :rtype: bytes
+    """
+    qid, flags, _, _, _, _ = _header.unpack_from(query)
+    _, offset = decode_name(query, _header.size)
+    question = query[_header.size:offset + _question.size]
+    ancount = 1 if serial is not None else 0
+    flags = FLAG_QR | FLAG_AA | (flags & 0x7800) | rcode
+    ret = _header.pack(qid, flags, 1, ancount, 0, 0) + question
+    if serial is not None:
+        rdata = encode_name(mname) + encode_name(rname) + struct.pack('!IIIII', serial, 10800, 3600, 604800, 3600)
+        # The owner name points back to the question name
+        ret += b'\xc0\x0c' + _rr.pack(TYPE_SOA, CLASS_IN, ttl, len(rdata)) + rdata
+    return ret
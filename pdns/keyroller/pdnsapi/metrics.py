@@ -0,0 +1,197 @@
+import bisect
+import threading
+
+# Upper bounds of the latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Path segments following these segments are replaced by a placeholder in the endpoint template
+_placeholders = {
+    'zones': '{zone}',
+    'cryptokeys': '{id}',
+    'metadata': '{kind}',
+}
+
+
+def endpoint_template(uri):
+    """
+    Returns the endpoint of ``uri`` with zone names, key ids and metadata kinds replaced by placeholders, e.g.
+    '/zones/{zone}/cryptokeys/{id}' for '/zones/example.com./cryptokeys/5'
+
+    :param str uri: The request path, relative to the server URL
+    :rtype: str
+    """
+    segments = uri.split('/')
+    for i in range(1, len(segments)):
+        placeholder = _placeholders.get(segments[i - 1])
+        if placeholder is not None and segments[i]:
+            segments[i] = placeholder
+    return '/'.join(segments) or '/'
+
+
+def error_class(status=None, exception=None):
+    """
+    Classifies the outcome of a request
+
+    :param int status: The HTTP status code, None when no response was received
+    :param Exception exception: The exception raised while doing the request, if any
+    :return: None for a successful request, otherwise one of 'timeout', 'connection', 'http_4xx', 'http_5xx' or 'other'
+    :rtype: str
+    """
+    if status is not None:
+        if 400 <= status < 500:
+            return 'http_4xx'
+        if status >= 500:
+            return 'http_5xx'
+    if exception is None:
+        return None
+    name = type(exception).__name__
+    if 'Timeout' in name:
+        return 'timeout'
+    if 'Connection' in name:
+        return 'connection'
+    return 'other'
+
+
+class _EndpointStats:
+    __slots__ = ('count', 'errors', 'duration_sum', 'buckets', 'bytes_out', 'bytes_in')
+
+    def __init__(self, nbuckets):
+        self.count = 0
+        self.errors = {}
+        self.duration_sum = 0.0
+        self.buckets = [0] * (nbuckets + 1)
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+
+class ApiMetrics:
+    """
+    Per method and endpoint request counters, latency histograms, byte counters and error counts for
+    :class:`pdnsapi.api.PDNSApi`. One instance can be shared between several clients.
+
+    Hooks are called for every request with the keyword arguments ``method``, ``endpoint``, ``status``, ``duration``,
+    ``bytes_out``, ``bytes_in`` and ``error``, which allows feeding e.g. an OpenMetrics exporter directly.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: The upper bounds of the latency histogram buckets in seconds, in increasing order
+        """
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._stats = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'ApiMetrics(buckets={})'.format(self.buckets)
+
+    def add_hook(self, hook):
+        """
+        Registers a function to be called for every request, see the class documentation for its arguments
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def observe(self, method, endpoint, status, duration, bytes_out=0, bytes_in=0, error=None):
+        """
+        Records a request
+
+        :param str method: The HTTP method
+        :param str endpoint: The endpoint template, see :func:`endpoint_template`
+        :param int status: The HTTP status code, None when no response was received
+        :param float duration: The duration of the request in seconds
+        :param int bytes_out: The size of the request body
+        :param int bytes_in: The size of the response body
+        :param str error: The error class, see :func:`error_class`
+        """
+        key = (method.upper(), endpoint)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats(len(self.buckets))
+            stats.count += 1
+            stats.duration_sum += duration
+            stats.buckets[bisect.bisect_left(self.buckets, duration)] += 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+        for hook in self._hooks:
+            hook(method=key[0], endpoint=endpoint, status=status, duration=duration, bytes_out=bytes_out,
+                 bytes_in=bytes_in, error=error)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self):
+        """
+        :return: All counters, keyed by '<METHOD> <endpoint>'. Histogram buckets are cumulative and keyed by their
+                 upper bound, like in Prometheus
+        :rtype: dict
+        """
+        ret = {}
+        with self._lock:
+            for (method, endpoint), stats in sorted(self._stats.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + (float('inf'),), stats.buckets):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                ret['{} {}'.format(method, endpoint)] = {
+                    'method': method,
+                    'endpoint': endpoint,
+                    'count': stats.count,
+                    'errors': dict(stats.errors),
+                    'duration_sum': stats.duration_sum,
+                    'duration_buckets': buckets,
+                    'bytes_out': stats.bytes_out,
+                    'bytes_in': stats.bytes_in,
+                }
+        return ret
+
+    def prometheus(self, prefix='pdnsapi'):
+        """
+        Renders all counters in the Prometheus text exposition format
+
+        :param str prefix: The prefix for the metric names
+        :rtype: str
+        """
+        snapshot = self.snapshot().values()
+        lines = []
+
+        def labels(entry, **extra):
+            pairs = [('method', entry['method']), ('endpoint', entry['endpoint'])] + sorted(extra.items())
+            return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                                  for k, v in pairs) + '}'
+
+        lines.append('# HELP {}_requests_total Number of API requests'.format(prefix))
+        lines.append('# TYPE {}_requests_total counter'.format(prefix))
+        for entry in snapshot:
+            lines.append('{}_requests_total{} {}'.format(prefix, labels(entry), entry['count']))
+
+        lines.append('# HELP {}_request_errors_total Number of failed API requests'.format(prefix))
+        lines.append('# TYPE {}_request_errors_total counter'.format(prefix))
+        for entry in snapshot:
+            for error, count in sorted(entry['errors'].items()):
+                lines.append('{}_request_errors_total{} {}'.format(prefix, labels(entry, error=error), count))
+
+        lines.append('# HELP {}_request_duration_seconds Duration of API requests'.format(prefix))
+        lines.append('# TYPE {}_request_duration_seconds histogram'.format(prefix))
+        for entry in snapshot:
+            for bound, count in entry['duration_buckets'].items():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_request_duration_seconds_bucket{} {}'.format(prefix, labels(entry, le=le), count))
+            lines.append('{}_request_duration_seconds_sum{} {}'.format(prefix, labels(entry), entry['duration_sum']))
+            lines.append('{}_request_duration_seconds_count{} {}'.format(prefix, labels(entry), entry['count']))
+
+        for direction, help_text in (('out', 'sent in request bodies'), ('in', 'received in response bodies')):
+            lines.append('# HELP {}_bytes_{}_total Bytes {}'.format(prefix, direction, help_text))
+            lines.append('# TYPE {}_bytes_{}_total counter'.format(prefix, direction))
+            for entry in snapshot:
+                lines.append('{}_bytes_{}_total{} {}'.format(prefix, direction, labels(entry),
+                                                             entry['bytes_' + direction]))
+
+        return '\n'.join(lines) + '\n'
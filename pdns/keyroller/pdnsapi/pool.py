@@ -0,0 +1,190 @@
+import time
+import logging
+import concurrent.futures
+from collections import namedtuple, OrderedDict
+
+from pdnsapi.api import PDNSApi
+
+logger = logging.getLogger(__name__)
+
+ServerResult = namedtuple('ServerResult', ['server', 'result', 'error', 'duration'])
+ServerResult.__doc__ = """
+The outcome of a call on one server of a :class:`PDNSApiPool`
+
+:param str server: The name of the server
+:param result: The return value of the call, None on failure
+:param Exception error: The exception raised by the call, None on success
+:param float duration: The number of seconds the call took
+"""
+
+
+class PDNSApiPool:
+    """
+    Issues the same call to several API servers (e.g. a primary and its secondaries) concurrently, and compares the
+    results.
+    """
+
+    def __init__(self, apis, max_workers=None):
+        """
+        :param apis: A dict of server name to :class:`pdnsapi.api.PDNSApi`, or a list of the latter. In that case the
+                     base URLs are used as names
+        :param int max_workers: The maximum number of concurrent calls, one per server by default
+        """
+        if isinstance(apis, dict):
+            self.apis = OrderedDict(apis)
+        else:
+            self.apis = OrderedDict((api._baseurl, api) for api in apis)
+        if not self.apis:
+            raise ValueError('apis may not be empty')
+        for name, api in self.apis.items():
+            if not isinstance(api, PDNSApi):
+                raise Exception('api for {} is not a PDNSApi'.format(name))
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(self.apis),
+                                                               thread_name_prefix='pdnsapipool')
+
+    @classmethod
+    def from_configs(cls, configs, max_workers=None):
+        """
+        Connects to all servers concurrently
+
+        :param dict configs: Server name to a dict of :class:`pdnsapi.api.PDNSApi` arguments
+        :param int max_workers: See :meth:`__init__`
+        :rtype: PDNSApiPool
+        :raises: ConnectionError when a server can not be reached
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(configs) or 1) as executor:
+            futures = OrderedDict((name, executor.submit(PDNSApi, **config)) for name, config in configs.items())
+        apis = OrderedDict()
+        error = None
+        for name, future in futures.items():
+            try:
+                apis[name] = future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            # Do not leak the sessions of the servers that could be reached
+            for api in apis.values():
+                api.close()
+            raise error
+        return cls(apis, max_workers)
+
+    def __repr__(self):
+        return '{}.PDNSApiPool({!r})'.format(__name__, dict(self.apis))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for api in self.apis.values():
+            api.close()
+
+    def fan_out(self, method, *args, **kwargs):
+        """
+        Calls ``method`` with the given arguments on all servers concurrently
+
+        :param str method: The name of a :class:`pdnsapi.api.PDNSApi` method, e.g. 'get_cryptokeys'
+        :return: The result per server, in the order of the servers
+        :rtype: OrderedDict(str, ServerResult)
+        """
+        return self.fan_out_func(lambda api: getattr(api, method)(*args, **kwargs), name=method)
+
+    def fan_out_func(self, func, name=None):
+        """
+        Calls ``func`` with the :class:`pdnsapi.api.PDNSApi` of every server concurrently
+
+        :param func: A function taking the API as its only argument
+        :param str name: A description of the call, for logging
+        :return: The result per server, in the order of the servers
+        :rtype: OrderedDict(str, ServerResult)
+        """
+        def call(server, api):
+            start = time.monotonic()
+            try:
+                return ServerResult(server, func(api), None, time.monotonic() - start)
+            except Exception as e:
+                logger.debug('%s on %s failed: %s', name or func, server, e)
+                return ServerResult(server, None, e, time.monotonic() - start)
+
+        futures = [self._executor.submit(call, server, api) for server, api in self.apis.items()]
+        return OrderedDict((r.server, r) for r in (f.result() for f in futures))
+
+    def get_serials(self, zone):
+        """
+        Gets the SOA serial of ``zone`` on all servers, only the SOA RRSet is transferred
+
+        :param str zone: The zone
+        :return: The serial per server, None for servers where the zone or SOA could not be retrieved
+        :rtype: OrderedDict(str, int)
+        """
+        ret = OrderedDict()
+        for name, r in self.fan_out('get_rrset', zone, zone, 'SOA').items():
+            ret[name] = None
+            if r.error is None and r.result is not None and r.result.records:
+                ret[name] = int(r.result.records[0].content.split(' ')[2])
+        return ret
+
+    def compare_serials(self, zone):
+        """
+        Compares the SOA serial of ``zone`` on all servers
+
+        :param str zone: The zone
+        :return: A dict with 'serials' (per server), 'skew' (the difference between the highest and lowest serial),
+                 'missing' (servers where it could not be retrieved) and 'consistent'
+        :rtype: dict
+        """
+        serials = self.get_serials(zone)
+        found = [s for s in serials.values() if s is not None]
+        missing = [name for name, s in serials.items() if s is None]
+        skew = max(found) - min(found) if found else 0
+        return {
+            'serials': serials,
+            'skew': skew,
+            'missing': missing,
+            'consistent': not missing and skew == 0,
+        }
+
+    def compare_cryptokeys(self, zone):
+        """
+        Compares the cryptokeys of ``zone`` on all servers by their DNSKEY, as key ids differ between servers
+
+        :param str zone: The zone
+        :return: A dict with 'dnskeys' (the DNSKEYs per server), 'missing' (the DNSKEYs that exist on another server but
+                 not on this one, per server), 'differing_state' (DNSKEYs whose active/published state differs),
+                 'errors' (per server) and 'consistent'
+        :rtype: dict
+        """
+        keys = OrderedDict()
+        errors = OrderedDict()
+        for name, r in self.fan_out('get_cryptokeys', zone).items():
+            if r.error is not None:
+                errors[name] = r.error
+                continue
+            keys[name] = {k.dnskey: (k.keytype, k.active, k.published) for k in r.result}
+
+        union = set()
+        for server_keys in keys.values():
+            union.update(server_keys)
+        missing = OrderedDict((name, sorted(union - set(server_keys))) for name, server_keys in keys.items())
+        differing_state = sorted(dnskey for dnskey in union
+                                 if len(set(server_keys[dnskey] for server_keys in keys.values()
+                                            if dnskey in server_keys)) > 1)
+        return {
+            'dnskeys': OrderedDict((name, sorted(server_keys)) for name, server_keys in keys.items()),
+            'missing': missing,
+            'differing_state': differing_state,
+            'errors': errors,
+            'consistent': not errors and not any(missing.values()) and not differing_state,
+        }
+
+    @staticmethod
+    def latencies(results):
+        """
+        :param results: The return value of :meth:`fan_out`
+        :return: The duration per server in seconds
+        :rtype: OrderedDict(str, float)
+        """
+        return OrderedDict((name, r.duration) for name, r in results.items())
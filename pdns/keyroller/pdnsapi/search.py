@@ -0,0 +1,52 @@
+"""
+Helpers for :meth:`pdnsapi.api.PDNSApi.search`.
+
+The server returns at most ``max`` results per search and does not page. A search that ends in a wildcard and hits
+that limit is split into narrower searches: 'foo*' becomes 'foo' and 'fooa*', 'foob*', ... for every character of the
+alphabet. Together these match everything 'foo*' matches, as long as the character after the prefix is in the alphabet.
+"""
+import string
+from collections import namedtuple
+
+# DNS name characters plus those common in record contents. The server matches case-insensitively.
+DEFAULT_ALPHABET = string.ascii_lowercase + string.digits + '-_. :/"=+@,;'
+
+OBJECT_TYPES = ('all', 'zone', 'record', 'comment')
+
+SearchResult = namedtuple('SearchResult', ['object_type', 'zone', 'name', 'type', 'content', 'ttl', 'disabled'])
+SearchResult.__doc__ = """
+One result of :meth:`pdnsapi.api.PDNSApi.search`
+
+:param str object_type: 'zone', 'record' or 'comment'
+:param str zone: The name of the zone the object is in (or the zone itself)
+:param str name: The owner name of the record or comment, or the zone name
+:param str type: The type of the record or comment, None for zones
+:param str content: The content of the record or comment, None for zones
+:param int ttl: The TTL of the record, None otherwise
+:param bool disabled: Whether the record is disabled, None otherwise
+"""
+
+
+def to_result(item):
+    """
+    :param dict item: One element of a /search-data response
+    :rtype: SearchResult
+    """
+    zone = item.get('zone') or item.get('zone_id') or item.get('name')
+    return SearchResult(item.get('object_type'), zone, item.get('name'), item.get('type'), item.get('content'),
+                        item.get('ttl'), item.get('disabled'))
+
+
+def narrow(q, alphabet=DEFAULT_ALPHABET):
+    """
+    :param str q: A search that ends in '*'
+    :param str alphabet: The characters to extend the prefix with
+    :return: Searches that together match what ``q`` matches, see the module documentation. Empty when ``q`` does not
+             end in a wildcard and can not be narrowed
+    :rtype: list(str)
+    """
+    if not q.endswith('*'):
+        return []
+    prefix = q[:-1]
+    ret = [prefix] if prefix and prefix.strip('*') else []
+    return ret + [prefix + c + '*' for c in alphabet]
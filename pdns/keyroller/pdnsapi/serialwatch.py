@@ -0,0 +1,248 @@
+"""
+Detects zone changes by asking the authoritative server for the SOA serial of every zone over DNS, instead of fetching
+the zones from the API.
+
+All queries are sent from one UDP socket with a bounded number of queries in flight, so watching a large number of
+zones takes a few packets per zone per cycle. Only the zones whose serial moved are then fetched from the API.
+"""
+import time
+import random
+import select
+import socket
+import logging
+import urllib.parse
+import concurrent.futures
+from collections import deque, namedtuple, OrderedDict
+
+from pdnsapi import dnswire
+
+logger = logging.getLogger(__name__)
+
+PollResult = namedtuple('PollResult', ['changed', 'failed', 'serials', 'duration', 'bytes_out', 'bytes_in'])
+PollResult.__doc__ = """
+The outcome of :meth:`SerialWatcher.poll`
+
+:param list changed: The zones whose serial differs from the previous poll
+:param list failed: The zones for which no serial could be retrieved
+:param dict serials: The serial per zone, None for failed zones
+:param float duration: The number of seconds the poll took
+:param int bytes_out: The number of bytes of DNS queries sent
+:param int bytes_in: The number of bytes of DNS responses received
+"""
+
+
+def _zone_name(zone):
+    zone = zone.lower()
+    return zone if zone.endswith('.') else zone + '.'
+
+
+def query_serials(zones, server, port=53, timeout=1, retries=2, window=512, stats=None):
+    """
+    Queries the SOA serial of all ``zones`` concurrently over UDP
+
+    :param zones: An iterable of zone names
+    :param str server: The address or host name of the authoritative server
+    :param int port: The DNS port of the server
+    :param float timeout: The number of seconds to wait for each answer before retrying
+    :param int retries: The number of times a query is retried after a timeout
+    :param int window: The maximum number of queries in flight
+    :param dict stats: When given, the 'bytes_out', 'bytes_in' and 'timeouts' counters in it are increased
+    :return: The serial per zone, None when the server did not answer with a serial (after all retries), refused the
+             query or answered without an SOA
+    :rtype: OrderedDict(str, int)
+    """
+    serials = OrderedDict((_zone_name(zone), None) for zone in zones)
+    if stats is None:
+        stats = {}
+    for counter in ('bytes_out', 'bytes_in', 'timeouts'):
+        stats.setdefault(counter, 0)
+    if not serials:
+        return serials
+
+    family, socktype, proto, _, address = socket.getaddrinfo(server, port, type=socket.SOCK_DGRAM)[0]
+    window = max(1, min(window, 65536))
+    # Random query ids, an id is only reused once its query is answered or given up on
+    ids = random.sample(range(65536), window)
+    pending = deque((zone, 0) for zone in serials)
+    # qid -> (zone, attempt, deadline), in the order the queries were sent and thus by deadline
+    in_flight = OrderedDict()
+
+    with socket.socket(family, socktype, proto) as sock:
+        # Connecting makes the kernel drop datagrams from other sources
+        sock.connect(address)
+        sock.setblocking(False)
+        while pending or in_flight:
+            while pending and ids:
+                zone, attempt = pending.popleft()
+                qid = ids.pop()
+                query = dnswire.soa_query(qid, zone)
+                try:
+                    sock.send(query)
+                except (BlockingIOError, InterruptedError):
+                    # The send buffer is full, wait for some answers first
+                    ids.append(qid)
+                    pending.appendleft((zone, attempt))
+                    break
+                except OSError as e:
+                    # e.g. ECONNREFUSED from an earlier ICMP port unreachable, the answer will time out
+                    logger.debug('Sending SOA query for %s failed: %s', zone, e)
+                stats['bytes_out'] += len(query)
+                in_flight[qid] = (zone, attempt, time.monotonic() + timeout)
+
+            if not in_flight:
+                continue
+
+            wait = max(0.0, next(iter(in_flight.values()))[2] - time.monotonic())
+            readable, _, _ = select.select([sock], [], [], wait)
+            if readable:
+                while True:
+                    try:
+                        data = sock.recv(4096)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError as e:
+                        logger.debug('Receiving from %s failed: %s', server, e)
+                        break
+                    stats['bytes_in'] += len(data)
+                    try:
+                        qid, qname, rcode, flags, serial = dnswire.parse_soa_response(data)
+                    except ValueError as e:
+                        logger.debug('Ignoring malformed response from %s: %s', server, e)
+                        continue
+                    query = in_flight.get(qid)
+                    if query is None or query[0] != qname:
+                        # Late answer to a query that was retried already, or not ours at all
+                        continue
+                    del in_flight[qid]
+                    ids.append(qid)
+                    if rcode != dnswire.RCODE_NOERROR or flags & dnswire.FLAG_TC:
+                        logger.debug('SOA query for %s: rcode %d, flags %#x', qname, rcode, flags)
+                    else:
+                        serials[qname] = serial
+
+            now = time.monotonic()
+            while in_flight:
+                qid, (zone, attempt, deadline) = next(iter(in_flight.items()))
+                if deadline > now:
+                    break
+                del in_flight[qid]
+                ids.append(qid)
+                stats['timeouts'] += 1
+                if attempt < retries:
+                    pending.append((zone, attempt + 1))
+                else:
+                    logger.debug('SOA query for %s timed out', zone)
+
+    return serials
+
+
+class SerialWatcher:
+    """
+    Keeps the last known SOA serial of a set of zones and reports the zones whose serial changed, see the module
+    documentation.
+    """
+
+    def __init__(self, api, zones=(), server=None, port=53, timeout=1, retries=2, window=512, fallback=True,
+                 fallback_workers=8):
+        """
+        :param pdnsapi.api.PDNSApi api: The API to fetch changed zones from
+        :param zones: The zones to watch
+        :param str server: The address of the authoritative server, the host of the API URL by default
+        :param int port: The DNS port of the server
+        :param float timeout: See :func:`query_serials`
+        :param int retries: See :func:`query_serials`
+        :param int window: See :func:`query_serials`
+        :param bool fallback: Get the SOA from the API for zones that did not answer over DNS
+        :param int fallback_workers: The maximum number of concurrent API requests for the fallback
+        """
+        self.api = api
+        self.server = server or urllib.parse.urlparse(api._baseurl).hostname
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.window = window
+        self.fallback = fallback
+        self.fallback_workers = max(1, fallback_workers)
+        self.serials = OrderedDict()
+        self.watch(zones)
+
+    def __repr__(self):
+        return '{}.SerialWatcher({!r}, <{} zones>, server="{}", port={})'.format(
+            __name__, self.api, len(self.serials), self.server, self.port)
+
+    def watch(self, zones):
+        """
+        Adds zones, their serial is recorded on the next poll without reporting them as changed
+
+        :param zones: An iterable of zone names
+        """
+        for zone in zones:
+            self.serials.setdefault(_zone_name(zone), None)
+
+    def unwatch(self, zones):
+        """
+        :param zones: An iterable of zone names
+        """
+        for zone in zones:
+            self.serials.pop(_zone_name(zone), None)
+
+    def _api_serial(self, zone):
+        # The server changed behind our back, so anything cached for the zone is stale
+        self.api._invalidate(zone)
+        try:
+            soa = self.api.get_rrset(zone, zone, 'SOA')
+        except Exception as e:
+            logger.debug('Getting the SOA of %s from the API failed: %s', zone, e)
+            return None
+        if soa is None or not soa.records:
+            return None
+        return int(soa.records[0].content.split(' ')[2])
+
+    def poll(self):
+        """
+        Queries the serials of all watched zones and records them
+
+        :return: The zones that changed since the previous poll and the zones that failed
+        :rtype: PollResult
+        """
+        start = time.monotonic()
+        stats = {}
+        serials = query_serials(self.serials, self.server, self.port, timeout=self.timeout, retries=self.retries,
+                                window=self.window, stats=stats)
+        unanswered = [zone for zone, serial in serials.items() if serial is None]
+        if self.fallback and unanswered:
+            # When the server does not answer over DNS at all, this is one request per zone, so not one after another
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.fallback_workers, len(unanswered)),
+                                                       thread_name_prefix='serialwatch') as executor:
+                for zone, serial in zip(unanswered, executor.map(self._api_serial, unanswered)):
+                    serials[zone] = serial
+
+        changed = []
+        failed = []
+        for zone, serial in serials.items():
+            if serial is None:
+                # Keep the last known serial, a change is reported once the zone answers again
+                failed.append(zone)
+                continue
+            previous = self.serials[zone]
+            if previous is not None and previous != serial:
+                changed.append(zone)
+            self.serials[zone] = serial
+
+        duration = time.monotonic() - start
+        logger.debug('Polled %d zones in %.3fs: %d changed, %d failed, %d timeouts', len(serials), duration,
+                     len(changed), len(failed), stats['timeouts'])
+        return PollResult(changed, failed, serials, duration, stats['bytes_out'], stats['bytes_in'])
+
+    def changes(self):
+        """
+        Polls and fetches the full contents of every changed zone from the API
+
+        :return: The zones that changed
+        :rtype: OrderedDict(str, :class:`pdnsapi.zone.Zone`)
+        """
+        ret = OrderedDict()
+        for zone in self.poll().changed:
+            self.api._invalidate(zone)
+            ret[zone] = self.api.get_zone(zone)
+        return ret
@@ -0,0 +1,306 @@
+"""
+Polls the statistics of one or more servers and computes per-second rates of the counters in-process.
+
+:class:`StatisticsPoller` keeps the latest successful snapshot of every server and a bounded history of values and rates
+per statistic, and renders the latest values in the Prometheus text exposition format. A failed poll does not replace
+the snapshot, it is counted and reported through the 'poll_up' and 'poll_errors_total' metrics instead.
+"""
+import time
+import logging
+import threading
+from collections import deque, namedtuple, OrderedDict
+
+from pdnsapi.pool import PDNSApiPool
+
+logger = logging.getLogger(__name__)
+
+# Statistics that are not monotonically increasing counters, no rate is computed for these
+GAUGES = frozenset([
+    'backend-latency', 'cache-latency', 'cpu-iowait', 'cpu-steal', 'fd-usage', 'key-cache-size', 'latency',
+    'meta-cache-size', 'open-tcp-connections', 'packetcache-size', 'qsize-q', 'query-cache-size',
+    'real-memory-usage', 'receive-latency', 'security-status', 'send-latency', 'signature-cache-size',
+    'special-memory-usage', 'tcp-queue-depth', 'xfr-queue', 'zone-cache-size',
+])
+
+Sample = namedtuple('Sample', ['timestamp', 'value', 'rate'])
+Sample.__doc__ = """
+One value of a statistic in the history of a :class:`StatisticsPoller`
+
+:param float timestamp: The UNIX time of the poll
+:param value: The value
+:param float rate: The per-second increase since the previous poll, None for gauges and the first poll
+"""
+
+Snapshot = namedtuple('Snapshot', ['server', 'timestamp', 'values', 'rates', 'duration', 'error'])
+Snapshot.__doc__ = """
+The statistics of one server at one poll
+
+:param str server: The name of the server
+:param float timestamp: The UNIX time of the poll
+:param dict values: The value per (statistic, key), key is None for plain statistics and the map key otherwise
+:param dict rates: The per-second rate per (statistic, key), for counters only
+:param float duration: The number of seconds the request took
+:param Exception error: The exception when the poll failed, values and rates are empty then
+"""
+
+
+def _number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+
+
+def parse_statistics(items):
+    """
+    Converts a /statistics response
+
+    :param list items: The response
+    :return: The value per statistic name: a number for a StatisticItem, a dict of name to number for a
+             MapStatisticItem and a list of (name, number) tuples for a RingStatisticItem
+    :rtype: OrderedDict
+    """
+    ret = OrderedDict()
+    for item in items:
+        kind = item.get('type')
+        if kind == 'MapStatisticItem':
+            ret[item['name']] = OrderedDict((entry['name'], _number(entry['value'])) for entry in item['value'])
+        elif kind == 'RingStatisticItem':
+            ret[item['name']] = [(entry['name'], _number(entry['value'])) for entry in item['value']]
+        else:
+            ret[item['name']] = _number(item['value'])
+    return ret
+
+
+def flatten(statistics):
+    """
+    :param dict statistics: The return value of :func:`parse_statistics`
+    :return: The value per (statistic, key), rings are left out
+    :rtype: OrderedDict
+    """
+    ret = OrderedDict()
+    for name, value in statistics.items():
+        if isinstance(value, dict):
+            for key, v in value.items():
+                ret[(name, key)] = v
+        elif not isinstance(value, list):
+            ret[(name, None)] = value
+    return ret
+
+
+def rates(previous, current, elapsed):
+    """
+    Computes the per-second increase of the counters between two snapshots. A counter that went down was reset (e.g.
+    the server restarted), its increase is its current value.
+
+    :param dict previous: The earlier values per (statistic, key)
+    :param dict current: The later values per (statistic, key)
+    :param float elapsed: The number of seconds between the snapshots
+    :rtype: dict
+    """
+    ret = {}
+    if elapsed <= 0:
+        return ret
+    for key, value in current.items():
+        if key[0] in GAUGES or not isinstance(value, (int, float)):
+            continue
+        before = previous.get(key)
+        if not isinstance(before, (int, float)):
+            continue
+        increase = value - before if value >= before else value
+        ret[key] = increase / elapsed
+    return ret
+
+
+def _metric_name(prefix, name):
+    return '{}_{}'.format(prefix, ''.join(c if c.isalnum() else '_' for c in name))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class StatisticsPoller:
+    """
+    Polls the statistics of several servers at a fixed interval, see the module documentation. All servers are polled
+    concurrently over the pooled connections of their :class:`pdnsapi.api.PDNSApi`.
+    """
+
+    def __init__(self, apis, interval=1, statistics=None, history=60, filter_threshold=3):
+        """
+        :param apis: A :class:`pdnsapi.pool.PDNSApiPool`, a dict of server name to :class:`pdnsapi.api.PDNSApi`, a list
+                     of the latter or a single one
+        :param float interval: The number of seconds between polls
+        :param statistics: The names of the statistics to poll, None for all (without rings)
+        :param int history: The number of samples to keep per statistic
+        :param int filter_threshold: When polling at most this many statistics, every statistic is requested on its
+                                     own using the ``statistic`` filter. Otherwise all statistics are requested at once
+                                     and filtered here
+        """
+        if not isinstance(apis, PDNSApiPool):
+            if not isinstance(apis, (dict, list, tuple)):
+                apis = [apis]
+            apis = PDNSApiPool(apis)
+        self.pool = apis
+        self.interval = float(interval)
+        self.statistics = list(statistics) if statistics is not None else None
+        self.history_size = int(history)
+        self.filter_threshold = filter_threshold
+        self.snapshots = OrderedDict()
+        self.errors = OrderedDict((server, 0) for server in self.pool.apis)
+        self._up = OrderedDict()
+        self._previous = {}
+        self._histories = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return '{}.StatisticsPoller({!r}, interval={}, statistics={!r}, history={})'.format(
+            __name__, self.pool, self.interval, self.statistics, self.history_size)
+
+    def _fetch(self, api):
+        if self.statistics is not None and len(self.statistics) <= self.filter_threshold:
+            ret = OrderedDict()
+            for statistic in self.statistics:
+                ret.update(api.get_statistics(statistic))
+            return ret
+        ret = api.get_statistics()
+        if self.statistics is not None:
+            ret = OrderedDict((name, ret[name]) for name in self.statistics if name in ret)
+        return ret
+
+    def poll(self):
+        """
+        Polls all servers once and records the results. :attr:`snapshots` keeps the last successful snapshot of servers
+        that failed.
+
+        :return: The snapshot per server, with an empty snapshot with the error for servers that failed
+        :rtype: OrderedDict(str, Snapshot)
+        """
+        now = time.monotonic()
+        timestamp = time.time()
+        results = self.pool.fan_out_func(self._fetch)
+        ret = OrderedDict()
+        with self._lock:
+            for server, r in results.items():
+                self._up[server] = r.error is None
+                if r.error is not None:
+                    logger.warning('Polling the statistics of %s failed: %s', server, r.error)
+                    self.errors[server] = self.errors.get(server, 0) + 1
+                    ret[server] = Snapshot(server, timestamp, {}, {}, r.duration, r.error)
+                    continue
+                values = flatten(r.result)
+                previous = self._previous.get(server)
+                current_rates = rates(previous[1], values, now - previous[0]) if previous else {}
+                self._previous[server] = (now, values)
+                histories = self._histories.setdefault(server, {})
+                for key, value in values.items():
+                    history = histories.get(key)
+                    if history is None:
+                        history = histories[key] = deque(maxlen=self.history_size)
+                    history.append(Sample(timestamp, value, current_rates.get(key)))
+                ret[server] = Snapshot(server, timestamp, values, current_rates, r.duration, None)
+                self.snapshots[server] = ret[server]
+        return ret
+
+    def history(self, server, statistic, key=None):
+        """
+        :param str server: The name of the server
+        :param str statistic: The name of the statistic
+        :param str key: The key for map statistics
+        :return: The samples, oldest first
+        :rtype: list(Sample)
+        """
+        with self._lock:
+            return list(self._histories.get(server, {}).get((statistic, key), ()))
+
+    def run(self, polls=None):
+        """
+        Polls every ``interval`` seconds until :meth:`stop` is called. Polls that take longer than the interval delay the
+        next one, missed polls are skipped rather than done in a burst.
+
+        :param int polls: Stop after this many polls, None to run until stopped
+        """
+        next_poll = time.monotonic()
+        done = 0
+        while not self._stop.is_set() and (polls is None or done < polls):
+            self.poll()
+            done += 1
+            next_poll += self.interval
+            now = time.monotonic()
+            if next_poll < now:
+                next_poll = now
+            self._stop.wait(next_poll - now)
+
+    def start(self):
+        """
+        Runs :meth:`run` in a background thread
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='statisticspoller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def prometheus(self, prefix='pdns_auth'):
+        """
+        Renders the latest successful snapshot of every server in the Prometheus text exposition format. Counters are
+        exported as counters and, when known, their rate as a '<name>_rate' gauge. Map statistics get a 'key' label.
+        Whether the latest poll of a server succeeded is in '<prefix>_poll_up', the number of failed polls in
+        '<prefix>_poll_errors_total'.
+
+        :param str prefix: The prefix for the metric names
+        :rtype: str
+        """
+        with self._lock:
+            snapshots = list(self.snapshots.values())
+            up = OrderedDict(self._up)
+            errors = OrderedDict(self.errors)
+
+        metrics = OrderedDict()
+        for snapshot in snapshots:
+            for (name, key), value in snapshot.values.items():
+                if isinstance(value, (int, float)):
+                    metrics.setdefault(name, []).append((snapshot, key, value))
+
+        lines = []
+        for name, entries in metrics.items():
+            metric = _metric_name(prefix, name)
+            lines.append('# TYPE {} {}'.format(metric, 'gauge' if name in GAUGES else 'counter'))
+            for snapshot, key, value in entries:
+                lines.append('{}{} {}'.format(metric, self._labels(snapshot.server, key), value))
+            if name in GAUGES:
+                continue
+            rate_lines = ['{}_rate{} {}'.format(metric, self._labels(snapshot.server, key),
+                                                 snapshot.rates[(name, key)])
+                          for snapshot, key, _ in entries if (name, key) in snapshot.rates]
+            if rate_lines:
+                lines.append('# TYPE {}_rate gauge'.format(metric))
+                lines.extend(rate_lines)
+
+        lines.append('# TYPE {}_poll_duration_seconds gauge'.format(prefix))
+        for snapshot in snapshots:
+            lines.append('{}_poll_duration_seconds{} {}'.format(prefix, self._labels(snapshot.server),
+                                                                snapshot.duration))
+        lines.append('# TYPE {}_poll_up gauge'.format(prefix))
+        for server, server_up in up.items():
+            lines.append('{}_poll_up{} {}'.format(prefix, self._labels(server), 1 if server_up else 0))
+        lines.append('# TYPE {}_poll_errors_total counter'.format(prefix))
+        for server, count in errors.items():
+            lines.append('{}_poll_errors_total{} {}'.format(prefix, self._labels(server), count))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(server, key=None):
+        labels = 'server="{}"'.format(_escape(server))
+        if key is not None:
+            labels += ',key="{}"'.format(_escape(key))
+        return '{' + labels + '}'
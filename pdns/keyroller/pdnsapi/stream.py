@@ -0,0 +1,128 @@
+"""
+Incremental decoding of large JSON API responses.
+
+The API returns a zone as a single JSON object with all RRSets in its ``rrsets`` member. Instead of decoding the whole
+document, :func:`iter_array` decodes one array element at a time, so only the current element and one chunk of the
+response are held in memory.
+"""
+import re
+import json
+import codecs
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    """
+    A window on a stream of bytes chunks, decoded to text
+    """
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._textdecoder = codecs.getincrementaldecoder(encoding)()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Drops the consumed part of the buffer and appends the next chunk
+
+        :return: False if the stream was already exhausted
+        :rtype: bool
+        """
+        if self.eof:
+            return False
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            data = self._textdecoder.decode(chunk)
+            if data:
+                self.buf += data
+                return True
+        self.buf += self._textdecoder.decode(b'', final=True)
+        self.eof = True
+        return True
+
+    def peek(self):
+        """
+        :return: The next non-whitespace character, or an empty string at the end of the stream
+        :rtype: str
+        """
+        while True:
+            self.pos = _whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError('Expected "{}" at offset {}, got "{}"'.format(char, self.pos, found))
+        self.pos += 1
+
+    def value(self):
+        """
+        Decodes the next complete JSON value
+
+        :return: The decoded value
+        :raises: ValueError when the stream does not contain a valid JSON value
+        """
+        self.peek()
+        while True:
+            try:
+                val, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number that ends with the buffer, or is followed by the start of a fraction or exponent that is not
+                # complete yet, might continue in the next chunk
+                if self.eof or not (isinstance(val, (int, float)) and not isinstance(val, bool) and
+                                    (end == len(self.buf) or self.buf[end] in '.eE')):
+                    self.pos = end
+                    return val
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON document')
+
+
+def iter_array(chunks, key, members=None):
+    """
+    Yields the elements of the array ``key`` in the JSON object read from ``chunks``, one at a time
+
+    :param chunks: An iterable of bytes, e.g. :meth:`requests.Response.iter_content`
+    :param str key: The name of the top-level member holding the array
+    :param dict members: If not None, the other top-level members that were read are stored in here
+    :raises: ValueError when the document is not valid JSON or not an object
+    """
+    buf = _Buffer(chunks)
+    buf.expect('{')
+    if buf.peek() == '}':
+        return
+    while True:
+        name = buf.value()
+        buf.expect(':')
+        if name == key:
+            buf.expect('[')
+            if buf.peek() == ']':
+                buf.pos += 1
+            else:
+                while True:
+                    yield buf.value()
+                    sep = buf.peek()
+                    buf.pos += 1
+                    if sep == ']':
+                        break
+                    if sep != ',':
+                        raise ValueError('Expected "," or "]" at offset {}, got "{}"'.format(buf.pos - 1, sep))
+        else:
+            val = buf.value()
+            if members is not None:
+                members[name] = val
+        sep = buf.peek()
+        buf.pos += 1
+        if sep == '}':
+            return
+        if sep != ',':
+            raise ValueError('Expected "," or "}}" at offset {}, got "{}"'.format(buf.pos - 1, sep))
@@ -1,5 +1,36 @@
+import sys
+
+
+def _unpack(val, cls, what):
+    """
+    Checks that `val` is a list of only dicts or only `cls` objects, in a single pass
+
+    :return: True if `val` contains dicts (or is empty), False if it contains `cls` objects
+    :rtype: bool
+    :raises: Exception when `val` is not a list or has mixed or other contents
+    """
+    if not isinstance(val, list):
+        raise Exception('Please pass a list of {}s'.format(what))
+    dicts = 0
+    for v in val:
+        if isinstance(v, dict):
+            dicts += 1
+        elif not isinstance(v, cls):
+            raise Exception('Not all {}s are of type {}'.format(what, cls.__name__))
+    if dicts and dicts != len(val):
+        raise Exception('Not all {}s are of type {}'.format(what, cls.__name__))
+    return dicts == len(val)
+
+
 class RRSet:
-    def __init__(self, name, type, ttl, records, comments=[]):
+    """
+    Represents an RRSet from the API. Owner names and types are interned, as they repeat a lot in a zone. Records
+    passed as dicts are stored as (content, disabled) tuples and :class:`Record` and :class:`Comment` objects are only
+    created when :attr:`records` or :attr:`comments` is accessed.
+    """
+    __slots__ = ('name', 'rtype', 'ttl', '_records', '_comments')
+
+    def __init__(self, name, type, ttl, records, comments=None):
         """
         Represents and RRSet from the API, see https://doc.powerdns.com/md/httpapi/api_spec/#zone95collection
 
@@ -9,59 +40,71 @@ class RRSet:
         :param list records: a list of :class:`Record`
         :param list comments: a list of :class:`Comment`
         """
-        self._records = []
-        self._comments = []
-        self.name = name
-        self.rtype = type
+        self.name = sys.intern(name)
+        self.rtype = sys.intern(type)
         self.ttl = ttl
         self.records = records
-        self.comments = comments
+        self.comments = comments if comments is not None else []
 
     def __repr__(self):
         return 'RRSet("{}", "{}", {}, {}, {})'.format(self.name, self.rtype, self.ttl, self.records, self.comments)
 
     def __str__(self):
-        ret = '\n'.join(['; {}'.format(c) for c in self.comments])
-        ret += '\n'.join(['{}{}\tIN\t{}\t{}'.format(';' if rec.disabled else '', self.name, self.rtype, rec.content)
-                         for rec in self.records])
-        return ret
+        return '\n'.join(self.lines())
+
+    def lines(self):
+        """
+        Yields the comments and records of this RRSet in zonefile format, without line endings
+        """
+        for c in self.comments:
+            yield '; {}'.format(c)
+        for rec in self.records:
+            yield '{}{}\tIN\t{}\t{}'.format(';' if rec.disabled else '', self.name, self.rtype, rec.content)
 
     @property
     def records(self):
+        if isinstance(self._records, tuple):
+            self._records = [Record(content, disabled) for content, disabled in self._records]
         return self._records
 
     @records.setter
     def records(self, val):
-        if not isinstance(val, list):
-            raise Exception('TODO')
-        if all(isinstance(v, dict) for v in val):
-            self._records = []
-            for v in val:
-                self._records.append(Record(**v))
+        if _unpack(val, Record, 'record'):
+            self._records = tuple((v['content'], bool(v['disabled'])) for v in val)
             return
-        if not all(isinstance(v, Record) for v in val):
-            raise Exception('Not all records are of type Record')
         self._records = val
 
+    @property
+    def record_contents(self):
+        """
+        The contents of all records, without creating :class:`Record` objects
+
+        :rtype: list(str)
+        """
+        if isinstance(self._records, tuple):
+            return [content for content, _ in self._records]
+        return [rec.content for rec in self._records]
+
+    def __len__(self):
+        return len(self._records)
+
     @property
     def comments(self):
+        if isinstance(self._comments, tuple):
+            self._comments = [Comment(**v) for v in self._comments]
         return self._comments
 
     @comments.setter
     def comments(self, val):
-        if not isinstance(val, list):
-            raise Exception('TODO')
-        if all(isinstance(v, dict) for v in val):
-            self._comments = []
-            for v in val:
-                self._comments.append(Comment(**v))
+        if _unpack(val, Comment, 'comment'):
+            self._comments = tuple(val)
             return
-        if not all(isinstance(v, Comment) for v in val):
-            raise Exception('Not all comments are of type Comment')
         self._comments = val
 
 
 class Record:
+    __slots__ = ('content', 'disabled')
+
     def __init__(self, content, disabled):
         """
         Represents a Record from the API. Note that is does not contian the rrname nor ttl (these are held by the
@@ -78,6 +121,8 @@ class Record:
 
 
 class Comment:
+    __slots__ = ('content', 'modified_at', 'account')
+
     def __init__(self, content, modified_at, account):
         """
         Constructor, see https://doc.powerdns.com/md/httpapi/api_spec/#zone95collection
@@ -105,23 +150,41 @@ class Zone:
     _keys = ["id", "name", "url", "kind", "serial", "notified_serial", "masters", "dnssec", "nsec3param",
              "nsec3narrow", "presigned", "soa_edit", "soa_edit_api", "account", "nameservers", "servers",
              "recursion_desired", "rrsets", "last_check"]
-    _rrsets = []
-    _kind = ''
+    __slots__ = [k for k in _keys if k not in ('kind', 'rrsets')] + ['_kind', '_rrsets']
 
     def __init__(self, **kwargs):
         """
         Constructor
         :param kwargs: Any of the elements named in https://doc.powerdns.com/md/httpapi/api_spec/#zone95collection
         """
+        self._kind = ''
+        self._rrsets = []
         for k, v in kwargs.items():
             if k in Zone._keys:
                 setattr(self, k, v)
 
     def __str__(self):
-        ret = "{}".format('\n'.join(['; {} = {}'.format(
-            k, str(getattr(self, k))) for k in Zone._keys if getattr(self, k, None) and k != 'rrsets']))
-        ret += "\n{}".format('\n'.join([str(v) for v in self.rrsets]))
-        return ret
+        return '\n'.join(self.lines())
+
+    def lines(self):
+        """
+        Yields the zone attributes as comments, followed by all RRSets in zonefile format, without line endings
+        """
+        for k in Zone._keys:
+            if k != 'rrsets' and getattr(self, k, None):
+                yield '; {} = {}'.format(k, getattr(self, k))
+        for rrset in self.rrsets:
+            yield from rrset.lines()
+
+    def write(self, fp):
+        """
+        Writes the zone in zonefile format to the text file object `fp`, one line at a time
+
+        :param fp: The file object
+        """
+        for line in self.lines():
+            fp.write(line)
+            fp.write('\n')
 
     def __repr__(self):
         return 'Zone({})'.format(
@@ -148,13 +211,7 @@ class Zone:
         :param val: a list of :class:`RRSet`s or :class:`dict`s. The latter is converted to RRsets
         :return:
         """
-        if not isinstance(val, list):
-            raise Exception('Please pass a list of RRSets')
-        if all(isinstance(v, dict) for v in val):
-            self._rrsets = []
-            for v in val:
-                self._rrsets.append(RRSet(**v))
+        if _unpack(val, RRSet, 'rrset'):
+            self._rrsets = [RRSet(**v) for v in val]
             return
-        if not all(isinstance(v, RRSet) for v in val):
-            raise Exception('Not all rrsets are actually RRSets')
         self._rrsets = val
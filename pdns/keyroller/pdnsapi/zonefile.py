@@ -0,0 +1,176 @@
+"""
+A small, incremental parser for RFC 1035 master files (zonefiles).
+
+Supported are ``$ORIGIN`` and ``$TTL``, relative names and ``@``, omitted owners, TTLs and classes, TTL units (``1h30m``),
+comments and records spanning multiple lines with parentheses. ``$INCLUDE`` and ``$GENERATE`` are not supported.
+"""
+import re
+
+from pdnsapi.zone import RRSet
+
+_token = re.compile(r'"(?:[^"\\]|\\.)*"|;.*|[()]|[^\s();"]+')
+_ttl = re.compile(r'^(\d+[smhdw]?)+$', re.IGNORECASE)
+_ttl_part = re.compile(r'(\d+)([smhdw]?)', re.IGNORECASE)
+_ttl_units = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_classes = ('IN', 'CH', 'HS', 'CS')
+
+# The positions of domain names in the rdata of these types, these are made absolute
+RDATA_NAMES = {
+    'CNAME': (0,),
+    'DNAME': (0,),
+    'NS': (0,),
+    'PTR': (0,),
+    'MX': (1,),
+    'SRV': (3,),
+    'SOA': (0, 1),
+}
+
+
+def parse_ttl(value):
+    """
+    Parses a TTL in seconds or with units, e.g. '3600' or '1h'
+
+    :param str value: The TTL
+    :return: The TTL in seconds
+    :rtype: int
+    :raises: ValueError when ``value`` is not a TTL
+    """
+    if not _ttl.match(value):
+        raise ValueError('Invalid TTL: {}'.format(value))
+    return sum(int(num) * _ttl_units[unit.lower()] for num, unit in _ttl_part.findall(value))
+
+
+def absolute_name(name, origin):
+    """
+    Makes ``name`` absolute by appending ``origin`` if needed
+
+    :param str name: A (relative) DNS name or '@'
+    :param str origin: The absolute origin
+    :rtype: str
+    """
+    if name == '@':
+        return origin
+    if name.endswith('.'):
+        return name
+    if origin == '.':
+        return name + '.'
+    return '{}.{}'.format(name, origin)
+
+
+def _entries(lines):
+    """
+    Yields a tuple of (int, bool, list(str)) for every entry: the line number where the entry ends, True if the entry
+    has an owner name and the tokens of the entry
+    """
+    tokens = []
+    has_owner = False
+    depth = 0
+    for lineno, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if depth == 0:
+            has_owner = bool(line) and not line[0].isspace()
+        for tok in _token.findall(line):
+            if tok[0] == ';':
+                break
+            if tok == '(':
+                depth += 1
+            elif tok == ')':
+                depth -= 1
+                if depth < 0:
+                    raise ValueError('Unbalanced ")" on line {}'.format(lineno))
+            else:
+                tokens.append(tok)
+        if depth == 0 and tokens:
+            yield lineno, has_owner, tokens
+            tokens = []
+    if depth:
+        raise ValueError('Unbalanced "(" at the end of the zonefile')
+
+
+def iter_records(lines, origin='.', default_ttl=3600):
+    """
+    Yields the records in a zonefile, one at a time
+
+    :param lines: A file object or any other iterable of lines
+    :param str origin: The origin to start with, overridden by ``$ORIGIN``
+    :param int default_ttl: The TTL for records when there is no ``$TTL`` nor a previous TTL
+    :return: A generator of (name, ttl, type, content) tuples, with absolute names
+    :raises: ValueError when the zonefile can not be parsed
+    """
+    origin = absolute_name(origin, '.')
+    zone_ttl = None
+    last_ttl = None
+    owner = None
+    for lineno, has_owner, tokens in _entries(lines):
+        directive = tokens[0].upper()
+        if directive == '$ORIGIN':
+            origin = absolute_name(tokens[1], origin)
+            continue
+        if directive == '$TTL':
+            zone_ttl = parse_ttl(tokens[1])
+            continue
+        if directive.startswith('$'):
+            raise ValueError('Unsupported directive {} on line {}'.format(tokens[0], lineno))
+
+        if has_owner:
+            owner = absolute_name(tokens.pop(0), origin)
+        if owner is None:
+            raise ValueError('No owner name for the record on line {}'.format(lineno))
+
+        ttl = None
+        rtype = None
+        while tokens:
+            tok = tokens.pop(0)
+            if ttl is None and _ttl.match(tok):
+                ttl = parse_ttl(tok)
+            elif tok.upper() in _classes:
+                continue
+            else:
+                rtype = tok.upper()
+                break
+        if rtype is None or not tokens:
+            raise ValueError('Incomplete record on line {}'.format(lineno))
+
+        if ttl is None:
+            ttl = zone_ttl if zone_ttl is not None else last_ttl if last_ttl is not None else default_ttl
+        last_ttl = ttl
+
+        for pos in RDATA_NAMES.get(rtype, ()):
+            if pos < len(tokens):
+                tokens[pos] = absolute_name(tokens[pos], origin)
+        if rtype == 'SOA':
+            # refresh, retry, expire and minimum may have units
+            tokens[3:7] = [str(parse_ttl(tok)) for tok in tokens[3:7]]
+
+        yield owner, ttl, rtype, ' '.join(tokens)
+
+
+def iter_rrsets(lines, origin='.', default_ttl=3600):
+    """
+    Yields the RRSets in a zonefile, one at a time. The records of an RRSet must be adjacent in the file, as they are
+    in AXFR output. The TTL of the first record is used for the RRSet.
+
+    :param lines: A file object or any other iterable of lines
+    :param str origin: The origin to start with, overridden by ``$ORIGIN``
+    :param int default_ttl: The TTL for records when there is no ``$TTL`` nor a previous TTL
+    :return: A generator of :class:`pdnsapi.zone.RRSet`
+    :raises: ValueError when the zonefile can not be parsed or an RRSet is not adjacent
+    """
+    seen = set()
+    key = None
+    ttl = None
+    records = []
+    for name, rttl, rtype, content in iter_records(lines, origin=origin, default_ttl=default_ttl):
+        if (name.lower(), rtype) != key:
+            if records:
+                yield RRSet(key[0], key[1], ttl, records)
+            key = (name.lower(), rtype)
+            if key in seen:
+                raise ValueError('Records for {}/{} are not adjacent in the zonefile'.format(name, rtype))
+            seen.add(key)
+            ttl = rttl
+            records = []
+        records.append({'content': content, 'disabled': False})
+    if records:
+        yield RRSet(key[0], key[1], ttl, records)
@@ -0,0 +1,24 @@
+"""
+The time as the keyroller sees it. Everything that decides when a roll starts or steps asks :func:`now`, so the keyroller
+can be run against a virtual clock (see :mod:`tests.simulation`).
+"""
+import datetime
+
+_clock = datetime.datetime.now
+
+
+def now():
+    """
+    :return: The current local time
+    :rtype: datetime.datetime
+    """
+    return _clock()
+
+
+def set_clock(clock):
+    """
+    :param clock: A function returning the current time as a naive local :class:`datetime.datetime`, None for the
+                  wall clock
+    """
+    global _clock
+    _clock = clock if clock is not None else datetime.datetime.now
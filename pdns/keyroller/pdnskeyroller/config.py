@@ -2,9 +2,6 @@ import yaml
 import datetime
 import logging
 
-from pdnsapi.api import PDNSApi
-import pdnskeyroller.keyrollerdomain
-
 logger = logging.getLogger(__name__)
 
 
@@ -18,6 +15,7 @@ class KeyrollerConfig:
         tmp_conf = {
             'keyroller': {
                 'loglevel': 'info',
+                'state_db': None,
             },
             'API': {
                 'version': 1,
@@ -64,5 +62,8 @@ class KeyrollerConfig:
     def api(self):
         return self._config['API']
 
+    def keyroller(self):
+        return self._config['keyroller']
+
     def defaults(self):
         return self._config['domain_defaults']
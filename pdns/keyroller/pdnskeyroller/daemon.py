@@ -1,39 +1,258 @@
 import yaml
+import time
+import heapq
 import datetime
 import logging
+import threading
+import concurrent.futures
+from collections import deque, namedtuple
 
 from pdnsapi.api import PDNSApi
-from pdnskeyroller import domainstate
+from pdnsapi.metadata import ZoneMetadata
+from pdnskeyroller import clock, PDNSKEYROLLER_CONFIG_metadata_kind, PDNSKEYROLLER_STATE_metadata_kind
 import pdnskeyroller.keyrollerdomain
+import pdnskeyroller.statestore
 from pdnskeyroller.prepublishkeyroll import PrePublishKeyRoll
+from pdnskeyroller.snapshot import ZoneSnapshot
 
 logger = logging.getLogger(__name__)
 
+Tick = namedtuple('Tick', ['started', 'duration', 'due', 'errors', 'skipped', 'failed', 'act_duration_sum',
+                           'act_duration_max', 'slowest'])
+Tick.__doc__ = """
+One tick of :meth:`Daemon.run_forever` (or one :meth:`Daemon.run`) that acted on domains
+
+:param datetime.datetime started: When the tick started
+:param float duration: The number of seconds the tick took
+:param int due: The number of domains that were due
+:param int errors: The number of domains whose action failed
+:param int skipped: The number of domains that were being acted on by another thread already, or were no longer
+                    configured
+:param list failed: The zones whose action failed
+:param float act_duration_sum: The number of seconds spent acting, summed over all domains
+:param float act_duration_max: The number of seconds the slowest domain took
+:param str slowest: The slowest zone
+"""
+
 
 class Daemon:
-    def __init__(self, configfile):
+    def __init__(self, configfile, api=None, full_load=False):
+        """
+        :param str configfile: The configuration file
+        :param pdnsapi.api.PDNSApi api: The API to use instead of the one from the configuration file
+        :param bool full_load: Read all zones from the API, also the ones the state_db has an up to date copy of. The
+                               store is still written to
+        """
         self._configfile = configfile
         self._config = self._load_config()
 
+        # The schedule for run_forever: a heap of (deadline, zone) and the current deadline per zone. Entries in the heap
+        # that do not match the current deadline are stale and skipped.
+        self._heap = []
+        self._deadlines = {}
+        self._scheduled = False
+        self._retry_interval = float(self._config['keyroller']['retry_interval'])
+        self._reload_interval = float(self._config['keyroller']['reload_interval'])
+        self._full_reload_interval = float(self._config['keyroller']['full_reload_interval'])
+        self._stop = threading.Event()
+        self._reload_requested = threading.Event()
+        self._wakeup = threading.Event()
+        self._ticks = deque(maxlen=100)
+        # The zones being acted on, no zone is acted on by two threads at once
+        self._busy = set()
+        self._busy_lock = threading.Lock()
+        self._tick_count = 0
+        self._tick_duration_sum = 0.0
+        self._tick_duration_max = 0.0
+
         # Initialize all domains
         self._domains = {}
-        api = PDNSApi(**self._config['API'])
-        for zone in api.get_zones():
-            try:
-                zoneconf = pdnskeyroller.keyrollerdomain.KeyrollerDomain(zone.id, api)
-                self._domains[zone.id] = zoneconf
-            except FileNotFoundError:
-                logger.debug("No config found for zone {}".format(zone.id))
+        # The SOA serial of every zone on the server and a hash of the keyroller config of the configured zones, as of
+        # the last (re)load. update_config uses these to only re-read changed zones.
+        self._serials = {}
+        self._config_hashes = {}
+        self._workers = int(self._config['keyroller']['workers'])
+        self._concurrency = max(1, int(self._config['keyroller']['concurrency']))
+        api_config = dict(self._config['API'])
+        # One connection per worker, more would be opened and thrown away for every request
+        api_config.setdefault('pool_maxsize', max(self._workers, self._concurrency))
+        self._api = api if api is not None else PDNSApi(**api_config)
+        state_db = self._config['keyroller']['state_db']
+        self._store = pdnskeyroller.statestore.StateStore(state_db) if state_db else None
+        zones = self._api.get_zones()
+        self._serials = {zone.id: zone.serial for zone in zones}
+        self._load_domains(self._restore_domains(full=full_load))
+
+    def _map_zones(self, func, zones, what, report_interval=10, workers=None, thread_name_prefix='loader'):
+        """
+        Calls ``func`` for all ``zones`` concurrently, using at most ``workers`` threads. Only a few calls are queued at a
+        time, so memory use does not depend on the number of zones. Progress is logged every ``report_interval``
+        seconds.
+
+        :param func: A function taking a zone id
+        :param list zones: The zone ids
+        :param str what: What is being done, for the progress logs
+        :param float report_interval: Log the progress every this many seconds
+        :param int workers: The number of threads, the ``workers`` setting by default
+        :param str thread_name_prefix: The name of the threads
+        :return: A generator of (zone, result, exception) tuples, in the order the calls finish
+        """
+        start = time.monotonic()
+        last_report = start
+        done = 0
+        if workers is None:
+            workers = self._workers
+
+        if workers == 1:
+            # Not worth a thread
+            for zone in zones:
+                try:
+                    yield zone, func(zone), None
+                except Exception as e:
+                    yield zone, None, e
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix) as executor:
+            pending = {}
+            queue = iter(zones)
+            while True:
+                for zone in queue:
+                    pending[executor.submit(func, zone)] = zone
+                    if len(pending) >= workers * 4:
+                        break
+                if not pending:
+                    break
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    zone = pending.pop(future)
+                    done += 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield zone, None, e
+                        continue
+                    yield zone, result, None
+
+                now = time.monotonic()
+                if now - last_report >= report_interval:
+                    last_report = now
+                    logger.info("{} {}/{} zones ({:.0f} zones/s), {} configured".format(
+                        what, done, len(zones), done / (now - start), len(self._domains)))
+
+    def _read_zone(self, zone, known_hash=None):
+        """
+        Gets all domain metadata of ``zone`` in one request
+
+        :param str zone: The zone id
+        :param bytes known_hash: The hash of the config that is loaded already
+        :return: A tuple of the hash of the keyroller config (None if there is none) and the
+                 :class:`pdnskeyroller.keyrollerdomain.KeyrollerDomain`, None when unconfigured or when the config
+                 hash equals ``known_hash``
+        :rtype: tuple
+        """
+        # This is how changes made by others are noticed, a cached response would hide them
+        self._api._invalidate(zone)
+        metadata = self._api.get_zone_metadata(zone)
+        config = [m for m in metadata if m.kind.upper() == PDNSKEYROLLER_CONFIG_metadata_kind]
+        if not config or config[0].empty():
+            return None, None
+        config_hash = pdnskeyroller.statestore.config_hash(config[0].metadata)
+        if config_hash == known_hash:
+            return config_hash, None
+        return config_hash, pdnskeyroller.keyrollerdomain.from_metadata(zone, self._api, metadata, store=self._store)
+
+    def _stored_zone(self, zone, config_hash=None, keyrollerdomain=None):
+        if keyrollerdomain is None:
+            return pdnskeyroller.statestore.StoredZone(zone, self._serials.get(zone), None, None, None, None)
+        return pdnskeyroller.statestore.StoredZone(zone, self._serials.get(zone), config_hash,
+                                                    str(keyrollerdomain.config), str(keyrollerdomain.state),
+                                                    keyrollerdomain.next_action_datetime)
+
+    def _restore_domains(self, full=False):
+        """
+        Takes the configuration and state of every zone whose SOA serial did not change since it was stored from the
+        local store, see :mod:`pdnskeyroller.statestore`
+
+        :param bool full: Restore nothing, only forget the zones that no longer exist
+        :return: The zones whose metadata has to be read from the API, all zones when there is no store or when
+                 ``full`` is set
+        :rtype: list(str)
+        """
+        if self._store is None:
+            return list(self._serials)
+
+        start = time.monotonic()
+        stored = self._store.zones()
+        self._store.forget([zone for zone in stored if zone not in self._serials])
+        if full:
+            return list(self._serials)
+        to_read = []
+        for zone, serial in self._serials.items():
+            row = stored.get(zone)
+            if row is None or row.serial is None or row.serial != serial:
+                to_read.append(zone)
                 continue
+            if row.config is None:
+                continue
+            metadata = [ZoneMetadata(PDNSKEYROLLER_CONFIG_metadata_kind, [row.config])]
+            if row.state is not None:
+                metadata.append(ZoneMetadata(PDNSKEYROLLER_STATE_metadata_kind, [row.state]))
+            try:
+                self._domains[zone] = pdnskeyroller.keyrollerdomain.from_metadata(zone, self._api, metadata,
+                                                                                  store=self._store)
             except Exception as e:
-                logger.error("Unable to load informations for zone {}".format(zone.id))
+                logger.warning("Unable to restore {} from {}, reading it from the API: {}".format(
+                    zone, self._store.path, e))
+                to_read.append(zone)
                 continue
+            self._config_hashes[zone] = row.config_hash
+
+        logger.info("Restored {} configured zones from {} in {:.1f}s, {} of {} zones changed since".format(
+            len(self._domains), self._store.path, time.monotonic() - start, len(to_read), len(self._serials)))
+        return to_read
+
+    def _load_domains(self, zones):
+        """
+        Loads the configuration and state of all zones concurrently. Zones without a keyroller configuration are skipped.
+
+        :param list zones: The zone ids
+        """
+        start = time.monotonic()
+        done = 0
+        errors = 0
+        stored = []
+        for zone, result, error in self._map_zones(self._read_zone, zones, 'Loaded'):
+            done += 1
+            if error is not None:
+                errors += 1
+                logger.error("Unable to load informations for zone {}: {}".format(zone, error))
+                continue
+            config_hash, zoneconf = result
+            if self._store is not None:
+                stored.append(self._stored_zone(zone, config_hash, zoneconf))
+            if zoneconf is None:
+                logger.debug("No config found for zone {}".format(zone))
+                continue
+            self._domains[zone] = zoneconf
+            self._config_hashes[zone] = config_hash
+        if self._store is not None:
+            self._store.put_zones(stored)
+
+        duration = time.monotonic() - start
+        logger.info("Loaded {} zones in {:.1f}s ({:.0f} zones/s): {} configured, {} errors".format(
+            done, duration, done / duration if duration else 0, len(self._domains), errors))
 
     def _load_config(self):
         # These are all the Defaults
         tmp_conf = {
             'keyroller': {
                 'loglevel': 'info',
+                'workers': 10,
+                'concurrency': 10,
+                'state_db': None,
+                'retry_interval': 300,
+                'reload_interval': 300,
+                'full_reload_interval': 3600,
             },
             'API': {
                 'version': 1,
@@ -67,53 +286,382 @@ class Daemon:
         return tmp_conf
 
     def _get_actionable_domains(self):
-        now = datetime.datetime.now()
+        now = clock.now()
         return [zone for zone, domainconf in self._domains.items() if
                 domainconf.next_action_datetime and domainconf.next_action_datetime <= now]
 
-    def update_config(self):
+    def update_config(self, full=False):
         """
-        Should be called when we want to update the config of a running instance (not implemented)
+        Picks up zones that were added, removed, configured or reconfigured since the last (re)load, without touching
+        the in-memory state of the other zones.
 
-        :return:
+        The zone list is fetched and compared with the previous one. Only new zones and zones whose SOA serial changed
+        have their metadata read. The config of a zone is only parsed again when its hash changed, a changed config
+        replaces the config of the domain but keeps its state. Changing domain metadata does not change the serial, so
+        a ``full`` reload reads the metadata of all zones.
+
+        The state of the zones whose KSK roll is waiting for the DS is re-read on every reload: only the operator moves
+        those rolls on (``pdns-keyroller-ctl roll step``), which changes neither the serial nor the config.
+
+        :param bool full: Read the metadata of all zones, not just the changed ones
         """
-        pass
+        start = time.monotonic()
+        listed = {zone.id: zone.serial for zone in self._api.get_zones()}
+
+        removed = [zone for zone in self._serials if zone not in listed]
+        for zone in removed:
+            self._forget(zone)
+        candidates = [zone for zone, serial in listed.items() if full or self._serials.get(zone) != serial]
+        self._serials = listed
+
+        added = changed = unconfigured = errors = 0
+        # For the local store: the zones whose serial changed without a change of their keyroller config and the zones
+        # that need a new row
+        unchanged = {}
+        stored = []
+        # The zones whose state was just read
+        fresh = set()
+        now = clock.now()
+        for zone, result, error in self._map_zones(lambda zone: self._read_zone(zone, self._config_hashes.get(zone)),
+                                                   candidates, 'Reloaded'):
+            if error is not None:
+                errors += 1
+                # Try again on the next reload
+                self._serials[zone] = None
+                logger.error("Unable to reload informations for zone {}: {}".format(zone, error))
+                continue
+            config_hash, zoneconf = result
+            if config_hash is None:
+                if self._store is not None:
+                    stored.append(self._stored_zone(zone))
+                if zone in self._domains:
+                    unconfigured += 1
+                    logger.info("{} is no longer configured for automatic keyrolls".format(zone))
+                    self._forget(zone)
+                continue
+            if zoneconf is None:
+                unchanged[zone] = listed[zone]
+                continue
+            current = self._domains.get(zone)
+            if current is None:
+                added += 1
+                logger.info("{} is now configured for automatic keyrolls".format(zone))
+                self._domains[zone] = current = zoneconf
+                fresh.add(zone)
+            else:
+                changed += 1
+                logger.info("The configuration of {} changed".format(zone))
+                current.config = zoneconf.config
+            self._config_hashes[zone] = config_hash
+            if self._store is not None:
+                stored.append(self._stored_zone(zone, config_hash, current))
+            self._schedule(zone, now)
+
+        waiting = [zone for zone, keyrollerdomain in self._domains.items() if zone not in fresh and
+                   keyrollerdomain.state.is_rolling and keyrollerdomain.state.current_roll.is_waiting_ds()]
+        stepped = 0
+        for zone, result, error in self._map_zones(lambda zone: self._domains[zone].reload_state(), waiting,
+                                                   'Re-read the state of'):
+            if error is not None:
+                errors += 1
+                logger.error("Unable to reload the state of {}: {}".format(zone, error))
+                continue
+            if result:
+                stepped += 1
+                logger.info("The {} roll was stepped, now at step {}".format(zone, self._domains[zone].current_step_name))
+                self._schedule(zone, now)
+
+        if self._store is not None:
+            self._store.forget(removed)
+            self._store.set_serials(unchanged)
+            self._store.put_zones(stored)
+
+        logger.info("Reloaded {} of {} zones in {:.1f}s: {} added, {} reconfigured, {} unconfigured, {} removed, {} of {} "
+                    "waiting rolls stepped, {} errors".format(len(candidates), len(listed), time.monotonic() - start,
+                                                              added, changed, unconfigured, len(removed), stepped,
+                                                              len(waiting), errors))
+
+    def request_reload(self):
+        """
+        Makes :meth:`run_forever` do a full :meth:`update_config` before its next tick, e.g. on SIGHUP
+        """
+        self._reload_requested.set()
+        self._wakeup.set()
+
+    def _forget(self, zone):
+        self._domains.pop(zone, None)
+        self._config_hashes.pop(zone, None)
+        # Its heap entry is now stale
+        self._deadlines.pop(zone, None)
 
     def run(self):
+        """
+        Acts on all domains that are due once
+
+        :return: The outcome, None if no domain was due
+        :rtype: Tick
+        """
         actionable_domains = self._get_actionable_domains()
-        now = datetime.datetime.now()
+        now = clock.now()
         logger.debug("Found {} domain(s) ({} actionable)".format(len(self._domains), len(actionable_domains)))
 
-
         if len(actionable_domains) > 0:
-            for domain in actionable_domains:
-                keyrollerdomain = self._domains[domain]
-                if keyrollerdomain.state.is_rolling:
-                    try:
-                        logger.info("Moving to step {} for {} roll".format(keyrollerdomain.current_step_name, keyrollerdomain.zone))
-                        keyrollerdomain.step()
-                    except Exception as e:
-                        logger.error("Unable to advance keyroll: {}".format(e))
+            return self._act_all(actionable_domains, now)
+        logger.info("No action taken")
+        return None
+
+    def _act_exclusive(self, zone, now):
+        """
+        Acts on ``zone`` unless another thread is doing so already or it is no longer configured
+
+        :param str zone: The zone
+        :param datetime.datetime now: The current time
+        :return: Whether the action succeeded and how many seconds it took, None if the zone was skipped
+        :rtype: tuple
+        """
+        keyrollerdomain = self._domains.get(zone)
+        if keyrollerdomain is None:
+            return None
+        with self._busy_lock:
+            if zone in self._busy:
+                logger.debug("Skipping {}, it is being acted on already".format(zone))
+                return None
+            self._busy.add(zone)
+        try:
+            start = time.monotonic()
+            ok = self._act(keyrollerdomain, now)
+            return ok, time.monotonic() - start
+        finally:
+            with self._busy_lock:
+                self._busy.discard(zone)
+
+    def _act_all(self, zones, now, done=None):
+        """
+        Acts on ``zones`` using at most ``concurrency`` threads
+
+        :param list zones: The due zones
+        :param datetime.datetime now: The time the zones were found due at
+        :param done: A function that is called with every zone when it is done (or skipped), in the calling thread
+        :return: The outcome
+        :rtype: Tick
+        """
+        start = time.monotonic()
+        zones = list(dict.fromkeys(zones))
+        failed = []
+        skipped = 0
+        act_duration_sum = act_duration_max = 0.0
+        slowest = None
+        for zone, result, error in self._map_zones(lambda zone: self._act_exclusive(zone, now), zones, 'Acted on',
+                                                   workers=max(1, min(self._concurrency, len(zones))),
+                                                   thread_name_prefix='roller'):
+            if error is not None:
+                logger.error("Unable to act on {}: {}".format(zone, error))
+                failed.append(zone)
+            elif result is None:
+                skipped += 1
+            else:
+                ok, duration = result
+                if not ok:
+                    failed.append(zone)
+                act_duration_sum += duration
+                if duration >= act_duration_max:
+                    act_duration_max = duration
+                    slowest = zone
+            if done is not None:
+                done(zone)
+
+        tick = Tick(now, time.monotonic() - start, len(zones), len(failed), skipped, failed, act_duration_sum,
+                    act_duration_max, slowest)
+        log = logger.error if failed else logger.info
+        log("Acted on {} domain(s) in {:.3f}s: {} error(s), {} skipped, slowest {} ({:.3f}s)".format(
+            tick.due, tick.duration, tick.errors, tick.skipped, tick.slowest, tick.act_duration_max))
+        if failed:
+            logger.error("Failed domain(s): {}".format(', '.join(failed[:20]) + (', ...' if len(failed) > 20 else '')))
+        return tick
+
+    def _act(self, keyrollerdomain, now):
+        """
+        Steps the roll of a due domain, or starts a new one
+
+        :param pdnskeyroller.keyrollerdomain.KeyrollerDomain keyrollerdomain: The domain
+        :param datetime.datetime now: The current time
+        :return: False if anything failed
+        :rtype: bool
+        """
+        # Whatever the roll reads from the zone is fetched once for this tick
+        snapshot = ZoneSnapshot(keyrollerdomain.zone, keyrollerdomain.api)
+        if keyrollerdomain.state.is_rolling and keyrollerdomain.state.current_roll.is_waiting_ds():
+            # Only the operator moves this roll on (pdns-keyroller-ctl roll step), stepping it here would do nothing. Pick
+            # up what the operator wrote instead of overwriting it.
+            try:
+                if keyrollerdomain.reload_state():
+                    logger.info("The state of the {} roll was changed, now at step {}".format(
+                        keyrollerdomain.zone, keyrollerdomain.current_step_name))
                 else:
-                    next_ksk_roll = keyrollerdomain.next_ksk_roll()
-                    next_zsk_roll = keyrollerdomain.next_zsk_roll()
-                    if next_zsk_roll is not None and next_zsk_roll <= now:
-                        try:
-                            logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "ZSK", keyrollerdomain.zone, keyrollerdomain.config.zsk_algo))
-                            roll = PrePublishKeyRoll()
-                            roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'zsk', keyrollerdomain.config.zsk_algo)
-                            keyrollerdomain.state.current_roll = roll
-                            domainstate.to_api(keyrollerdomain.zone, keyrollerdomain.api, keyrollerdomain.state)
-                        except Exception as e:
-                            logger.error("Unable to start keyroll: {}".format(e))
-                    elif next_ksk_roll is not None and next_ksk_roll <= now:
-                        try:
-                            logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "KSK", keyrollerdomain.zone, keyrollerdomain.config.zsk_algo))
-                            roll = PrePublishKeyRoll()
-                            roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'ksk', keyrollerdomain.config.ksk_algo)
-                            keyrollerdomain.state.current_roll = roll
-                            domainstate.to_api(keyrollerdomain.zone, keyrollerdomain.api, keyrollerdomain.state)
-                        except Exception as e:
-                            logger.error("Unable to start keyroll: {}".format(e))
+                    logger.debug("{} is waiting for the DS of the new KSK".format(keyrollerdomain.zone))
+            except Exception as e:
+                logger.error("Unable to reload the state of {}: {}".format(keyrollerdomain.zone, e))
+                return False
+        elif keyrollerdomain.state.is_rolling:
+            try:
+                logger.info("Moving to step {} for {} roll".format(keyrollerdomain.current_step_name, keyrollerdomain.zone))
+                keyrollerdomain.step(snapshot=snapshot)
+            except Exception as e:
+                logger.error("Unable to advance keyroll: {}".format(e))
+                return False
         else:
-            logger.info("No action taken")
+            next_ksk_roll = keyrollerdomain.next_ksk_roll()
+            next_zsk_roll = keyrollerdomain.next_zsk_roll()
+            if next_zsk_roll is not None and next_zsk_roll <= now:
+                try:
+                    logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "ZSK", keyrollerdomain.zone, keyrollerdomain.config.zsk_algo))
+                    roll = PrePublishKeyRoll()
+                    roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'zsk', keyrollerdomain.config.zsk_algo,
+                                  snapshot=snapshot)
+                    keyrollerdomain.state.current_roll = roll
+                    keyrollerdomain.save()
+                except Exception as e:
+                    logger.error("Unable to start keyroll: {}".format(e))
+                    return False
+            elif next_ksk_roll is not None and next_ksk_roll <= now:
+                try:
+                    logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "KSK", keyrollerdomain.zone, keyrollerdomain.config.ksk_algo))
+                    roll = PrePublishKeyRoll()
+                    roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'ksk', keyrollerdomain.config.ksk_algo,
+                                  snapshot=snapshot)
+                    keyrollerdomain.state.current_roll = roll
+                    keyrollerdomain.save()
+                except Exception as e:
+                    logger.error("Unable to start keyroll: {}".format(e))
+                    return False
+        return True
+
+    def _schedule(self, zone, now, acted=False):
+        """
+        (Re)schedules ``zone`` at its next action. A zone that is still due right after acting on it (e.g. a KSK roll
+        waiting for the DS, or a failed action) is retried after the retry interval instead.
+
+        :param str zone: The zone
+        :param datetime.datetime now: The current time
+        :param bool acted: Whether the zone was just acted on
+        """
+        keyrollerdomain = self._domains.get(zone)
+        deadline = keyrollerdomain.next_action_datetime if keyrollerdomain is not None else None
+        if deadline is None:
+            self._deadlines.pop(zone, None)
+            return
+        if acted and deadline <= now:
+            deadline = now + datetime.timedelta(seconds=self._retry_interval)
+        self._deadlines[zone] = deadline
+        heapq.heappush(self._heap, (deadline, zone))
+
+    def _build_schedule(self):
+        start = time.monotonic()
+        now = clock.now()
+        self._heap = []
+        self._deadlines = {}
+        for zone, keyrollerdomain in self._domains.items():
+            deadline = keyrollerdomain.next_action_datetime
+            if deadline is not None:
+                self._deadlines[zone] = deadline
+                self._heap.append((deadline, zone))
+        heapq.heapify(self._heap)
+        self._scheduled = True
+        logger.info("Scheduled {} of {} domain(s) in {:.1f}s".format(
+            len(self._heap), len(self._domains), time.monotonic() - start))
+
+    def _pop_due(self, now):
+        """
+        :return: The zones whose deadline has passed, entries that were rescheduled since they were pushed are skipped
+        :rtype: list(str)
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, zone = heapq.heappop(self._heap)
+            if self._deadlines.get(zone) == deadline:
+                del self._deadlines[zone]
+                due.append(zone)
+        return due
+
+    def tick(self):
+        """
+        Acts on all due domains and reschedules them. All domains are scheduled on the first tick.
+
+        :return: The number of seconds until the next deadline, None if nothing is scheduled
+        :rtype: float
+        """
+        if not self._scheduled:
+            self._build_schedule()
+        now = clock.now()
+        due = self._pop_due(now)
+
+        if due:
+            tick = self._act_all(due, now, done=lambda zone: self._schedule(zone, clock.now(), acted=True))
+            self._ticks.append(tick)
+            self._tick_count += 1
+            self._tick_duration_sum += tick.duration
+            self._tick_duration_max = max(self._tick_duration_max, tick.duration)
+
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, (self._heap[0][0] - clock.now()).total_seconds())
+
+    def run_forever(self, max_sleep=60):
+        """
+        Keeps running until :meth:`stop` is called, acting on domains as they become due. Only the due domains are
+        looked at, so a tick costs O(k log n) for k due domains out of n. Configuration changes are picked up every
+        ``reload_interval`` seconds, a full reload is done every ``full_reload_interval`` seconds and when
+        :meth:`request_reload` is called.
+
+        :param float max_sleep: Never sleep longer than this many seconds, so changes of the wall clock are noticed
+        """
+        self._stop.clear()
+        self._build_schedule()
+        last_reload = last_full_reload = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            full = self._reload_requested.is_set() or \
+                bool(self._full_reload_interval and now - last_full_reload >= self._full_reload_interval)
+            if full or self._reload_interval and now - last_reload >= self._reload_interval:
+                self._reload_requested.clear()
+                try:
+                    self.update_config(full=full)
+                except Exception as e:
+                    logger.error("Unable to reload the configuration: {}".format(e))
+                last_reload = now
+                if full:
+                    last_full_reload = now
+
+            wait = self.tick()
+            if wait is None or wait > max_sleep:
+                wait = max_sleep
+            if self._reload_interval:
+                wait = min(wait, max(0.0, last_reload + self._reload_interval - time.monotonic()))
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def stop(self):
+        """
+        Makes :meth:`run_forever` return after the current tick
+        """
+        self._stop.set()
+        self._wakeup.set()
+
+    def metrics(self):
+        """
+        :return: Counters for the ticks of :meth:`run_forever` that acted on at least one domain, and the most recent
+                 ticks
+        :rtype: dict
+        """
+        return {
+            'domains': len(self._domains),
+            'scheduled': len(self._deadlines),
+            'next_deadline': self._heap[0][0] if self._heap else None,
+            'ticks': self._tick_count,
+            'tick_duration_sum': self._tick_duration_sum,
+            'tick_duration_max': self._tick_duration_max,
+            'tick_duration_avg': self._tick_duration_sum / self._tick_count if self._tick_count else 0.0,
+            'recent_ticks': list(self._ticks),
+        }
@@ -20,9 +20,19 @@ def from_api(zone, api):
     if not isinstance(api, pdnsapi.api.PDNSApi):
         raise Exception('api is not a PDNSApi')
 
-    metadata = api.get_zone_metadata(zone, PDNSKEYROLLER_CONFIG_metadata_kind)
+    return from_metadata(zone, api.get_zone_metadata(zone, PDNSKEYROLLER_CONFIG_metadata_kind))
 
-    if metadata.empty():
+def from_metadata(zone, metadata):
+    """
+    Parses the keyroller configuration for zone ``zone`` from its domain metadata
+
+    :param string zone: The zone the metadata belongs to
+    :param pdnsapi.metadata.ZoneMetadata metadata: The X-PDNSKEYROLLER-CONFIG metadata, or None if the zone has none
+    :return: The configuration
+    :rtype: :class:`DomainConfig`
+    :raises: FileNotFoundError if ``zone`` does not have a roller config
+    """
+    if metadata is None or metadata.empty():
         raise FileNotFoundError
 
     if len(metadata.metadata) > 1:
@@ -35,12 +45,13 @@ def from_api(zone, api):
 
     return DomainConfig(**state)
 
-def to_api(zone, api, config):
+def to_api(zone, api, config, store=None):
     """
 
     :param zone:
     :param api:
     :param config:
+    :param pdnskeyroller.statestore.StateStore store: Also write the configuration to this local store
     :return:
     """
     if not isinstance(api, pdnsapi.api.PDNSApi):
@@ -49,6 +60,8 @@ def to_api(zone, api, config):
         raise Exception('config must be a DomainConfig instance, not a {}'.format(type(config)))
 
     api.set_zone_metadata(zone, PDNSKEYROLLER_CONFIG_metadata_kind, str(config))
+    if store is not None:
+        store.put_config(zone, str(config))
 
 
 class DomainConfig:
@@ -22,13 +22,26 @@ def from_api(zone, api):
     """
     if not isinstance(api, pdnsapi.api.PDNSApi):
         raise Exception('api must be a PDNSApi instance, not a {}'.format(type(api)))
-    tmp_state = api.get_zone_metadata(zone, PDNSKEYROLLER_STATE_metadata_kind).metadata
+    return from_metadata(zone, api.get_zone_metadata(zone, PDNSKEYROLLER_STATE_metadata_kind))
+
+
+def from_metadata(zone, metadata):
+    """
+    Parses the keyroller state for ``zone`` from its domain metadata
+
+    :param string zone: The zone the metadata belongs to
+    :param pdnsapi.metadata.ZoneMetadata metadata: The X-PDNSKEYROLLER-STATE metadata, or None if the zone has none
+    :return: The state for ``zone``, an empty state if there is no metadata
+    :rtype: DomainState
+    :raises: ValueError if the JSON from the domain metadata cannot be unpacked
+    """
+    tmp_state = metadata.metadata if metadata is not None else []
 
     if not tmp_state:
         return DomainState()
 
     if len(tmp_state) > 1:
-        raise Exception('More than one {} metadata found!'.format(PDNSKEYROLLER_STATE_metadata_kind))
+        raise Exception('More than one {} metadata found for {}!'.format(PDNSKEYROLLER_STATE_metadata_kind, zone))
 
     try:
         state = json_tricks.loads(tmp_state[0])
@@ -38,12 +51,13 @@ def from_api(zone, api):
     return DomainState(**state)
 
 
-def to_api(zone, api, state):
+def to_api(zone, api, state, store=None):
     """
 
     :param zone:
     :param api:
     :param state:
+    :param pdnskeyroller.statestore.StateStore store: Also write the state to this local store
     :return:
     """
     if not isinstance(api, pdnsapi.api.PDNSApi):
@@ -56,6 +70,8 @@ def to_api(zone, api, state):
         state.current_roll = KeyRoll()
 
     api.set_zone_metadata(zone, PDNSKEYROLLER_STATE_metadata_kind, str(state))
+    if store is not None:
+        store.put_state(zone, str(state))
 
 
 class DomainState:
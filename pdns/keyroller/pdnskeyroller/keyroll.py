@@ -6,10 +6,10 @@ class KeyRoll:
     def initiate(self, zone, api, **kwargs):
         raise NotImplementedError()
 
-    def step(self, zone, api):
+    def step(self, zone, api, snapshot=None):
         raise NotImplementedError()
 
-    def validate(self, zone, api):
+    def validate(self, zone, api, snapshot=None):
         raise NotImplementedError()
 
     def __str__(self):
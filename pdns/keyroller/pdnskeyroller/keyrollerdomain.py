@@ -2,18 +2,55 @@ from pdnsapi.api import PDNSApi
 import logging
 import pdnskeyroller.domainconfig
 import pdnskeyroller.domainstate
+from pdnskeyroller import PDNSKEYROLLER_CONFIG_metadata_kind, PDNSKEYROLLER_STATE_metadata_kind
 from pytimeparse.timeparse import timeparse
 import datetime
 
 logger = logging.getLogger(__name__)
 
+
+def from_api(zone, api):
+    """
+    Loads the configuration and state of ``zone`` with a single request for all of its domain metadata
+
+    :param string zone: The zone to load
+    :param pdnsapi.api.PDNSApi api: The API to use
+    :return: The domain
+    :rtype: :class:`KeyrollerDomain`
+    :raises: FileNotFoundError if ``zone`` does not have a roller config
+    """
+    if not isinstance(api, PDNSApi):
+        raise Exception('api is not a PDNSApi')
+
+    return from_metadata(zone, api, api.get_zone_metadata(zone))
+
+
+def from_metadata(zone, api, metadata, store=None):
+    """
+    Creates the domain from all of its domain metadata
+
+    :param string zone: The zone
+    :param pdnsapi.api.PDNSApi api: The API the domain will use
+    :param list metadata: The :class:`pdnsapi.metadata.ZoneMetadata` of the zone
+    :param pdnskeyroller.statestore.StateStore store: The local store the domain writes its state to as well
+    :return: The domain
+    :rtype: :class:`KeyrollerDomain`
+    :raises: FileNotFoundError if ``zone`` does not have a roller config
+    """
+    metadata = {m.kind.upper(): m for m in metadata}
+    config = pdnskeyroller.domainconfig.from_metadata(zone, metadata.get(PDNSKEYROLLER_CONFIG_metadata_kind))
+    state = pdnskeyroller.domainstate.from_metadata(zone, metadata.get(PDNSKEYROLLER_STATE_metadata_kind))
+    return KeyrollerDomain(zone, api, config, state, store=store)
+
+
 class KeyrollerDomain:
-    def __init__(self, zone, api, config=None, state=None):
+    def __init__(self, zone, api, config=None, state=None, store=None):
         if not isinstance(api, PDNSApi):
             raise Exception('api is not a PDNSApi')
 
         self.zone = zone
         self.api = api
+        self.store = store
         if not config:
             config = pdnskeyroller.domainconfig.from_api(zone, api)
 
@@ -48,11 +85,49 @@ class KeyrollerDomain:
             return None
         return self.state.current_roll.current_step_name
 
-    def step(self, force=False, customttl=0):
+    def step(self, force=False, customttl=0, snapshot=None):
+        """
+        Performs the next step of the current roll. The state is only written when the step changed it, so a step that
+        has to wait does not overwrite what was written by others in the meantime.
+
+        :return: Whether the state changed
+        :rtype: bool
+        """
         if not self.state.is_rolling:
-            return
-        self.state.current_roll.step(self.zone, self.api, force, customttl)
-        pdnskeyroller.domainstate.to_api(self.zone, self.api, self.state)
+            return False
+        before = str(self.state)
+        self.state.current_roll.step(self.zone, self.api, force, customttl, snapshot=snapshot)
+        if str(self.state) == before:
+            return False
+        self.save()
+        return True
+
+    def reload_state(self):
+        """
+        Reads the state from the domain metadata again, to pick up changes made by others (e.g.
+        ``pdns-keyroller-ctl roll step``), bypassing the response cache of the API. The local store is updated when the
+        state changed.
+
+        :return: Whether the state changed
+        :rtype: bool
+        """
+        self.api._invalidate(self.zone)
+        state = pdnskeyroller.domainstate.from_api(self.zone, self.api)
+        if str(state) == str(self.state):
+            return False
+        self.state = state
+        if self.store is not None:
+            self.store.put_state(self.zone, str(state))
+            self.store.set_next_actions({self.zone: self.next_action_datetime})
+        return True
+
+    def save(self):
+        """
+        Writes the state to the domain metadata, and to the local store if there is one
+        """
+        pdnskeyroller.domainstate.to_api(self.zone, self.api, self.state, store=self.store)
+        if self.store is not None:
+            self.store.set_next_actions({self.zone: self.next_action_datetime})
 
     @property
     def next_action_datetime(self):
@@ -1,8 +1,10 @@
 import pdnsapi.api
 import json_tricks.nonp as json_tricks
-from pdnskeyroller.util import (get_keys_of_type, DNSKEY_ALGO_TO_MNEMONIC, DNSKEY_MNEMONIC_TO_ALGO, validate_api)
+from pdnskeyroller.util import (DNSKEY_ALGO_TO_MNEMONIC, DNSKEY_MNEMONIC_TO_ALGO, validate_api)
 from datetime import datetime, timedelta
+from pdnskeyroller import clock
 from pdnskeyroller.keyroll import KeyRoll
+from pdnskeyroller.snapshot import ZoneSnapshot
 
 _step_to_name = {
     0: 'initial',
@@ -18,13 +20,15 @@ class PrePublishKeyRoll(KeyRoll):
         self.current_step = kwargs.get('current_step', 0)
         self.complete = kwargs.get('complete', False)
         self.step_datetimes = list(map(lambda x: datetime.fromtimestamp(x), kwargs.get('step_datetimes', [])))
-        self.current_step_datetime = datetime.fromtimestamp(kwargs.get('current_step_datetime', datetime.now().timestamp()))
+        self.current_step_datetime = datetime.fromtimestamp(kwargs.get('current_step_datetime', clock.now().timestamp()))
         self.keytype = kwargs.get('keytype')
         self.algo = kwargs.get('algo')
         self.old_keyids = kwargs.get('old_keyids')
         self.new_keyid = kwargs.get('new_keyid')
+        self.max_ttl = kwargs.get('max_ttl')
+        self.max_ttl_serial = kwargs.get('max_ttl_serial')
 
-    def initiate(self, zone, api, keytype, algo, bits=None, published=True):
+    def initiate(self, zone, api, keytype, algo, bits=None, published=True, snapshot=None):
         """
         Initiate a pre-publish rollover (:rfc:`RFC 6781 §4.1.1.1 <6781#section-4.1.1.1>`) for the ``keytype`` key of algorithm
     ``algo`` for ``zone``.
@@ -36,6 +40,8 @@ class PrePublishKeyRoll(KeyRoll):
         :param string keytype: The keytype to roll, must be one of 'ksk', 'zsk' or 'csk'
         :param string algo: The algorithm to roll the ``keytype`` for
         :param int bits: If needed, use this many bits for the new key for ``algo``
+        :param pdnskeyroller.snapshot.ZoneSnapshot snapshot: The snapshot of ``zone`` to read from and write through,
+                                                              a new one is made when not given
         """
         if self.started:
             raise Exception('Already rolling the {} for {}'.format(
@@ -46,7 +52,9 @@ class PrePublishKeyRoll(KeyRoll):
         if keytype not in ('ksk', 'zsk'):
             raise Exception('Invalid key type: {}'.format(keytype))
 
-        current_keys = get_keys_of_type(zone, api, keytype)
+        if snapshot is None:
+            snapshot = ZoneSnapshot(zone, api)
+        current_keys = snapshot.keys_of_type(keytype)
         algo = DNSKEY_ALGO_TO_MNEMONIC.get(algo, algo)
         if not current_keys:
             raise Exception('There are no keys of type {} in zone {}, cannot roll!'.format(keytype, zone))
@@ -57,41 +65,46 @@ class PrePublishKeyRoll(KeyRoll):
         published = True
         if keytype == "zsk":
             active = False
-        new_key = api.add_cryptokey(zone, keytype, active=active, algo=algo, bits=bits, published=published)
+        new_key = snapshot.add_cryptokey(keytype, active=active, algo=algo, bits=bits, published=published)
         self.current_step = 1
         self.complete = False
-        self.step_datetimes = [datetime.now()]
+        self.step_datetimes = [clock.now()]
         self.keytype = keytype
         self.algo = algo
         self.old_keyids = [k.id for k in current_keys if k.algo == algo and k.keytype == keytype]
         self.new_keyid = new_key.id
-        httl = self._get_highest_ttl(zone, api)
-        self.current_step_datetime = datetime.now() + timedelta(seconds=httl)
+        httl = self._get_highest_ttl(snapshot)
+        self.current_step_datetime = clock.now() + timedelta(seconds=httl)
 
-        api.bump_soa(zone);
+        snapshot.bump_soa()
+        self._remember_highest_ttl(snapshot)
 
-    def _get_highest_ttl(self, zone, api, zoneobject=None):
-        if zoneobject is None:
-            zoneobject = api.get_zone(zone)
-        httl = 0
-        for rrset in zoneobject.rrsets:
-            httl = max(rrset.ttl, httl)
+    def _get_highest_ttl(self, snapshot):
+        # The zone is only scanned again when its serial moved since the summary in our state was made
+        if self.max_ttl is not None:
+            snapshot.remember_ttl(self.max_ttl_serial, self.max_ttl)
+        return snapshot.max_ttl
 
-        return httl
+    def _remember_highest_ttl(self, snapshot):
+        self.max_ttl_serial, self.max_ttl = snapshot.ttl_summary
 
     def is_waiting_ds(self):
         return self.started and self.keytype == "ksk" and self.current_step == 1
 
-    def step(self, zone, api, force=False, customttl=0):
+    def step(self, zone, api, force=False, customttl=0, snapshot=None):
         """
         Perform the next step in the keyroll
 
         :param string zone: The zone we are rolling for
         :param pdnsapi.api.PDNSApi api: The API endpoint to use
+        :param pdnskeyroller.snapshot.ZoneSnapshot snapshot: The snapshot of ``zone`` to read from and write through,
+                                                              a new one is made when not given
         :raises: Exception when a sanity check fails
         """
         validate_api(api)
-        if not self.validate(zone, api):
+        if snapshot is None:
+            snapshot = ZoneSnapshot(zone, api)
+        if not self.validate(zone, api, snapshot=snapshot):
             raise Exception('Keys for zone {}  do not match keys initially found. Refusing to continue'.format(zone))
 
         if not self.started:
@@ -99,66 +112,71 @@ class PrePublishKeyRoll(KeyRoll):
                 self.current_step_name))
 
         # make sure we are passed the expected datetime
-        if self.current_step_datetime > datetime.now():
+        if self.current_step_datetime > clock.now():
             return
 
         if self.current_step == 1:
             if self.keytype == "zsk":
                 # activate the new keys and deactivate the old ones
-                api.set_cryptokey_active(zone, self.new_keyid, active=True)
+                snapshot.set_cryptokey_active(self.new_keyid, active=True)
                 for keyid in self.old_keyids:
-                    api.set_cryptokey_active(zone, keyid, active=False)
+                    snapshot.set_cryptokey_active(keyid, active=False)
 
-                api.bump_soa(zone);
+                # Key changes do not touch the TTLs, reading them first also gets the SOA for the bump
+                httl = self._get_highest_ttl(snapshot)
+                snapshot.bump_soa()
+                self._remember_highest_ttl(snapshot)
 
-                httl = self._get_highest_ttl(zone, api)
-                self.current_step_datetime = datetime.now() + timedelta(seconds=httl)
-                self.step_datetimes.append(datetime.now())
+                self.current_step_datetime = clock.now() + timedelta(seconds=httl)
+                self.step_datetimes.append(clock.now())
                 self.current_step = 2
 
             elif self.keytype == "ksk":
                 if force == True and isinstance(customttl, int):
-                    self.current_step_datetime = datetime.now() + timedelta(seconds=customttl)
-                    self.step_datetimes.append(datetime.now())
+                    self.current_step_datetime = clock.now() + timedelta(seconds=customttl)
+                    self.step_datetimes.append(clock.now())
                     self.current_step = 3
 
         elif self.current_step == 2:
             if self.keytype == "zsk":
                 # remove the old keys
                 for keyid in self.old_keyids:
-                    api.delete_cryptokey(zone, keyid)
-                api.bump_soa(zone);
+                    snapshot.delete_cryptokey(keyid)
+                snapshot.bump_soa()
                 # rollover is finished
                 self.complete = True
-                self.step_datetimes.append(datetime.now())
+                self.step_datetimes.append(clock.now())
 
 
         elif self.current_step == 3:
             if self.keytype == "ksk":
                 # remove the old keys
                 for keyid in self.old_keyids:
-                    api.delete_cryptokey(zone, keyid)
-                api.bump_soa(zone);
+                    snapshot.delete_cryptokey(keyid)
+                snapshot.bump_soa()
                 # rollover is finished
                 self.complete = True
-                self.step_datetimes.append(datetime.now())
+                self.step_datetimes.append(clock.now())
 
         else:
             raise Exception("Unknown step number {}".format(self.current_step))
 
-    def validate(self, zone, api):
+    def validate(self, zone, api, snapshot=None):
         """
         Checks if the current keys in the zone matches what we have
 
         :param string zone: The zone to check in
         :param pdnsapi.api.PDNSApi api: The API endpoint to use
+        :param pdnskeyroller.snapshot.ZoneSnapshot snapshot: The snapshot of ``zone`` to read the keys from
         :return: True if the keys in the zone indeed match, False otherwise
         :rtype: bool
         """
         validate_api(api)
+        if snapshot is None:
+            snapshot = ZoneSnapshot(zone, api)
         to_match = self.old_keyids.copy()
         to_match.append(self.new_keyid)
-        return all([k.id in to_match for k in api.get_cryptokeys(zone)
+        return all([k.id in to_match for k in snapshot.cryptokeys
                     if k.algo == self.algo and k.keytype == self.keytype])
 
     def __str__(self):
@@ -172,6 +190,8 @@ class PrePublishKeyRoll(KeyRoll):
             'algo': self.algo,
             'old_keyids': self.old_keyids,
             'new_keyid': self.new_keyid,
+            'max_ttl': self.max_ttl,
+            'max_ttl_serial': self.max_ttl_serial,
         })
     def __json_encode__(self):
         # should return primitive, serializable types like dict, list, int, string, float...
@@ -185,6 +205,8 @@ class PrePublishKeyRoll(KeyRoll):
             'algo': self.algo,
             'old_keyids': self.old_keyids,
             'new_keyid': self.new_keyid,
+            'max_ttl': self.max_ttl,
+            'max_ttl_serial': self.max_ttl_serial,
         }
 
     def __json_decode__(self, **kwargs):
@@ -192,11 +214,13 @@ class PrePublishKeyRoll(KeyRoll):
         self.current_step = kwargs.get('current_step', 0)
         self.complete = kwargs.get('complete', False)
         self.step_datetimes = list(map(lambda x: datetime.fromtimestamp(x), kwargs.get('step_datetimes', [])))
-        self.current_step_datetime = datetime.fromtimestamp(kwargs.get('current_step_datetime', datetime.now().timestamp()))
+        self.current_step_datetime = datetime.fromtimestamp(kwargs.get('current_step_datetime', clock.now().timestamp()))
         self.keytype = kwargs.get('keytype')
         self.algo = kwargs.get('algo')
         self.old_keyids = kwargs.get('old_keyids')
         self.new_keyid = kwargs.get('new_keyid')
+        self.max_ttl = kwargs.get('max_ttl')
+        self.max_ttl_serial = kwargs.get('max_ttl_serial')
 
     def __repr__(self):
         return 'PrePublishRoll({})'.format(
@@ -209,6 +233,8 @@ class PrePublishKeyRoll(KeyRoll):
                 ('algo', self.algo),
                 ('old_keyids', self.old_keyids),
                 ('new_keyid', self.new_keyid),
+                ('max_ttl', self.max_ttl),
+                ('max_ttl_serial', self.max_ttl_serial),
             ]]))
 
     @property
@@ -0,0 +1,161 @@
+from collections import namedtuple
+
+from pdnskeyroller.util import validate_api, validate_keytype
+
+TTLSummary = namedtuple('TTLSummary', ['serial', 'max_ttl'])
+TTLSummary.__doc__ = """
+The highest TTL in a zone, as it was at one SOA serial
+
+:param int serial: The SOA serial of the zone when it was scanned
+:param int max_ttl: The highest TTL of all RRSets in the zone
+"""
+
+
+class ZoneSnapshot:
+    """
+    What a keyroll reads from a zone during one tick: its cryptokeys, its SOA and the highest TTL in it. Each is
+    fetched at most once. The writes of the roll go through the snapshot as well, so whatever they make stale is
+    dropped and fetched again when needed.
+
+    The highest TTL needs a scan of the whole zone. A summary from an earlier tick can be handed in with
+    :meth:`remember_ttl`, it is used as long as the SOA serial did not change.
+
+    A new snapshot should be made for every tick, it never notices changes made by others.
+    """
+
+    def __init__(self, zone, api):
+        """
+        :param string zone: The zone
+        :param pdnsapi.api.PDNSApi api: The API endpoint to use
+        """
+        validate_api(api)
+        self.zone = zone
+        self.api = api
+        self._cryptokeys = None
+        self._soa = None
+        self._ttl_summary = None
+        self._ttl_checked = False
+
+    def __repr__(self):
+        return 'ZoneSnapshot("{}", {})'.format(self.zone, self.api)
+
+    @property
+    def cryptokeys(self):
+        """
+        :rtype: list(pdnsapi.cryptokey.CryptoKey)
+        """
+        if self._cryptokeys is None:
+            self._cryptokeys = self.api.get_cryptokeys(self.zone)
+        return self._cryptokeys
+
+    def keys_of_type(self, keytype):
+        """
+        :param string keytype: 'ksk', 'zsk' or 'csk'
+        :return: All the keys of the requested type
+        :rtype: list(pdnsapi.cryptokey.CryptoKey)
+        """
+        keytype = keytype.lower()
+        validate_keytype(keytype)
+        return [k for k in self.cryptokeys if k.keytype == keytype]
+
+    def _scan(self):
+        # Streamed, so a large zone is never held in memory as a whole
+        max_ttl = 0
+        soa = None
+        for rrset in self.api.iter_rrsets(self.zone):
+            max_ttl = max(rrset.ttl, max_ttl)
+            if rrset.rtype == 'SOA':
+                soa = rrset
+        if soa is None:
+            raise Exception('No SOA record in zone {}'.format(self.zone))
+        self._soa = soa
+        return TTLSummary(_serial(soa), max_ttl)
+
+    def remember_ttl(self, serial, max_ttl):
+        """
+        Hands in the highest TTL of the zone from an earlier scan. Ignored when the snapshot has a summary already.
+
+        :param int serial: The SOA serial of the zone at the time of the scan
+        :param int max_ttl: The highest TTL found
+        """
+        if self._ttl_summary is None:
+            self._ttl_summary = TTLSummary(serial, max_ttl)
+            self._ttl_checked = False
+
+    @property
+    def ttl_summary(self):
+        """
+        The highest TTL in the zone and the serial it belongs to. A remembered summary is checked against the current
+        SOA serial, the zone is only scanned when there is no summary or when the serial changed.
+
+        :rtype: TTLSummary
+        """
+        if self._ttl_summary is None or (not self._ttl_checked and self._ttl_summary.serial != self.serial):
+            self._ttl_summary = self._scan()
+        self._ttl_checked = True
+        return self._ttl_summary
+
+    @property
+    def max_ttl(self):
+        """
+        The highest TTL of all RRSets in the zone, see :attr:`ttl_summary`
+
+        :rtype: int
+        """
+        return self.ttl_summary.max_ttl
+
+    @property
+    def soa(self):
+        """
+        The SOA RRSet, taken from the zone contents if those were fetched already
+
+        :rtype: pdnsapi.zone.RRSet
+        """
+        if self._soa is None:
+            self._soa = self.api.get_rrset(self.zone, self.zone, 'SOA')
+            if self._soa is None:
+                raise Exception('No SOA record in zone {}'.format(self.zone))
+        return self._soa
+
+    @property
+    def serial(self):
+        """
+        :rtype: int
+        """
+        return _serial(self.soa)
+
+    def add_cryptokey(self, keytype, active, algo, bits=None, published=True):
+        """
+        See :meth:`pdnsapi.api.PDNSApi.add_cryptokey`
+        """
+        self._cryptokeys = None
+        return self.api.add_cryptokey(self.zone, keytype, active=active, algo=algo, bits=bits, published=published)
+
+    def set_cryptokey_active(self, keyid, active=True):
+        """
+        See :meth:`pdnsapi.api.PDNSApi.set_cryptokey_active`, the changed key is not read back
+        """
+        self._cryptokeys = None
+        self.api.set_cryptokey_active(self.zone, keyid, active=active, readback=False)
+
+    def delete_cryptokey(self, keyid):
+        """
+        See :meth:`pdnsapi.api.PDNSApi.delete_cryptokey`
+        """
+        self._cryptokeys = None
+        self.api.delete_cryptokey(self.zone, keyid)
+
+    def bump_soa(self):
+        """
+        Increases the SOA serial, using the SOA of the snapshot. The TTL summary moves along to the serial that was
+        sent, the bump does not change any TTL.
+        """
+        soa = self.soa
+        self._soa = None
+        new_serial = self.api.bump_soa(self.zone, readback=False, soa=soa)
+        if self._ttl_checked and self._ttl_summary.serial == _serial(soa):
+            self._ttl_summary = self._ttl_summary._replace(serial=new_serial)
+
+
+def _serial(soa):
+    return int(soa.records[0].content.split(' ')[2])
@@ -0,0 +1,200 @@
+"""
+An optional local copy of the keyroller configuration and state of every zone, in an SQLite database.
+
+The domain metadata stays authoritative: :func:`pdnskeyroller.domainconfig.to_api` and
+:func:`pdnskeyroller.domainstate.to_api` write the metadata first and then the store. The daemon records the SOA serial
+every zone had when its metadata was read, and on startup only reads the metadata of zones whose serial changed since.
+Metadata changed by other tools than the keyroller does not change the serial. Such changes are noticed on the next
+full reload of a resident daemon.
+
+The next action of every configured zone is kept in an indexed column, so :meth:`StateStore.due` needs no API requests.
+"""
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS zones (
+    zone TEXT PRIMARY KEY,
+    serial INTEGER,
+    config_hash BLOB,
+    config TEXT,
+    state TEXT,
+    next_action REAL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS zones_next_action ON zones (next_action) WHERE next_action IS NOT NULL;
+"""
+
+StoredZone = namedtuple('StoredZone', ['zone', 'serial', 'config_hash', 'config', 'state', 'next_action'])
+StoredZone.__doc__ = """
+What the store knows about one zone
+
+:param str zone: The zone id
+:param int serial: The SOA serial of the zone when its metadata was last read, None if unknown
+:param bytes config_hash: See :func:`config_hash`, None for zones without a keyroller configuration
+:param str config: The X-PDNSKEYROLLER-CONFIG metadata, None for zones without a keyroller configuration
+:param str state: The X-PDNSKEYROLLER-STATE metadata, None if there is none
+:param datetime.datetime next_action: When the zone is due next, None if never
+"""
+
+
+def config_hash(metadata):
+    """
+    :param list(str) metadata: The X-PDNSKEYROLLER-CONFIG metadata of a zone
+    :return: A hash of the configuration, to notice changes without parsing it
+    :rtype: bytes
+    """
+    return hashlib.blake2b('\0'.join(metadata).encode(), digest_size=16).digest()
+
+
+def _timestamp(when):
+    return when.timestamp() if when is not None else None
+
+
+def _stored_zone(row):
+    zone, serial, hash_, config, state, next_action = row
+    return StoredZone(zone, serial, hash_, config, state,
+                      datetime.fromtimestamp(next_action) if next_action is not None else None)
+
+
+class StateStore:
+    """
+    See the module documentation. One store can be used from several threads, writes are serialized.
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: The database file, it is created if it does not exist
+        :raises: ValueError if the database was made by an incompatible version
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit, transactions are started explicitly where several rows are written
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            # Readers (e.g. pdns-keyroller-ctl) do not block the daemon writing and vice versa
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                self._conn.close()
+                raise ValueError('{} has schema version {}, expected {}'.format(path, version, SCHEMA_VERSION))
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+
+    def __repr__(self):
+        return '{}.StateStore("{}")'.format(__name__, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, sql, rows):
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(sql, rows)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def put_zones(self, zones):
+        """
+        Replaces everything known about ``zones``, in one transaction
+
+        :param zones: An iterable of :class:`StoredZone`
+        """
+        now = time.time()
+        self._write('INSERT OR REPLACE INTO zones (zone, serial, config_hash, config, state, next_action, updated) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ((z.zone, z.serial, z.config_hash, z.config, z.state, _timestamp(z.next_action), now)
+                     for z in zones))
+
+    def put_config(self, zone, config):
+        """
+        Records a new keyroller configuration for ``zone``. The serial is cleared, so the daemon reads all metadata of
+        the zone once more on its next start.
+
+        :param str zone: The zone id
+        :param str config: The X-PDNSKEYROLLER-CONFIG metadata
+        """
+        self._write('INSERT INTO zones (zone, config_hash, config, updated) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (zone) DO UPDATE SET serial = NULL, config_hash = excluded.config_hash, '
+                    'config = excluded.config, updated = excluded.updated', [(zone, config_hash([config]), config, time.time())])
+
+    def put_state(self, zone, state):
+        """
+        Records a new keyroller state for ``zone``, see :meth:`set_next_actions` for when it is due
+
+        :param str zone: The zone id
+        :param str state: The X-PDNSKEYROLLER-STATE metadata
+        """
+        self._write('INSERT INTO zones (zone, state, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT (zone) DO UPDATE SET state = excluded.state, updated = excluded.updated',
+                    [(zone, state, time.time())])
+
+    def set_serials(self, serials):
+        """
+        :param dict serials: The SOA serial per zone id, for zones whose metadata is known to be unchanged
+        """
+        self._write('UPDATE zones SET serial = ? WHERE zone = ?', ((serial, zone) for zone, serial in serials.items()))
+
+    def set_next_actions(self, next_actions):
+        """
+        :param dict next_actions: When each zone is due next (None for never), per zone id
+        """
+        self._write('UPDATE zones SET next_action = ? WHERE zone = ?',
+                    ((_timestamp(when), zone) for zone, when in next_actions.items()))
+
+    def forget(self, zones):
+        """
+        :param zones: An iterable of zone ids
+        """
+        self._write('DELETE FROM zones WHERE zone = ?', ((zone,) for zone in zones))
+
+    def get(self, zone):
+        """
+        :param str zone: The zone id
+        :return: What is known about ``zone``, None if nothing is
+        :rtype: StoredZone
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT zone, serial, config_hash, config, state, next_action FROM zones '
+                                     'WHERE zone = ?', (zone,)).fetchone()
+        return _stored_zone(row) if row is not None else None
+
+    def zones(self):
+        """
+        :return: Everything known, per zone id
+        :rtype: dict(str, StoredZone)
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT zone, serial, config_hash, config, state, next_action FROM zones').fetchall()
+        return {row[0]: _stored_zone(row) for row in rows}
+
+    def due(self, before):
+        """
+        :param datetime.datetime before: The moment of interest
+        :return: The configured zones that are due at ``before``, with the time they are due at, soonest first
+        :rtype: list(tuple(str, datetime.datetime))
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT zone, next_action FROM zones WHERE next_action <= ? '
+                                      'ORDER BY next_action', (before.timestamp(),)).fetchall()
+        return [(zone, datetime.fromtimestamp(next_action)) for zone, next_action in rows]
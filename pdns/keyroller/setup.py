@@ -47,7 +47,7 @@ setup(
     license = "GNU GPLv2",
     keywords = "PowerDNS keyroller",
     url = "https://www.powerdns.com/",
-    packages = find_packages(),
+    packages = find_packages(exclude=['tests', 'tests.*']),
     install_requires=install_reqs,
     include_package_data = True,
     scripts=['pdns-keyroller.py', 'pdns-keyroller-ctl.py'],
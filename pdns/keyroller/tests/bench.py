@@ -0,0 +1,157 @@
+"""
+Benchmarks for :mod:`pdnsapi` against :class:`tests.support.mockserver.MockPDNSServer`.
+
+Run with ``python -m tests.bench`` from a source checkout. Every scenario reports its throughput, the 50th and 99th
+percentile latency and the peak RSS of the process after the scenario. Results can be written to a JSON file and later
+runs can be compared to it, the exit code is non-zero when a scenario got slower than the allowed tolerance.
+:mod:`tests.test_bench` runs a small version of every scenario as part of the tests.
+"""
+import sys
+import json
+import math
+import time
+import argparse
+import resource
+from collections import namedtuple
+
+from pdnsapi.api import PDNSApi
+from pdnsapi.zone import Zone
+from tests.support.mockserver import MockPDNSServer
+
+Result = namedtuple('Result', ['name', 'iterations', 'throughput', 'p50', 'p99', 'peak_rss'])
+
+
+def percentile(values, pct):
+    """
+    :param list values: The values, need not be sorted
+    :param float pct: The percentile, between 0 and 100
+    :return: The nearest-rank percentile of ``values``
+    """
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+
+def peak_rss():
+    """
+    :return: The peak resident set size of this process in bytes
+    :rtype: int
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure(name, func, iterations):
+    """
+    Calls ``func`` ``iterations`` times and times every call
+
+    :rtype: Result
+    """
+    durations = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    return Result(name, iterations, iterations / total if total else 0.0, percentile(durations, 50),
+                  percentile(durations, 99), peak_rss())
+
+
+def run(sizes=(10, 1000, 100000), iterations=200, latency=0):
+    """
+    Runs all scenarios
+
+    :param sizes: The zone sizes (number of records) to run the per-zone scenarios for
+    :param int iterations: The number of iterations for the cheap scenarios, zone transfers of big zones do fewer
+    :param float latency: The latency of the mock server in seconds
+    :return: The results of all scenarios
+    :rtype: list(Result)
+    """
+    results = []
+    with MockPDNSServer(latency=latency) as server:
+        zones = {size: server.add_zone('zone{}.example'.format(size), records=size) for size in sizes}
+        for i in range(100):
+            server.add_zone('filler{}.example'.format(i), records=5)
+        small = zones[min(sizes)]
+
+        api = PDNSApi(server.apikey, baseurl=server.baseurl)
+        unpooled = PDNSApi(server.apikey, baseurl=server.baseurl)
+        # A new TCP connection for every request, like module-level requests.request() does
+        unpooled._session.headers['Connection'] = 'close'
+
+        results.append(measure('get_zone_metadata (new connection per request)',
+                               lambda: unpooled.get_zone_metadata(small, 'X-BENCH'), iterations))
+        results.append(measure('get_zone_metadata', lambda: api.get_zone_metadata(small, 'X-BENCH'), iterations))
+        results.append(measure('set_zone_metadata', lambda: api.set_zone_metadata(small, 'X-BENCH', 'x'), iterations))
+        results.append(measure('get_cryptokeys', lambda: api.get_cryptokeys(small), iterations))
+        results.append(measure('get_zones ({} zones)'.format(len(server.zones)), api.get_zones,
+                               max(1, iterations // 10)))
+
+        for size, zone in sorted(zones.items()):
+            n = max(1, min(iterations, 200000 // max(size, 1)))
+            results.append(measure('get_zone ({} records)'.format(size), lambda: api.get_zone(zone), n))
+            results.append(measure('iter_rrsets ({} records)'.format(size),
+                                   lambda: sum(1 for _ in api.iter_rrsets(zone)), n))
+            results.append(measure('bump_soa ({} records)'.format(size),
+                                   lambda: api.bump_soa(zone, readback=False), n))
+            results.append(measure('bump_soa with readback ({} records)'.format(size),
+                                   lambda: api.bump_soa(zone), n))
+            body = json.loads(server.zones[zone].body())
+            results.append(measure('Zone model build ({} records)'.format(size), lambda: Zone(**body), n))
+            del body
+
+        api.close()
+        unpooled.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    :param list results: The current results
+    :param dict baseline: The throughput per scenario name of an earlier run
+    :param float tolerance: The allowed relative drop in throughput
+    :return: The names of the scenarios whose throughput dropped by more than ``tolerance``
+    :rtype: list(str)
+    """
+    return [r.name for r in results
+            if r.name in baseline and r.throughput < baseline[r.name] * (1 - tolerance)]
+
+
+def main(argv=None):
+    argp = argparse.ArgumentParser(prog='python -m tests.bench', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                   description='Benchmark pdnsapi against a mock PowerDNS API server')
+    argp.add_argument('--sizes', default='10,1000,100000', help='Comma separated zone sizes in records')
+    argp.add_argument('--iterations', type=int, default=200, help='Iterations for the cheap scenarios')
+    argp.add_argument('--latency', type=float, default=0, help='Mock server latency in milliseconds')
+    argp.add_argument('--json', metavar='PATH', help='Write the results to this file')
+    argp.add_argument('--compare', metavar='PATH', help='Compare the throughput with the results in this file')
+    argp.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative throughput drop for --compare')
+    arguments = argp.parse_args(argv)
+
+    results = run(sizes=[int(s) for s in arguments.sizes.split(',')], iterations=arguments.iterations,
+                  latency=arguments.latency / 1000)
+
+    print('{:<52} {:>7} {:>10} {:>10} {:>10} {:>9}'.format('scenario', 'n', 'ops/s', 'p50 ms', 'p99 ms', 'RSS MB'))
+    for r in results:
+        print('{:<52} {:>7} {:>10.1f} {:>10.2f} {:>10.2f} {:>9.0f}'.format(
+            r.name, r.iterations, r.throughput, r.p50 * 1000, r.p99 * 1000, r.peak_rss / 2 ** 20))
+
+    if arguments.json:
+        with open(arguments.json, 'w') as f:
+            json.dump([r._asdict() for r in results], f, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            baseline = {r['name']: r['throughput'] for r in json.load(f)}
+        regressions = compare(results, baseline, arguments.tolerance)
+        for name in regressions:
+            print('REGRESSION: {}'.format(name))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
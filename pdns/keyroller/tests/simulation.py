@@ -0,0 +1,299 @@
+"""
+Runs the keyroller daemon against an in-process mock server on a virtual clock, to see what months of rolls across a
+large number of zones cost in API requests before enabling automatic rolls for them.
+
+Run with ``python -m tests.simulation`` from a source checkout. The :class:`pdnskeyroller.daemon.Daemon`,
+:class:`pdnskeyroller.keyrollerdomain.KeyrollerDomain` and :class:`pdnskeyroller.prepublishkeyroll.PrePublishKeyRoll`
+used are the real ones. Only the API (:class:`tests.support.mockserver.MockPDNSApi`) and the clock
+(:mod:`pdnskeyroller.clock`) are replaced. Requests take no time: the virtual clock jumps from one tick to the next, so
+the tick durations reported are modeled from the number of requests, an assumed latency per request and the
+concurrency. :mod:`tests.test_simulation` runs a small simulation as part of the tests.
+"""
+import os
+import sys
+import time
+import yaml
+import random
+import logging
+import datetime
+import argparse
+import tempfile
+import urllib.parse
+from collections import Counter, namedtuple
+
+from pytimeparse.timeparse import timeparse
+
+from pdnskeyroller import clock, PDNSKEYROLLER_CONFIG_metadata_kind, PDNSKEYROLLER_STATE_metadata_kind
+from pdnskeyroller.daemon import Daemon
+from pdnskeyroller.domainconfig import DomainConfig
+from pdnskeyroller.domainstate import DomainState
+from pdnskeyroller.keyrollerdomain import KeyrollerDomain
+from tests.support.clock import VirtualClock
+from tests.support.mockserver import MockPDNSServer, MockPDNSApi
+
+logger = logging.getLogger(__name__)
+
+SimulationReport = namedtuple('SimulationReport', [
+    'zones', 'simulated', 'duration', 'ticks', 'requests', 'requests_per_hour', 'peak_hour', 'peak_hour_endpoints',
+    'rolls_started', 'rolls_completed', 'peak_concurrent_rolls', 'tick_duration_max', 'tick_duration_avg',
+    'tick_due_max', 'errors'])
+SimulationReport.__doc__ = """
+The outcome of :meth:`Simulation.run`
+
+:param int zones: The number of zones simulated
+:param datetime.timedelta simulated: The virtual time simulated
+:param float duration: The number of (real) seconds the simulation took
+:param int ticks: The number of ticks that acted on at least one zone
+:param int requests: The number of API requests the daemon made after startup
+:param Counter requests_per_hour: The number of requests per virtual hour, keyed by the start of the hour
+:param datetime.datetime peak_hour: The hour with the most requests
+:param Counter peak_hour_endpoints: The requests in the peak hour per '<method> <endpoint>'
+:param int rolls_started: The number of rolls started
+:param int rolls_completed: The number of rolls completed
+:param int peak_concurrent_rolls: The highest number of zones that were rolling at the same time
+:param float tick_duration_max: The modeled duration of the longest tick, in seconds
+:param float tick_duration_avg: The modeled average duration of a tick, in seconds
+:param int tick_due_max: The highest number of zones due in one tick
+:param int errors: The number of failed actions
+"""
+
+
+class _SimulatedServer(MockPDNSServer):
+    """
+    Tracks which zones are rolling: a zone is rolling while it has more keys than it started with
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.baseline = {}
+        self.rolling = set()
+        self.rolls_started = 0
+        self.rolls_completed = 0
+        self.peak_rolling = 0
+
+    def handle(self, method, path, query, body, accept='application/json'):
+        status, ret = super().handle(method, path, query, body, accept)
+        if method in ('POST', 'DELETE') and '/cryptokeys' in path and status < 400:
+            zone = urllib.parse.unquote(path.split('/zones/', 1)[1].split('/', 1)[0])
+            with self._lock:
+                extra = len(self.zones[zone].cryptokeys) > self.baseline[zone]
+                if extra and zone not in self.rolling:
+                    self.rolling.add(zone)
+                    self.rolls_started += 1
+                    self.peak_rolling = max(self.peak_rolling, len(self.rolling))
+                elif not extra and zone in self.rolling:
+                    self.rolling.discard(zone)
+                    self.rolls_completed += 1
+        return status, ret
+
+
+class Simulation:
+    """
+    See the module documentation
+    """
+
+    def __init__(self, zones=100000, zsk_frequency='6w', ksk_frequency=0, ttl=3600, spread=True, concurrency=10,
+                 latency=0.02, resolution=60, retry_interval=300, ds_delay='2d', seed=0):
+        """
+        :param int zones: The number of zones, all configured for automatic rolls
+        :param zsk_frequency: The ZSK roll frequency of all zones, a time expression, 0 for never
+        :param ksk_frequency: The KSK roll frequency of all zones, a time expression, 0 for never
+        :param int ttl: The TTL of all records, this is how long every roll step waits
+        :param bool spread: Spread the previous rolls of the zones evenly over the roll period. Otherwise no zone rolled
+                            before, so they are all due at the start
+        :param int concurrency: The number of zones the daemon acts on concurrently
+        :param float latency: The assumed duration of one API request in seconds, for the modeled tick durations
+        :param float resolution: The virtual clock moves at least this many seconds between ticks, zones that become
+                                 due in between are acted on together
+        :param float retry_interval: See the daemon setting
+        :param ds_delay: A time expression: how long after a KSK roll started the new DS is in the parent and the
+                         operator runs 'pdns-keyroller-ctl roll step'
+        :param int seed: The seed for spreading the previous rolls
+        """
+        self.zones = int(zones)
+        self.zsk_frequency = zsk_frequency
+        self.ksk_frequency = ksk_frequency
+        self.ttl = int(ttl)
+        self.spread = spread
+        self.concurrency = int(concurrency)
+        self.latency = float(latency)
+        self.resolution = float(resolution)
+        self.retry_interval = retry_interval
+        self.ds_delay = datetime.timedelta(seconds=timeparse(str(ds_delay)))
+        self.seed = seed
+        self.clock = VirtualClock()
+        self._requests = Counter()
+        self._endpoints = {}
+
+    def __repr__(self):
+        return '{}.Simulation(zones={}, zsk_frequency={!r}, ksk_frequency={!r}, ttl={}, spread={}, concurrency={}, ' \
+               'latency={}, resolution={})'.format(__name__, self.zones, self.zsk_frequency, self.ksk_frequency,
+                                                   self.ttl, self.spread, self.concurrency, self.latency,
+                                                   self.resolution)
+
+    def _populate(self, mock):
+        config = str(DomainConfig(zsk_frequency=self.zsk_frequency, ksk_frequency=self.ksk_frequency))
+        rnd = random.Random(self.seed)
+        now = self.clock()
+        periods = {}
+        for keytype, frequency in (('zsk', self.zsk_frequency), ('ksk', self.ksk_frequency)):
+            if frequency != 0:
+                periods[keytype] = timeparse(str(frequency))
+        for i in range(self.zones):
+            zone = mock.add_zone('zone{}.sim'.format(i), records=1, ttl=self.ttl)
+            mock.baseline[zone] = len(mock.zones[zone].cryptokeys)
+            mock.zones[zone].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [config]
+            if self.spread:
+                state = DomainState(**{'last_{}_roll_datetime'.format(keytype):
+                                       now - datetime.timedelta(seconds=rnd.uniform(0, period))
+                                       for keytype, period in periods.items()})
+                mock.zones[zone].metadata[PDNSKEYROLLER_STATE_metadata_kind] = [str(state)]
+
+    def _record(self, method, endpoint, **kwargs):
+        hour = self.clock().replace(minute=0, second=0, microsecond=0)
+        self._requests[hour] += 1
+        self._endpoints.setdefault(hour, Counter())['{} {}'.format(method, endpoint)] += 1
+
+    def _step_waiting_ksk_rolls(self, mock):
+        # What an operator does once the DS of the new KSK is in the parent zone: 'pdns-keyroller-ctl roll step', with
+        # its own connection to the API. The daemon picks the step up when it retries the zone.
+        api = MockPDNSApi(mock)
+        now = self.clock()
+        for zone in sorted(mock.rolling):
+            keyrollerdomain = KeyrollerDomain(zone, api)
+            roll = keyrollerdomain.state.current_roll
+            if keyrollerdomain.state.is_rolling and roll.is_waiting_ds() and \
+                    roll.step_datetimes[-1] + self.ds_delay <= now:
+                keyrollerdomain.step(force=True, customttl=self.ttl)
+
+    def run(self, duration='90d', report_interval=60):
+        """
+        :param duration: The virtual time to simulate, a time expression or a number of seconds
+        :param float report_interval: Log the progress every this many (real) seconds
+        :rtype: SimulationReport
+        """
+        start = time.monotonic()
+        simulated = datetime.timedelta(seconds=timeparse(str(duration)) if isinstance(duration, str) else duration)
+        mock = _SimulatedServer()
+        self._populate(mock)
+        api = MockPDNSApi(mock, latency=self.latency)
+        logger.info("Created {} zones in {:.1f}s".format(self.zones, time.monotonic() - start))
+
+        fd, configfile = tempfile.mkstemp(suffix='.yml')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                yaml.safe_dump({'keyroller': {'loglevel': logging.getLevelName(logging.getLogger().level).lower(),
+                                              'concurrency': self.concurrency,
+                                              'retry_interval': self.retry_interval}}, f)
+            clock.set_clock(self.clock)
+            try:
+                return self._run(api, configfile, simulated, start, report_interval)
+            finally:
+                clock.set_clock(None)
+        finally:
+            os.unlink(configfile)
+            mock.stop()
+
+    def _run(self, api, configfile, simulated, start, report_interval):
+        daemon = Daemon(configfile, api=api)
+        mock = api.mock
+        api.metrics.add_hook(self._record)
+
+        end = self.clock() + simulated
+        ticks = errors = tick_due_max = 0
+        tick_duration_sum = tick_duration_max = 0.0
+        last_ds_check = self.clock()
+        last_report = time.monotonic()
+        while self.clock() < end:
+            before = mock.requests
+            wait = daemon.tick()
+            metrics = daemon.metrics()
+            if metrics['ticks'] > ticks:
+                tick = metrics['recent_ticks'][-1]
+                ticks += 1
+                errors += tick.errors
+                tick_due_max = max(tick_due_max, tick.due)
+                requests = mock.requests - before
+                # The requests of one zone are sequential, the zones are spread over the workers
+                modeled = requests * self.latency / min(self.concurrency, tick.due)
+                tick_duration_sum += modeled
+                tick_duration_max = max(tick_duration_max, modeled)
+
+            if self.ksk_frequency != 0 and self.clock() - last_ds_check >= datetime.timedelta(hours=6):
+                last_ds_check = self.clock()
+                self._step_waiting_ksk_rolls(mock)
+
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                last_report = now
+                logger.info("Simulated until {}, {} ticks, {} zones rolling".format(self.clock(), ticks,
+                                                                                    len(mock.rolling)))
+            if wait is None:
+                break
+            self.clock.advance(max(wait, self.resolution))
+
+        requests_per_hour = self._requests
+        peak_hour = max(requests_per_hour, key=requests_per_hour.get) if requests_per_hour else None
+        return SimulationReport(
+            self.zones, simulated, time.monotonic() - start, ticks, sum(requests_per_hour.values()),
+            requests_per_hour, peak_hour, self._endpoints.get(peak_hour, Counter()), mock.rolls_started,
+            mock.rolls_completed, mock.peak_rolling, tick_duration_max, tick_duration_sum / ticks if ticks else 0.0,
+            tick_due_max, errors)
+
+
+def main(argv=None):
+    argp = argparse.ArgumentParser(
+        prog='python -m tests.simulation', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Simulate the PowerDNS DNSSEC key-roller on a virtual clock against an in-memory server, to project '
+                    'the API load of automatic rolls')
+    argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
+    argp.add_argument('--zones', type=int, default=100000, help='The number of zones')
+    argp.add_argument('--duration', default='90d', help='The virtual time to simulate')
+    argp.add_argument('--zsk-frequency', default='6w', help='The ZSK roll frequency, 0 for never')
+    argp.add_argument('--ksk-frequency', default='0', help='The KSK roll frequency, 0 for never')
+    argp.add_argument('--ds-delay', default='2d', help='How long after starting a KSK roll the DS is replaced')
+    argp.add_argument('--ttl', type=int, default=3600, help='The TTL of all records in the zones')
+    argp.add_argument('--no-spread', dest='spread', action='store_false', default=True,
+                      help='Start with no zone ever rolled, instead of spreading the previous rolls over the period')
+    argp.add_argument('--concurrency', type=int, default=10, help='The number of domains acted on concurrently')
+    argp.add_argument('--latency', type=float, default=0.02, help='The assumed duration of an API request in seconds')
+    argp.add_argument('--resolution', type=float, default=60,
+                      help='The minimal number of virtual seconds between ticks')
+    argp.add_argument('--retry-interval', type=float, default=300,
+                      help='Retry a domain after this many seconds when it is waiting or its action failed')
+
+    arguments = argp.parse_args(argv)
+
+    level = logging.WARNING
+    if arguments.verbose:
+        level = logging.INFO if arguments.verbose == 1 else logging.DEBUG
+    logging.basicConfig(level=level)
+
+    simulation = Simulation(zones=arguments.zones, zsk_frequency=arguments.zsk_frequency,
+                            ksk_frequency=0 if arguments.ksk_frequency == '0' else arguments.ksk_frequency,
+                            ttl=arguments.ttl, spread=arguments.spread, concurrency=arguments.concurrency,
+                            latency=arguments.latency, resolution=arguments.resolution,
+                            retry_interval=arguments.retry_interval, ds_delay=arguments.ds_delay)
+    report = simulation.run(arguments.duration)
+
+    hours = max(1.0, report.simulated.total_seconds() / 3600)
+    out = sys.stdout
+    out.write('Simulated {} zones for {} in {:.1f}s\n'.format(report.zones, report.simulated, report.duration))
+    out.write('Rolls: {} started, {} completed, at most {} at the same time\n'.format(
+        report.rolls_started, report.rolls_completed, report.peak_concurrent_rolls))
+    out.write('API requests: {} in total, {:.1f} per hour on average\n'.format(report.requests, report.requests / hours))
+    if report.peak_hour is not None:
+        out.write('Busiest hour: {} with {} requests ({:.2f}/s)\n'.format(
+            report.peak_hour, report.requests_per_hour[report.peak_hour],
+            report.requests_per_hour[report.peak_hour] / 3600))
+        for endpoint, count in report.peak_hour_endpoints.most_common():
+            out.write('    {:<48} {}\n'.format(endpoint, count))
+    out.write('Ticks: {}, at most {} domains due in one, modeled duration {:.2f}s on average and {:.2f}s at most\n'.format(
+        report.ticks, report.tick_due_max, report.tick_duration_avg, report.tick_duration_max))
+    if report.errors:
+        out.write('Failed actions: {}\n'.format(report.errors))
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
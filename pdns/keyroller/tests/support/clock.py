@@ -0,0 +1,22 @@
+import datetime
+
+
+class VirtualClock:
+    """
+    A clock that only moves when told to, see :func:`pdnskeyroller.clock.set_clock`
+    """
+
+    def __init__(self, start=None):
+        """
+        :param datetime.datetime start: The initial time, now by default
+        """
+        self._now = start if start is not None else datetime.datetime.now()
+
+    def __call__(self):
+        return self._now
+
+    def advance(self, seconds):
+        """
+        :param float seconds: The number of seconds to move forward
+        """
+        self._now += datetime.timedelta(seconds=seconds)
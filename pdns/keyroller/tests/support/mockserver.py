@@ -0,0 +1,568 @@
+"""
+An in-process stand-in for the PowerDNS Authoritative Server HTTP API, for tests, benchmarks and development. It is not
+part of the installed packages.
+
+Only the parts of ``/api/v1/servers/localhost`` used by :mod:`pdnsapi` are implemented: zones (including RRSet
+filtering, PATCH and export), cryptokeys, zone metadata, search-data, statistics and cache flushes. Zones with synthetic contents of any size can be added with
+:meth:`MockPDNSServer.add_zone`. Optionally SOA queries are answered over UDP as well, for
+:mod:`pdnsapi.serialwatch`.
+
+:class:`MockPDNSApi` is a client that talks to a :class:`MockPDNSServer` directly instead of over HTTP, for simulations
+with more requests than HTTP on the loopback interface can handle in reasonable time.
+"""
+import gzip
+import re
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+import socketserver
+import urllib.parse
+from types import SimpleNamespace
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pdnsapi import dnswire
+from pdnsapi.api import PDNSApi, HTTPStatusError
+
+logger = logging.getLogger(__name__)
+
+
+class _MockZone:
+    def __init__(self, name, serial):
+        self.name = name
+        self.kind = 'Native'
+        self.serial = serial
+        self.rrsets = OrderedDict()
+        self.cryptokeys = OrderedDict()
+        self.metadata = {}
+        self._body = None
+
+    def changed(self):
+        self._body = None
+
+    def info(self):
+        return {
+            'id': self.name,
+            'name': self.name,
+            'url': '/api/v1/servers/localhost/zones/{}'.format(self.name),
+            'kind': self.kind,
+            'serial': self.serial,
+            'notified_serial': self.serial,
+            'edited_serial': self.serial,
+            'masters': [],
+            'dnssec': bool(self.cryptokeys),
+            'account': '',
+        }
+
+    def rrset(self, key):
+        ttl, records = self.rrsets[key]
+        return {
+            'name': key[0],
+            'type': key[1],
+            'ttl': ttl,
+            'records': [{'content': content, 'disabled': False} for content in records],
+            'comments': [],
+        }
+
+    def body(self):
+        # Encoding large zones is expensive, keep the result until the zone changes
+        if self._body is None:
+            zone = self.info()
+            zone['rrsets'] = [self.rrset(key) for key in self.rrsets]
+            self._body = json.dumps(zone).encode()
+        return self._body
+
+
+class MockPDNSServer:
+    """
+    A threaded HTTP server implementing a subset of the API, see the module documentation. Use it as a context manager
+    or call :meth:`start` and :meth:`stop`.
+    """
+
+    def __init__(self, apikey='secret', latency=0, host='127.0.0.1', port=0, dns_port=None):
+        """
+        :param str apikey: The API key clients must send
+        :param float latency: The number of seconds to wait before answering each API request
+        :param str host: The address to listen on
+        :param int port: The port to listen on, 0 picks a free port
+        :param int dns_port: The UDP port to answer SOA queries on, 0 picks a free port, None disables DNS
+        """
+        self.apikey = apikey
+        self.latency = float(latency)
+        self.zones = OrderedDict()
+        self.requests = 0
+        self.dns_queries = 0
+        self.flushes = 0
+        # Zones whose SOA queries go unanswered, to simulate packet loss
+        self.dns_drop = set()
+        self._next_keyid = 1
+        self._started = time.monotonic()
+        self._lock = threading.RLock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+        self._dnsd = None
+        self._dns_thread = None
+        if dns_port is not None:
+            self._dnsd = socketserver.UDPServer((host, dns_port), _DNSHandler)
+            self._dnsd.mock = self
+
+    def __repr__(self):
+        return 'MockPDNSServer(apikey="{}", latency={}, host="{}", port={})'.format(
+            self.apikey, self.latency, *self._httpd.server_address[:2])
+
+    @property
+    def baseurl(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def dns_address(self):
+        """
+        The (host, port) SOA queries are answered on, None when DNS is disabled
+        """
+        if self._dnsd is None:
+            return None
+        return self._dnsd.server_address[:2]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='mockpdns', daemon=True)
+        self._thread.start()
+        if self._dnsd is not None:
+            self._dns_thread = threading.Thread(target=self._dnsd.serve_forever, name='mockpdns-dns', daemon=True)
+            self._dns_thread.start()
+        return self.baseurl
+
+    def stop(self):
+        """
+        Stops serving and closes the sockets, also when :meth:`start` was never called
+        """
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+        if self._dnsd is not None:
+            if self._dns_thread is not None:
+                self._dnsd.shutdown()
+                self._dns_thread.join()
+                self._dns_thread = None
+            self._dnsd.server_close()
+
+    def add_zone(self, name, records=10, dnssec=True, serial=1, ttl=3600):
+        """
+        Adds a zone with an SOA, two NS records and ``records`` synthetic A records
+
+        :param str name: The zone name
+        :param int records: The number of A records
+        :param bool dnssec: Whether to add a KSK and a ZSK
+        :param int serial: The SOA serial
+        :param int ttl: The TTL for all RRSets
+        :return: The zone name, with a trailing dot
+        :rtype: str
+        """
+        if not name.endswith('.'):
+            name += '.'
+        zone = _MockZone(name, serial)
+        zone.rrsets[(name, 'SOA')] = (ttl, ['ns1.{0} hostmaster.{0} {1} 10800 3600 604800 3600'.format(name, serial)])
+        zone.rrsets[(name, 'NS')] = (ttl, ['ns1.{}'.format(name), 'ns2.{}'.format(name)])
+        for i in range(records):
+            zone.rrsets[('host{}.{}'.format(i, name), 'A')] = (ttl, ['192.0.2.{}'.format(i % 254 + 1)])
+        with self._lock:
+            self.zones[name] = zone
+            if dnssec:
+                self._add_key(zone, 'ksk', True, True, 13)
+                self._add_key(zone, 'zsk', True, True, 13)
+        return name
+
+    def _add_key(self, zone, keytype, active, published, algo):
+        keyid = self._next_keyid
+        self._next_keyid += 1
+        flags = 257 if keytype in ('ksk', 'csk') else 256
+        material = base64.b64encode(hashlib.sha512('{}{}'.format(zone.name, keyid).encode()).digest()).decode()
+        key = {
+            'type': 'Cryptokey',
+            'id': keyid,
+            'keytype': keytype,
+            'active': active,
+            'published': published,
+            'flags': flags,
+            'algorithm': 'ECDSAP256SHA256' if algo == 13 else str(algo),
+            'bits': 256,
+            'dnskey': '{} 3 {} {}'.format(flags, algo, material),
+            'ds': ['{} {} 2 {}'.format(keyid, algo, hashlib.sha256(material.encode()).hexdigest())],
+        }
+        zone.cryptokeys[keyid] = key
+        zone.changed()
+        return key
+
+    def _bump(self, zone):
+        zone.serial += 1
+        ttl, records = zone.rrsets[(zone.name, 'SOA')]
+        fields = records[0].split(' ')
+        fields[2] = str(zone.serial)
+        zone.rrsets[(zone.name, 'SOA')] = (ttl, [' '.join(fields)])
+
+    def handle_dns(self, query):
+        """
+        Answers an SOA query
+
+        :param bytes query: The query
+        :return: The response, None to not answer
+        :rtype: bytes
+        """
+        self.dns_queries += 1
+        try:
+            qname, offset = dnswire.decode_name(query, 12)
+            qtype = int.from_bytes(query[offset:offset + 2], 'big')
+        except (ValueError, IndexError):
+            return None
+        with self._lock:
+            if qname in self.dns_drop:
+                return None
+            zone = self.zones.get(qname)
+            if zone is None:
+                return dnswire.soa_response(query, rcode=dnswire.RCODE_REFUSED)
+            if qtype != dnswire.TYPE_SOA:
+                return dnswire.soa_response(query)
+            ttl, records = zone.rrsets[(zone.name, 'SOA')]
+            mname, rname = records[0].split(' ')[:2]
+            return dnswire.soa_response(query, zone.serial, mname=mname, rname=rname, ttl=ttl)
+
+    def handle(self, method, path, query, body, accept='application/json'):
+        """
+        Answers a request
+
+        :return: A tuple of the status code and the response body (encoded to JSON unless bytes or str)
+        """
+        self.requests += 1
+        parts = [urllib.parse.unquote(p) for p in path.split('/') if p]
+        if parts[:4] != ['api', 'v1', 'servers', 'localhost']:
+            return 404, {'error': 'Not Found'}
+        parts = parts[4:]
+        if not parts:
+            return 200, {'type': 'Server', 'id': 'localhost', 'daemon_type': 'authoritative',
+                         'version': 'mock', 'url': '/api/v1/servers/localhost'}
+        with self._lock:
+            if parts == ['zones'] and method == 'GET':
+                return 200, [zone.info() for zone in self.zones.values()]
+            if parts == ['cache', 'flush'] and method == 'PUT':
+                self.flushes += 1
+                domain = query.get('domain', '').lower()
+                count = sum(1 for zone in self.zones.values() for name, _ in zone.rrsets
+                            if name.lower() == domain or name.lower().endswith('.' + domain))
+                return 200, {'count': count, 'result': 'Flushed cache.'}
+            if parts == ['statistics'] and method == 'GET':
+                return self._statistics(query.get('statistic'), query.get('includerings', 'true') == 'true')
+            if parts == ['search-data'] and method == 'GET':
+                return 200, self._search(query.get('q', ''), int(query.get('max', 100)),
+                                         query.get('object_type', 'all'))
+            if parts[0] == 'zones' and len(parts) > 1:
+                name = '.' if parts[1] == '=2E' else parts[1]
+                zone = self.zones.get(name)
+                if zone is None:
+                    return 404, {'error': 'Could not find domain \'{}\''.format(name)}
+                return self._handle_zone(zone, method, parts[2:], query, body, accept)
+        return 404, {'error': 'Not Found'}
+
+    def _statistics(self, statistic, includerings):
+        items = [
+            {'type': 'StatisticItem', 'name': 'uptime', 'value': str(int(time.monotonic() - self._started))},
+            {'type': 'StatisticItem', 'name': 'udp-queries', 'value': str(self.dns_queries)},
+            {'type': 'StatisticItem', 'name': 'udp-answers', 'value': str(self.dns_queries)},
+            {'type': 'StatisticItem', 'name': 'api-requests', 'value': str(self.requests)},
+            {'type': 'StatisticItem', 'name': 'latency', 'value': str(int(self.latency * 1000000))},
+            {'type': 'MapStatisticItem', 'name': 'response-by-qtype',
+             'value': [{'name': 'SOA', 'value': str(self.dns_queries)}]},
+            {'type': 'RingStatisticItem', 'name': 'queries', 'size': 10000,
+             'value': [{'name': zone, 'value': '1'} for zone in list(self.zones)[:10]]},
+        ]
+        if statistic is not None:
+            items = [item for item in items if item['name'] == statistic]
+            if not items:
+                return 422, {'error': 'Unknown statistic name'}
+        elif not includerings:
+            items = [item for item in items if item['type'] != 'RingStatisticItem']
+        return 200, items
+
+    def _search(self, q, max_results, object_type):
+        # Like the server: '*' and '?' are wildcards, matching is case-insensitive on names and contents
+        pattern = re.compile(''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c) for c in q),
+                             re.IGNORECASE | re.DOTALL)
+        ret = []
+        for zone in self.zones.values():
+            if object_type in ('all', 'zone') and pattern.fullmatch(zone.name):
+                ret.append({'object_type': 'zone', 'name': zone.name, 'zone_id': zone.name})
+            if object_type not in ('all', 'record'):
+                continue
+            for (name, rtype), (ttl, records) in zone.rrsets.items():
+                name_matches = pattern.fullmatch(name)
+                for content in records:
+                    if len(ret) >= max_results:
+                        return ret
+                    if name_matches or pattern.fullmatch(content):
+                        ret.append({'object_type': 'record', 'name': name, 'type': rtype, 'ttl': ttl,
+                                    'content': content, 'disabled': False, 'zone': zone.name,
+                                    'zone_id': zone.name})
+        return ret[:max_results]
+
+    def _handle_zone(self, zone, method, parts, query, body, accept):
+        if not parts:
+            if method == 'GET':
+                if 'rrset_name' in query or query.get('rrsets') == 'false':
+                    ret = zone.info()
+                    ret['rrsets'] = []
+                    if 'rrset_name' in query:
+                        # Like the server, the name filter is case-insensitive
+                        ret['rrsets'] = [zone.rrset(key) for key in zone.rrsets
+                                         if key[0].lower() == query['rrset_name'].lower() and
+                                         query.get('rrset_type', key[1]) == key[1]]
+                    return 200, ret
+                return 200, zone.body()
+            if method == 'PUT':
+                if 'kind' in body:
+                    zone.kind = body['kind']
+                zone.changed()
+                return 204, None
+            if method == 'PATCH':
+                for rrset in body.get('rrsets', []):
+                    key = (rrset['name'], rrset['type'])
+                    if rrset.get('changetype', '').upper() == 'DELETE':
+                        zone.rrsets.pop(key, None)
+                    elif rrset.get('changetype', '').upper() == 'REPLACE':
+                        zone.rrsets[key] = (rrset['ttl'], [r['content'] for r in rrset['records']])
+                    else:
+                        return 422, {'error': 'Changetype not understood'}
+                if not any(rrset['type'] == 'SOA' for rrset in body.get('rrsets', [])):
+                    self._bump(zone)
+                else:
+                    zone.serial = int(zone.rrsets[(zone.name, 'SOA')][1][0].split(' ')[2])
+                zone.changed()
+                return 204, None
+        elif parts == ['export'] and method == 'GET':
+            lines = []
+            for (name, rtype), (ttl, records) in zone.rrsets.items():
+                for content in records:
+                    lines.append('{}\t{}\tIN\t{}\t{}\n'.format(name, ttl, rtype, content))
+            if 'application/json' in accept:
+                return 200, {'zone': ''.join(lines)}
+            return 200, ''.join(lines)
+        elif parts[0] == 'cryptokeys':
+            return self._handle_cryptokeys(zone, method, parts[1:], body)
+        elif parts[0] == 'metadata':
+            return self._handle_metadata(zone, method, parts[1:], body)
+        return 405, {'error': 'Method not allowed'}
+
+    def _handle_cryptokeys(self, zone, method, parts, body):
+        if not parts:
+            if method == 'GET':
+                return 200, list(zone.cryptokeys.values())
+            if method == 'POST':
+                algo = body.get('algorithm', 13)
+                if isinstance(algo, str) and not algo.isdigit():
+                    algo = 13
+                key = self._add_key(zone, body.get('keytype', 'zsk').lower(), body.get('active', False),
+                                    body.get('published', True), int(algo))
+                return 201, key
+            return 405, {'error': 'Method not allowed'}
+        try:
+            key = zone.cryptokeys[int(parts[0])]
+        except (KeyError, ValueError):
+            return 404, {'error': 'Could not find cryptokey \'{}\''.format(parts[0])}
+        if method == 'GET':
+            return 200, key
+        if method == 'PUT':
+            for field in ('active', 'published'):
+                if field in body:
+                    key[field] = bool(body[field])
+            zone.changed()
+            return 204, None
+        if method == 'DELETE':
+            del zone.cryptokeys[key['id']]
+            zone.changed()
+            return 204, None
+        return 405, {'error': 'Method not allowed'}
+
+    def _handle_metadata(self, zone, method, parts, body):
+        if not parts:
+            if method == 'GET':
+                return 200, [{'type': 'Metadata', 'kind': k, 'metadata': v} for k, v in zone.metadata.items()]
+            return 405, {'error': 'Method not allowed'}
+        kind = parts[0]
+        if method == 'GET':
+            return 200, {'type': 'Metadata', 'kind': kind, 'metadata': zone.metadata.get(kind, [])}
+        if method == 'PUT':
+            zone.metadata[kind] = list(body.get('metadata', []))
+            return 200, {'type': 'Metadata', 'kind': kind, 'metadata': zone.metadata[kind]}
+        if method == 'DELETE':
+            zone.metadata.pop(kind, None)
+            return 200, None
+        return 405, {'error': 'Method not allowed'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled client connections are actually re-used
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one segment, otherwise Nagle and delayed ACKs add 40ms to every kept-alive request
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _dispatch(self):
+        mock = self.server.mock
+        if mock.latency:
+            time.sleep(mock.latency)
+
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if self.headers.get('X-API-Key') != mock.apikey:
+            self._respond(401, {'error': 'Unauthorized'})
+            return
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            self._respond(400, {'error': 'Invalid JSON'})
+            return
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        status, ret = mock.handle(self.command, url.path, query, body, self.headers.get('Accept', ''))
+        self._respond(status, ret)
+
+    def _respond(self, status, ret):
+        content_type = 'application/json'
+        if ret is None:
+            data = b''
+        elif isinstance(ret, bytes):
+            data = ret
+        elif isinstance(ret, str):
+            data = ret.encode()
+            content_type = 'text/plain; charset=utf-8'
+        else:
+            data = json.dumps(ret).encode()
+        self.send_response(status)
+        if data and 'gzip' in self.headers.get('Accept-Encoding', '') and len(data) > 1024:
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        if data:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = _dispatch
+    do_PUT = _dispatch
+    do_POST = _dispatch
+    do_PATCH = _dispatch
+    do_DELETE = _dispatch
+
+
+class _DNSHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        response = self.server.mock.handle_dns(data)
+        if response is not None:
+            sock.sendto(response, self.client_address)
+
+
+class _Response:
+    """
+    Just enough of a :class:`requests.Response` for :class:`pdnsapi.api.PDNSApi`
+    """
+
+    def __init__(self, status_code, content, body=None):
+        self.status_code = status_code
+        self.content = content
+        self.request = SimpleNamespace(body=body)
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class MockPDNSApi(PDNSApi):
+    """
+    A :class:`pdnsapi.api.PDNSApi` that hands its requests to :meth:`MockPDNSServer.handle` in-process. Requests and
+    responses are still encoded to and decoded from JSON. No time passes for a request, they are recorded in
+    :attr:`metrics` as taking ``latency`` seconds.
+    """
+
+    def __init__(self, mock=None, latency=0, **kwargs):
+        """
+        :param MockPDNSServer mock: The server, it does not have to be started. A new one when None
+        :param float latency: The duration recorded for every request
+        :param kwargs: Passed on to :class:`pdnsapi.api.PDNSApi`, validate defaults to False
+        """
+        self.mock = mock if mock is not None else MockPDNSServer()
+        self.latency = float(latency)
+        kwargs.setdefault('validate', False)
+        super().__init__(self.mock.apikey, baseurl=self.mock.baseurl, **kwargs)
+        self._path = urllib.parse.urlsplit(self.url).path
+
+    def __repr__(self):
+        return '{}.MockPDNSApi({!r}, latency={})'.format(__name__, self.mock, self.latency)
+
+    def _handle(self, method, uri, data=None, params=None, accept='application/json'):
+        raw = json.dumps(data).encode() if data is not None else None
+        query = {k: str(v) for k, v in (params or {}).items()}
+        status, ret = self.mock.handle(method.upper(), self._path + uri, query, json.loads(raw) if raw else {}, accept)
+        if ret is None:
+            content = b''
+        elif isinstance(ret, bytes):
+            content = ret
+        elif isinstance(ret, str):
+            content = ret.encode()
+        else:
+            content = json.dumps(ret).encode()
+        return _Response(status, content, raw)
+
+    def _raise_for_status(self, uri, res):
+        if res.status_code < 400:
+            return
+        try:
+            ret = res.json()
+        except ValueError:
+            ret = {}
+        raise HTTPStatusError("HTTP error code {} received for {}: {}".format(
+            res.status_code, self.url + uri, ret.get('error', ret) if isinstance(ret, dict) else ret), res.status_code)
+
+    def _do_request(self, uri, method, data=None, params=None):
+        res = self._handle(method, uri, data, params)
+        self._observe(method, uri, time.monotonic(), res)
+        self._raise_for_status(uri, res)
+        try:
+            ret = res.json()
+        except ValueError:
+            ret = None
+        return res.status_code, ret
+
+    def _do_stream_request(self, uri, params=None, accept=None):
+        res = self._handle('GET', uri, params=params, accept=accept or 'application/json')
+        if res.status_code >= 400:
+            self._observe('GET', uri, time.monotonic(), res)
+        self._raise_for_status(uri, res)
+        return res
+
+    def _observe(self, method, uri, start, res=None, exception=None, bytes_in=None):
+        # No time passed, record the request as taking the assumed latency
+        super()._observe(method, uri, start - self.latency, res, exception, bytes_in)
@@ -0,0 +1,86 @@
+import unittest
+
+from tests.support.mockserver import MockPDNSApi
+
+
+class GetRRSetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi(cache_ttl=60)
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=2)
+
+    def test_get_rrset(self):
+        rrset = self.api.get_rrset(self.zone, 'host1.example.com', 'a')
+        self.assertEqual((rrset.name, rrset.rtype), ('host1.example.com.', 'A'))
+        self.assertEqual(rrset.record_contents, ['192.0.2.2'])
+
+    def test_case_insensitive(self):
+        rrset = self.api.get_rrset(self.zone, 'HOST1.Example.COM.', 'A')
+        self.assertEqual(rrset.record_contents, ['192.0.2.2'])
+        # The server may answer with the name in another case than asked for
+        with self.api.mock._lock:
+            self.api.mock.zones[self.zone].rrsets[('Mixed.example.com.', 'TXT')] = (60, ['"text"'])
+        rrset = self.api.get_rrset(self.zone, 'mixed.example.com.', 'TXT')
+        self.assertEqual(rrset.name, 'Mixed.example.com.')
+
+    def test_missing(self):
+        self.assertIsNone(self.api.get_rrset(self.zone, 'nonexistent.example.com.', 'A'))
+        self.assertIsNone(self.api.get_rrset(self.zone, 'host1.example.com.', 'AAAA'))
+
+    def test_cache(self):
+        self.api.get_rrset(self.zone, 'host1.example.com.', 'A')
+        self.api.get_rrset(self.zone, 'Host1.example.com', 'a')
+        self.assertEqual(self.api.mock.requests, 1)
+
+
+class BumpSOATestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=2, serial=2020010100)
+
+    def requests(self, method, endpoint):
+        return self.api.metrics.snapshot().get('{} {}'.format(method, endpoint), {}).get('count', 0)
+
+    def test_readback(self):
+        zone = self.api.bump_soa(self.zone)
+        self.assertEqual(zone.serial, 2020010101)
+
+    def test_without_readback(self):
+        soa = self.api.get_rrset(self.zone, self.zone, 'SOA')
+        self.assertEqual(self.api.bump_soa(self.zone, readback=False, soa=soa), 2020010101)
+        # The given SOA is used, the zone is only changed
+        self.assertEqual(self.requests('GET', '/zones/{zone}'), 1)
+        self.assertEqual(self.requests('PATCH', '/zones/{zone}'), 1)
+        self.assertEqual(self.api.mock.zones[self.zone].serial, 2020010101)
+        self.assertEqual(self.api.get_rrset(self.zone, self.zone, 'SOA').record_contents[0].split(' ')[2],
+                         '2020010101')
+
+    def test_serial(self):
+        self.assertEqual(self.api.bump_soa(self.zone, serial='2020010200', readback=False), 2020010200)
+        self.assertEqual(self.api.mock.zones[self.zone].serial, 2020010200)
+
+
+class SetCryptokeyPublishedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=0)
+        self.key = self.api.get_cryptokeys(self.zone)[0]
+
+    def test_readback(self):
+        key = self.api.unpublish_cryptokey(self.zone, self.key)
+        self.assertEqual(key.id, self.key.id)
+        self.assertFalse(self.api.mock.zones[self.zone].cryptokeys[self.key.id]['published'])
+
+    def test_without_readback(self):
+        requests = self.api.mock.requests
+        self.assertIsNone(self.api.unpublish_cryptokey(self.zone, self.key, readback=False))
+        self.assertEqual(self.api.mock.requests, requests + 1)
+        self.assertFalse(self.api.mock.zones[self.zone].cryptokeys[self.key.id]['published'])
+        self.assertIsNone(self.api.publish_cryptokey(self.zone, self.key.id, readback=False))
+        self.assertTrue(self.api.mock.zones[self.zone].cryptokeys[self.key.id]['published'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import unittest
+
+from pdnsapi.asyncapi import AsyncPDNSApi
+from tests.support.mockserver import MockPDNSApi
+
+
+class AsyncPDNSApiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zones = [self.api.mock.add_zone('zone{}.example'.format(i), records=1) for i in range(20)]
+        self.aapi = AsyncPDNSApi(self.api, concurrency=4)
+
+    def tearDown(self):
+        self.aapi.close()
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_gather(self):
+        results = self.run_async(self.aapi.gather_cryptokeys(self.zones))
+        self.assertEqual(list(results), self.zones)
+        self.assertTrue(all(len(keys) == 2 for keys in results.values()))
+
+    def test_order(self):
+        # Later zones finish first, the results are in the order of the zones nevertheless
+        async def slow_first(zone):
+            await asyncio.sleep(0.001 * (len(self.zones) - self.zones.index(zone)))
+            return zone
+
+        results = self.run_async(self.aapi.gather(slow_first, iter(self.zones)))
+        self.assertEqual(list(results.items()), [(zone, zone) for zone in self.zones])
+
+    def test_exceptions_are_returned(self):
+        results = self.run_async(self.aapi.gather_cryptokeys(self.zones[:2] + ['nonexistent.example.']))
+        self.assertIsInstance(results['nonexistent.example.'], ConnectionError)
+        self.assertEqual(len(results[self.zones[0]]), 2)
+
+    def test_exceptions_are_raised(self):
+        started = []
+
+        async def fail_third(zone):
+            started.append(zone)
+            if len(started) == 3:
+                raise ValueError(zone)
+            await asyncio.sleep(0.01)
+            return zone
+
+        async def main():
+            with self.assertRaises(ValueError):
+                await self.aapi.gather(fail_third, self.zones, return_exceptions=False)
+            # The other workers were stopped, not left running through the remaining zones
+            stopped = len(started)
+            await asyncio.sleep(0.05)
+            self.assertEqual(len(started), stopped)
+
+        self.run_async(main())
+        self.assertLess(len(started), len(self.zones))
+
+    def test_concurrency(self):
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def request(zone):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            try:
+                threading.Event().wait(0.005)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+            return zone
+
+        self.run_async(self.aapi.gather(lambda zone: self.aapi._call(request, zone), self.zones))
+        self.assertEqual(in_flight[1], 4)
+
+    def test_close(self):
+        self.aapi.close()
+        with self.assertRaises(RuntimeError):
+            self.run_async(self.aapi.get_zones())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+
+from pdnsapi.api import HTTPStatusError
+from pdnsapi.batch import ZoneChangeBatch
+from tests.support.mockserver import MockPDNSApi
+
+
+class FlakyApi(MockPDNSApi):
+    """
+    Fails the first ``failures`` PATCH requests with ``error``
+    """
+
+    def __init__(self, failures=0, error=None, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.error = error if error is not None else ConnectionError('Connection reset by peer')
+        self.patches = 0
+
+    def patch_rrsets(self, zone, rrsets):
+        self.patches += 1
+        if self.patches <= self.failures:
+            raise self.error
+        super().patch_rrsets(zone, rrsets)
+
+
+class ZoneChangeBatchTestCase(unittest.TestCase):
+    def make_api(self, **kwargs):
+        api = FlakyApi(**kwargs)
+        self.addCleanup(api.mock.stop)
+        self.zone = api.mock.add_zone('example.com', records=0)
+        return api
+
+    def replace(self, batch, i):
+        batch.replace('host{}.example.com'.format(i), 'A', 60, ['192.0.2.{}'.format(i % 254 + 1)])
+
+    def test_chunks(self):
+        api = self.make_api()
+        batch = ZoneChangeBatch(api, self.zone, max_changes=10)
+        for i in range(25):
+            self.replace(batch, i)
+        results = batch.flush()
+        self.assertEqual([r.changes for r in results], [10, 10, 5])
+        self.assertTrue(all(r.error is None and r.attempts == 1 for r in results))
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(len(api.mock.zones[self.zone].rrsets), 2 + 25)
+
+    def test_max_size(self):
+        api = self.make_api()
+        batch = ZoneChangeBatch(api, self.zone, max_size=500)
+        for i in range(10):
+            self.replace(batch, i)
+        results = batch.flush()
+        self.assertGreater(len(results), 1)
+        self.assertTrue(all(r.size <= 500 for r in results))
+
+    def test_deduplication(self):
+        api = self.make_api()
+        batch = ZoneChangeBatch(api, self.zone)
+        batch.replace('www.example.com', 'A', 60, ['192.0.2.1'])
+        batch.replace('WWW.example.com.', 'a', 120, ['192.0.2.2'])
+        self.assertEqual(len(batch), 1)
+        batch.delete('www.example.com', 'A')
+        batch.flush()
+        self.assertNotIn(('www.example.com.', 'A'), api.mock.zones[self.zone].rrsets)
+
+    def test_retry(self):
+        api = self.make_api(failures=1)
+        batch = ZoneChangeBatch(api, self.zone, retries=1, retry_delay=0)
+        self.replace(batch, 1)
+        result, = batch.flush()
+        self.assertIsNone(result.error)
+        self.assertEqual(result.attempts, 2)
+
+    def test_failed_chunks_are_dropped(self):
+        # Flushing whenever the batch is full, like import_zonefile and sync_zone do. A chunk that failed must not be
+        # sent again with every next chunk.
+        api = self.make_api(failures=2)
+        batch = ZoneChangeBatch(api, self.zone, max_changes=10, retries=1, retry_delay=0)
+        results = []
+        for i in range(30):
+            self.replace(batch, i)
+            if len(batch) >= batch.max_changes:
+                results.extend(batch.flush())
+        results.extend(batch.flush())
+        self.assertEqual([r.attempts for r in results], [2, 1, 1])
+        self.assertIsInstance(results[0].error, ConnectionError)
+        self.assertEqual(api.patches, 4)
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(len(api.mock.zones[self.zone].rrsets), 2 + 20)
+
+    def test_no_retry_on_4xx(self):
+        api = self.make_api(failures=1, error=HTTPStatusError('HTTP error code 422 received', 422))
+        batch = ZoneChangeBatch(api, self.zone, retries=3, retry_delay=0)
+        self.replace(batch, 1)
+        result, = batch.flush()
+        self.assertEqual(result.attempts, 1)
+        self.assertEqual(result.error.status_code, 422)
+
+    def test_retry_on_5xx(self):
+        api = self.make_api(failures=1, error=HTTPStatusError('HTTP error code 503 received', 503))
+        batch = ZoneChangeBatch(api, self.zone, retries=1, retry_delay=0)
+        self.replace(batch, 1)
+        result, = batch.flush()
+        self.assertIsNone(result.error)
+        self.assertEqual(result.attempts, 2)
+
+    def test_http_status(self):
+        api = self.make_api()
+        with self.assertRaises(HTTPStatusError) as cm:
+            api.patch_rrsets(self.zone, [{'name': self.zone, 'type': 'A', 'changetype': 'BOGUS'}])
+        self.assertEqual(cm.exception.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from tests import bench
+
+
+class BenchTestCase(unittest.TestCase):
+    def test_run(self):
+        results = bench.run(sizes=(10, 100), iterations=5)
+        self.assertEqual(len(results), 5 + 2 * 5)
+        for result in results:
+            self.assertGreater(result.throughput, 0, result.name)
+            self.assertLessEqual(result.p50, result.p99, result.name)
+
+    def test_compare(self):
+        results = [bench.Result('fast', 1, 100.0, 0, 0, 0), bench.Result('slow', 1, 50.0, 0, 0, 0)]
+        self.assertEqual(bench.compare(results, {'fast': 110.0, 'slow': 100.0, 'gone': 1.0}, 0.25), ['slow'])
+
+    def test_percentile(self):
+        self.assertEqual(bench.percentile([], 50), 0.0)
+        self.assertEqual(bench.percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(bench.percentile(range(1, 101), 99), 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from pdnsapi.cache import ResponseCache
+from tests.support.mockserver import MockPDNSApi
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(maxsize=3, ttl=10, clock=self.clock)
+
+    def test_ttl(self):
+        self.cache.put('example.com.', 'zone', '', 1)
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get('example.com.', 'zone'), (True, 1))
+        self.clock.now = 10
+        self.assertEqual(self.cache.get('example.com.', 'zone'), (False, None))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_lru(self):
+        for i in range(3):
+            self.cache.put('zone{}.'.format(i), 'zone', '', i)
+        # zone0 is used, so zone1 is the least recently used entry
+        self.cache.get('zone0.', 'zone')
+        self.cache.put('zone3.', 'zone', '', 3)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertFalse(self.cache.get('zone1.', 'zone')[0])
+        self.assertTrue(self.cache.get('zone0.', 'zone')[0])
+        # Nothing is left behind for the evicted zone
+        self.cache.invalidate_zone('zone1.')
+        self.assertEqual(self.cache.invalidations, 0)
+
+    def test_invalidate_zone(self):
+        self.cache.put('a.example.', 'zone', '', 1)
+        self.cache.put('a.example.', 'metadata', 'X-TEST', 2)
+        self.cache.put('b.example.', 'zone', '', 3)
+        self.cache.invalidate_zone('a.example.')
+        self.assertEqual(self.cache.stats(), {'size': 1, 'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 2})
+        self.assertTrue(self.cache.get('b.example.', 'zone')[0])
+
+    def test_maxsize(self):
+        with self.assertRaises(ValueError):
+            ResponseCache(maxsize=0)
+
+
+class CachedApiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi(cache_ttl=60)
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=2)
+
+    def test_hits(self):
+        self.api.get_cryptokeys(self.zone)
+        self.api.get_cryptokeys(self.zone)
+        self.api.get_zone_metadata(self.zone, 'X-TEST')
+        self.api.get_zone_metadata(self.zone, 'X-TEST')
+        self.assertEqual(self.api.mock.requests, 2)
+
+    def test_writes_invalidate(self):
+        key = self.api.get_cryptokeys(self.zone)[0]
+        self.api.get_zone_metadata(self.zone, 'X-TEST')
+        self.api.set_cryptokey_active(self.zone, key.id, active=False, readback=False)
+        self.assertFalse([k for k in self.api.get_cryptokeys(self.zone) if k.id == key.id][0].active)
+        self.api.set_zone_metadata(self.zone, 'X-TEST', 'value')
+        self.assertEqual(self.api.get_zone_metadata(self.zone, 'X-TEST').metadata, ['value'])
+
+    def test_other_writers_are_not_seen(self):
+        self.api.get_zone_metadata(self.zone, 'X-TEST')
+        MockPDNSApi(self.api.mock).set_zone_metadata(self.zone, 'X-TEST', 'value')
+        self.assertEqual(self.api.get_zone_metadata(self.zone, 'X-TEST').metadata, [])
+        self.api._invalidate(self.zone)
+        self.assertEqual(self.api.get_zone_metadata(self.zone, 'X-TEST').metadata, ['value'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pdnsapi.cacheflush import CacheFlusher, coalesce
+from tests.support.mockserver import MockPDNSApi
+
+
+class CoalesceTestCase(unittest.TestCase):
+    def test_zones(self):
+        names = ['www.example.com', 'MAIL.example.com.', 'a.b.sub.example.net.', 'www.example.org.']
+        self.assertEqual(coalesce(names, ['example.com', 'example.net.', 'sub.example.net.']),
+                         ['example.com.', 'sub.example.net.', 'www.example.org.'])
+
+    def test_common_parent(self):
+        # Without a zone, a name is dropped when one of its ancestors is flushed anyway
+        self.assertEqual(coalesce(['a.example.', 'b.a.example.', 'c.b.a.example.', 'b.example.']),
+                         ['a.example.', 'b.example.'])
+        self.assertEqual(coalesce(['c.b.a.example.', 'a.example.']), ['a.example.'])
+        self.assertEqual(coalesce(['www.example.com.', '.']), ['.'])
+
+    def test_zone_below_flushed_name(self):
+        # Flushing the parent zone covers the child zone
+        self.assertEqual(coalesce(['a.sub.example.com.', 'www.example.com.'], ['example.com.', 'sub.example.com.']),
+                         ['example.com.'])
+        self.assertEqual(coalesce(['www.sub.example.com.', 'example.com.'], ['sub.example.com.']), ['example.com.'])
+
+    def test_duplicates(self):
+        self.assertEqual(coalesce(['a.example.'] * 3 + ['A.Example'], []), ['a.example.'])
+        self.assertEqual(coalesce([]), [])
+
+
+class CacheFlusherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zones = [self.api.mock.add_zone('zone{}.example'.format(i), records=5) for i in range(3)]
+
+    def test_batching(self):
+        flusher = CacheFlusher(self.api, rate=0)
+        names = ['host{}.{}'.format(i, zone) for zone in self.zones for i in range(5)] + ['www.other.example.']
+        result = flusher.flush(names)
+        # One request per zone and one for the name outside the zones
+        self.assertEqual(list(result.counts), self.zones + ['www.other.example.'])
+        self.assertEqual(self.api.mock.flushes, 4)
+        # SOA, NS and five A RRSets per zone
+        self.assertEqual(result.flushed, 3 * 7)
+        self.assertEqual(result.errors, {})
+
+    def test_zones_fetched_once(self):
+        flusher = CacheFlusher(self.api, rate=0)
+        flusher.flush(['host0.' + self.zones[0]])
+        flusher.flush(['host0.' + self.zones[1]])
+        self.assertEqual(self.api.metrics.snapshot()['GET /zones']['count'], 1)
+        CacheFlusher(self.api, zones=self.zones, rate=0).flush(['host0.' + self.zones[0]])
+        self.assertEqual(self.api.metrics.snapshot()['GET /zones']['count'], 1)
+
+    def test_errors(self):
+        flush_cache = self.api.flush_cache
+
+        def fail_second(name):
+            if name == self.zones[1]:
+                raise ConnectionError('down')
+            return flush_cache(name)
+
+        with mock.patch.object(self.api, 'flush_cache', side_effect=fail_second):
+            with self.assertLogs('pdnsapi.cacheflush', 'WARNING'):
+                result = CacheFlusher(self.api, zones=self.zones, rate=0).flush(self.zones)
+        self.assertEqual(list(result.counts), [self.zones[0], self.zones[2]])
+        self.assertIsInstance(result.errors[self.zones[1]], ConnectionError)
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def slow_flush(name):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            try:
+                time.sleep(0.01)
+                return 1
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        names = ['name{}.example.'.format(i) for i in range(12)]
+        with mock.patch.object(self.api, 'flush_cache', side_effect=slow_flush):
+            result = CacheFlusher(self.api, zones=[], rate=0, max_workers=3).flush(names)
+        self.assertEqual(result.flushed, 12)
+        self.assertEqual(in_flight[1], 3)
+
+    def test_rate(self):
+        names = ['name{}.example.'.format(i) for i in range(4)]
+        start = time.monotonic()
+        CacheFlusher(self.api, zones=[], rate=50, burst=1).flush(names)
+        # The first request uses the burst, the other three wait for a token each
+        self.assertGreaterEqual(time.monotonic() - start, 3 / 50 * 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
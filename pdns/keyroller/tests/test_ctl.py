@@ -0,0 +1,44 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+CTL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pdns-keyroller-ctl.py')
+
+
+class CtlImportsTestCase(unittest.TestCase):
+    """
+    Subcommands only import what they use
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.config = os.path.join(self.dir, 'pdns-keyroller.conf')
+        with open(self.config, 'w') as f:
+            f.write("keyroller:\n  loglevel: 'warning'\n  state_db: '{}'\n".format(os.path.join(self.dir, 'state.db')))
+
+    def imported(self, *args):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', CTL, '-c', self.config] + list(args),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=60)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        return {line.rsplit('|', 1)[-1].strip() for line in proc.stderr.splitlines() if line.startswith('import time:')}
+
+    def test_due_from_store(self):
+        modules = self.imported('roll', 'due', '--within', '1d')
+        self.assertIn('pdnskeyroller.statestore', modules)
+        for module in ('pdnskeyroller.domainconfig', 'pdnskeyroller.keyrollerdomain', 'pdnskeyroller.prepublishkeyroll',
+                       'json_tricks'):
+            self.assertNotIn(module, modules)
+
+    def test_help(self):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', CTL, '--help'], stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, universal_newlines=True, timeout=60)
+        self.assertEqual(proc.returncode, 0)
+        self.assertNotIn('requests', proc.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
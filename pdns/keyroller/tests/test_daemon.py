@@ -0,0 +1,288 @@
+import os
+import datetime
+import tempfile
+import threading
+import unittest
+
+import yaml
+
+from pdnskeyroller import clock, PDNSKEYROLLER_CONFIG_metadata_kind, PDNSKEYROLLER_STATE_metadata_kind
+from pdnskeyroller.daemon import Daemon
+from pdnskeyroller.domainconfig import DomainConfig
+from pdnskeyroller.domainstate import DomainState
+from pdnskeyroller.keyrollerdomain import KeyrollerDomain
+from tests.support.clock import VirtualClock
+from tests.support.mockserver import MockPDNSApi
+
+
+class FailingApi(MockPDNSApi):
+    """
+    Fails to get the cryptokeys and metadata of the zones in ``failing``. Getting the cryptokeys of the zones in
+    ``blocked`` waits for ``release``.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set()
+        self.blocked = set()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def get_cryptokeys(self, zone):
+        if zone in self.blocked:
+            self.entered.set()
+            self.release.wait(10)
+        if zone in self.failing:
+            raise ConnectionError('Connection reset by peer')
+        return super().get_cryptokeys(zone)
+
+    def get_zone_metadata(self, zone, kind=''):
+        if zone in self.failing:
+            raise ConnectionError('Connection reset by peer')
+        return super().get_zone_metadata(zone, kind)
+
+
+class DaemonTestCase(unittest.TestCase):
+    """
+    Runs the daemon against the in-process mock server on a virtual clock
+    """
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2020, 1, 1))
+        clock.set_clock(self.clock)
+        self.addCleanup(clock.set_clock, None)
+
+        self.api = FailingApi()
+        self.mock = self.api.mock
+        self.addCleanup(self.mock.stop)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.configfile = os.path.join(self.tmpdir.name, 'pdns-keyroller.conf')
+        self.write_config()
+
+    def write_config(self, **settings):
+        keyroller = {'workers': 1, 'concurrency': 1, 'retry_interval': 300}
+        keyroller.update(settings)
+        with open(self.configfile, 'w') as f:
+            yaml.safe_dump({'keyroller': keyroller}, f)
+
+    def add_zone(self, name, last_roll=None, **config):
+        zone = self.mock.add_zone(name, records=2, ttl=60)
+        metadata = self.mock.zones[zone].metadata
+        metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [str(DomainConfig(**config))]
+        if last_roll is not None:
+            state = DomainState(last_ksk_roll_datetime=self.clock() - last_roll,
+                                last_zsk_roll_datetime=self.clock() - last_roll)
+            metadata[PDNSKEYROLLER_STATE_metadata_kind] = [str(state)]
+        return zone
+
+    def stored_state(self, zone):
+        return KeyrollerDomain(zone, self.api).state
+
+    def requests(self, method, endpoint):
+        return self.api.metrics.snapshot().get('{} {}'.format(method, endpoint), {}).get('count', 0)
+
+
+class WaitingKSKRollTestCase(DaemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.zone = self.add_zone('example.com', last_roll=datetime.timedelta(days=2), ksk_frequency='1d',
+                                  zsk_frequency=0)
+        self.daemon = Daemon(self.configfile, api=self.api)
+        self.daemon.run()
+        self.assertTrue(self.stored_state(self.zone).current_roll.is_waiting_ds())
+
+    def test_waiting_roll_is_left_alone(self):
+        self.clock.advance(3600)
+        puts = self.requests('PUT', '/zones/{zone}/metadata/{kind}')
+        cryptokeys = self.requests('GET', '/zones/{zone}/cryptokeys')
+        tick = self.daemon.run()
+        self.assertEqual(tick.errors, 0)
+        self.assertEqual(self.requests('PUT', '/zones/{zone}/metadata/{kind}'), puts)
+        self.assertEqual(self.requests('GET', '/zones/{zone}/cryptokeys'), cryptokeys)
+
+    def test_operator_step_is_not_lost(self):
+        self.clock.advance(3600)
+        # pdns-keyroller-ctl roll step, from another process
+        operator = KeyrollerDomain(self.zone, MockPDNSApi(self.mock))
+        self.assertTrue(operator.step(force=True, customttl=60))
+        self.assertEqual(self.stored_state(self.zone).current_roll.current_step, 3)
+
+        # The daemon retries the zone before the TTL passed, this must not revert the step
+        self.daemon.run()
+        self.assertEqual(self.stored_state(self.zone).current_roll.current_step, 3)
+        self.assertEqual(self.daemon._domains[self.zone].state.current_roll.current_step, 3)
+
+        self.clock.advance(60)
+        self.daemon.run()
+        state = self.stored_state(self.zone)
+        self.assertFalse(state.is_rolling)
+        self.assertEqual(state.last_ksk_roll_datetime, self.clock())
+        self.assertEqual(sorted(k.keytype for k in self.api.get_cryptokeys(self.zone)), ['ksk', 'zsk'])
+
+    def test_operator_step_is_reloaded(self):
+        self.clock.advance(3600)
+        KeyrollerDomain(self.zone, MockPDNSApi(self.mock)).step(force=True, customttl=60)
+        # Neither the serial nor the config changed
+        self.daemon.update_config()
+        self.assertEqual(self.daemon._domains[self.zone].state.current_roll.current_step, 3)
+        self.assertEqual(self.daemon.metrics()['next_deadline'], self.clock() + datetime.timedelta(seconds=60))
+
+    def test_step_without_change_is_not_saved(self):
+        keyrollerdomain = KeyrollerDomain(self.zone, self.api)
+        puts = self.requests('PUT', '/zones/{zone}/metadata/{kind}')
+        self.assertFalse(keyrollerdomain.step())
+        self.assertEqual(self.requests('PUT', '/zones/{zone}/metadata/{kind}'), puts)
+
+
+class CachedApiTestCase(DaemonTestCase):
+    """
+    Changes made by others must be seen although the API caches responses
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.api = FailingApi(mock=self.mock, cache_ttl=3600)
+        self.zone = self.add_zone('example.com', last_roll=datetime.timedelta(days=2), ksk_frequency='1d',
+                                  zsk_frequency=0)
+        self.daemon = Daemon(self.configfile, api=self.api)
+        self.daemon.run()
+        # The retry caches the state
+        self.clock.advance(300)
+        self.daemon.run()
+
+    def test_operator_step(self):
+        self.clock.advance(3600)
+        KeyrollerDomain(self.zone, MockPDNSApi(self.mock)).step(force=True, customttl=60)
+        self.daemon.run()
+        self.assertEqual(self.daemon._domains[self.zone].state.current_roll.current_step, 3)
+
+    def test_operator_step_reload(self):
+        self.clock.advance(3600)
+        KeyrollerDomain(self.zone, MockPDNSApi(self.mock)).step(force=True, customttl=60)
+        self.daemon.update_config()
+        self.assertEqual(self.daemon._domains[self.zone].state.current_roll.current_step, 3)
+
+    def test_reconfigured(self):
+        self.daemon.update_config(full=True)
+        self.mock.zones[self.zone].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [
+            str(DomainConfig(ksk_frequency='2d', zsk_frequency=0))]
+        self.daemon.update_config(full=True)
+        self.assertEqual(self.daemon._domains[self.zone].config.ksk_frequency, '2d')
+
+
+class LoadTestCase(DaemonTestCase):
+    """
+    Loading the zones on several workers gives the same result as loading them one by one
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.configured = [self.add_zone('configured{}.example'.format(i), last_roll=datetime.timedelta(days=i))
+                           for i in range(12)]
+        self.unconfigured = [self.mock.add_zone('unconfigured{}.example'.format(i), records=2) for i in range(12)]
+        self.api.failing.update([self.configured[3], self.configured[7], self.unconfigured[5]])
+
+    def load(self, workers):
+        self.write_config(workers=workers)
+        threads = set()
+        get_zone_metadata = self.api.get_zone_metadata
+
+        def record_thread(zone, kind=''):
+            threads.add(threading.current_thread().name)
+            # Long enough for the other workers to pick up zones
+            threading.Event().wait(0.002)
+            return get_zone_metadata(zone, kind)
+
+        self.api.get_zone_metadata = record_thread
+        try:
+            with self.assertLogs('pdnskeyroller.daemon', 'ERROR') as logs:
+                daemon = Daemon(self.configfile, api=self.api)
+        finally:
+            del self.api.get_zone_metadata
+        return daemon, logs.output, threads
+
+    def test_concurrent_load(self):
+        sequential, sequential_errors, threads = self.load(1)
+        self.assertEqual(len(threads), 1)
+        concurrent, concurrent_errors, threads = self.load(4)
+        self.assertGreater(len(threads), 1)
+
+        self.assertEqual(sorted(concurrent._domains), sorted(sequential._domains))
+        self.assertEqual(len(concurrent._domains), 10)
+        for zone, keyrollerdomain in sequential._domains.items():
+            self.assertEqual(str(concurrent._domains[zone].state), str(keyrollerdomain.state))
+            self.assertEqual(str(concurrent._domains[zone].config), str(keyrollerdomain.config))
+        self.assertEqual(concurrent._config_hashes, sequential._config_hashes)
+
+        # Every error is reported once, with its own zone
+        self.assertEqual(sorted(concurrent_errors), sorted(sequential_errors))
+        for zone in (self.configured[3], self.configured[7], self.unconfigured[5]):
+            self.assertEqual(len([line for line in concurrent_errors if 'zone {}:'.format(zone) in line]), 1)
+
+    def test_failed_zones_are_read_on_reload(self):
+        daemon, errors, threads = self.load(4)
+        self.assertEqual(len(errors), 3)
+        self.api.failing.clear()
+        daemon.update_config(full=True)
+        self.assertEqual(sorted(daemon._domains), sorted(self.configured))
+
+
+class ConcurrencyTestCase(DaemonTestCase):
+    def setUp(self):
+        super().setUp()
+        # ZSK rolls every 6 weeks, 'now' is due right away and 'later' in an hour
+        self.now = self.add_zone('now.example', last_roll=datetime.timedelta(weeks=7))
+        self.later = self.add_zone('later.example', last_roll=datetime.timedelta(weeks=6, hours=-1))
+        self.daemon = Daemon(self.configfile, api=self.api)
+
+    def test_per_zone_guard(self):
+        self.api.blocked.add(self.now)
+        acting = threading.Thread(target=self.daemon.run)
+        acting.start()
+        try:
+            self.assertTrue(self.api.entered.wait(10))
+            tick = self.daemon.run()
+        finally:
+            self.api.release.set()
+            acting.join()
+        self.assertEqual((tick.due, tick.skipped, tick.errors), (1, 1, 0))
+        # Acted on once
+        self.assertEqual(len(self.api.get_cryptokeys(self.now)), 3)
+
+    def test_bounded_concurrency(self):
+        due = [self.add_zone('due{}.example'.format(i), last_roll=datetime.timedelta(weeks=7)) for i in range(8)]
+        self.write_config(concurrency=3)
+        daemon = Daemon(self.configfile, api=self.api)
+        self.api.failing.add(due[2])
+
+        lock = threading.Lock()
+        in_flight = [0, 0]
+        get_cryptokeys = self.api.get_cryptokeys
+
+        def slow_get_cryptokeys(zone):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            try:
+                threading.Event().wait(0.01)
+                return get_cryptokeys(zone)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        self.api.get_cryptokeys = slow_get_cryptokeys
+        try:
+            tick = daemon.run()
+        finally:
+            del self.api.get_cryptokeys
+        self.assertEqual(in_flight[1], 3)
+        # The failing zone does not hold up the others
+        self.assertEqual((tick.due, tick.errors, tick.failed), (9, 1, [due[2]]))
+        for zone in [self.now] + due[:2] + due[3:]:
+            self.assertTrue(self.stored_state(zone).is_rolling)
+
+
+if __name__ == '__main__':
+    unittest.main()
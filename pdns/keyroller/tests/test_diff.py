@@ -0,0 +1,99 @@
+import io
+import unittest
+
+from pdnsapi.diff import normalize, fingerprint, diff_rrsets, desired_rrsets, sync_zone
+from pdnsapi.zone import RRSet
+from tests.support.mockserver import MockPDNSApi
+
+ZONEFILE = """$ORIGIN example.com.
+$TTL 3600
+@       IN SOA  ns1 hostmaster 1 10800 3600 604800 3600
+@       IN NS   ns1
+@       IN NS   ns2
+host0   IN A    192.0.2.1
+host1   IN A    192.0.2.2
+www     IN CNAME host0
+v6      IN AAAA 2001:DB8:0:0::1
+"""
+
+
+def rrset(name, rtype, ttl, *contents):
+    return RRSet(name, rtype, ttl, [{'content': c, 'disabled': False} for c in contents])
+
+
+class NormalizeTestCase(unittest.TestCase):
+    def test_addresses(self):
+        self.assertEqual(normalize('AAAA', '2001:DB8:0:0::1'), '2001:db8::1')
+        self.assertEqual(normalize('a', '192.0.2.1'), '192.0.2.1')
+        self.assertEqual(normalize('AAAA', 'garbage'), 'garbage')
+
+    def test_names(self):
+        self.assertEqual(normalize('CNAME', 'WWW.Example.com'), 'www.example.com.')
+        self.assertEqual(normalize('MX', '10  Mail.example.com'), '10 mail.example.com.')
+        self.assertEqual(normalize('SRV', '0 5 5060 sip.example.com'), '0 5 5060 sip.example.com.')
+
+    def test_other_types(self):
+        self.assertEqual(normalize('TXT', '"two  spaces"'), '"two  spaces"')
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(rrset('example.com.', 'AAAA', 60, '2001:DB8::1', '2001:db8::2')),
+                         fingerprint(rrset('example.com.', 'AAAA', 60, '2001:db8::2', '2001:db8::1')))
+        self.assertNotEqual(fingerprint(rrset('example.com.', 'A', 60, '192.0.2.1')),
+                            fingerprint(rrset('example.com.', 'A', 120, '192.0.2.1')))
+
+
+class DiffTestCase(unittest.TestCase):
+    def test_diff(self):
+        live = [rrset('a.example.com.', 'A', 60, '192.0.2.1'), rrset('b.example.com.', 'A', 60, '192.0.2.2'),
+                rrset('c.example.com.', 'CNAME', 60, 'a.example.com.')]
+        desired = [rrset('A.example.com', 'A', 60, '192.0.2.1'), rrset('b.example.com.', 'A', 60, '192.0.2.3'),
+                   rrset('d.example.com.', 'A', 60, '192.0.2.4')]
+        changes = [(change, obj.name if change == 'REPLACE' else obj) for change, obj in diff_rrsets(desired, live)]
+        self.assertEqual(changes, [('REPLACE', 'b.example.com.'), ('REPLACE', 'd.example.com.'),
+                                   ('DELETE', ('c.example.com.', 'CNAME'))])
+
+    def test_zonefile_is_streamed(self):
+        rrsets = desired_rrsets(io.StringIO(ZONEFILE), origin='example.com.')
+        self.assertEqual(next(iter(rrsets)).rtype, 'SOA')
+
+    def test_zonefile_not_adjacent(self):
+        rrsets = desired_rrsets('a 60 IN A 192.0.2.1\nb 60 IN A 192.0.2.2\na 60 IN A 192.0.2.3\n',
+                                origin='example.com.')
+        with self.assertRaises(ValueError):
+            list(rrsets)
+
+
+class SyncZoneTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=2)
+        self.mock_zone = self.api.mock.zones[self.zone]
+
+    def test_sync(self):
+        result = sync_zone(self.api, self.zone, ZONEFILE)
+        # www and v6 are new, the NS RRSet of the mock has the same contents
+        self.assertEqual((result.replaced, result.deleted, result.unchanged), (2, 0, 3))
+        self.assertEqual(len(result.chunks), 1)
+
+        # Nothing is sent again, although the file has relative names and an AAAA in upper case
+        patches = self.api.metrics.snapshot()['PATCH /zones/{zone}']['count']
+        result = sync_zone(self.api, self.zone, ZONEFILE)
+        self.assertEqual((result.replaced, result.deleted, result.unchanged), (0, 0, 5))
+        self.assertEqual(self.api.metrics.snapshot()['PATCH /zones/{zone}']['count'], patches)
+
+    def test_delete(self):
+        result = sync_zone(self.api, self.zone, ZONEFILE.replace('host1   IN A    192.0.2.2\n', ''))
+        self.assertEqual(result.deleted, 1)
+        self.assertNotIn(('host1.example.com.', 'A'), self.mock_zone.rrsets)
+
+    def test_dry_run(self):
+        serial = self.mock_zone.serial
+        result = sync_zone(self.api, self.zone, ZONEFILE, dry_run=True)
+        self.assertEqual(result.replaced, 2)
+        self.assertEqual(result.chunks, [])
+        self.assertEqual(self.mock_zone.serial, serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from pdnsapi.api import PDNSApi
+from pdnsapi.metrics import ApiMetrics, endpoint_template, error_class
+from tests.support.mockserver import MockPDNSServer
+
+
+class MetricsTestCase(unittest.TestCase):
+    def test_endpoint_template(self):
+        self.assertEqual(endpoint_template('/zones/example.com./cryptokeys/5'), '/zones/{zone}/cryptokeys/{id}')
+        self.assertEqual(endpoint_template('/zones/example.com./metadata/X-TEST'), '/zones/{zone}/metadata/{kind}')
+        self.assertEqual(endpoint_template(''), '/')
+
+    def test_error_class(self):
+        self.assertIsNone(error_class(200))
+        self.assertEqual(error_class(404), 'http_4xx')
+        self.assertEqual(error_class(503), 'http_5xx')
+        self.assertEqual(error_class(None, TimeoutError()), 'timeout')
+        self.assertEqual(error_class(None, ConnectionError()), 'connection')
+
+    def test_histogram(self):
+        metrics = ApiMetrics(buckets=(0.1, 1))
+        metrics.observe('get', '/zones', 200, 0.05)
+        metrics.observe('GET', '/zones', 500, 2, error='http_5xx')
+        stats = metrics.snapshot()['GET /zones']
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['errors'], {'http_5xx': 1})
+        self.assertEqual(list(stats['duration_buckets'].values()), [1, 1, 2])
+        self.assertIn('pdnsapi_requests_total{method="GET",endpoint="/zones"} 2', metrics.prometheus())
+
+
+class RequestMetricsTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockPDNSServer()
+        cls.server.start()
+        cls.zone = cls.server.add_zone('example.com', records=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.api = PDNSApi(self.server.apikey, baseurl=self.server.baseurl, validate=False)
+        self.addCleanup(self.api.close)
+
+    def test_requests(self):
+        self.api.get_cryptokeys(self.zone)
+        with self.assertRaises(ConnectionError):
+            self.api.get_cryptokeys('nonexistent.example')
+        stats = self.api.metrics.snapshot()['GET /zones/{zone}/cryptokeys']
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['errors'], {'http_4xx': 1})
+        self.assertGreater(stats['bytes_in'], 0)
+
+    def test_failing_hook(self):
+        # A broken hook must not turn a successful request into a failed one, nor count it twice
+        def hook(**kwargs):
+            raise RuntimeError('broken hook')
+        self.api.metrics.add_hook(hook)
+        with self.assertRaises(RuntimeError):
+            self.api.get_cryptokeys(self.zone)
+        stats = self.api.metrics.snapshot()['GET /zones/{zone}/cryptokeys']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['errors'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
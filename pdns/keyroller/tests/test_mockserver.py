@@ -0,0 +1,155 @@
+import io
+import unittest
+
+from pdnsapi.api import PDNSApi, HTTPStatusError
+from tests.support.mockserver import MockPDNSServer, MockPDNSApi
+
+
+class MockPDNSServerTestCase(unittest.TestCase):
+    """
+    Drives the mock server over HTTP with the real client
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockPDNSServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.zone = self.server.add_zone('{}.example'.format(self.id().rsplit('.', 1)[-1].replace('_', '-')),
+                                         records=20)
+        self.api = PDNSApi(self.server.apikey, baseurl=self.server.baseurl)
+
+    def tearDown(self):
+        self.api.close()
+
+    def test_wrong_apikey(self):
+        with self.assertRaises(ConnectionError):
+            PDNSApi('wrong', baseurl=self.server.baseurl)
+
+    def test_unknown_zone(self):
+        with self.assertRaises(HTTPStatusError) as cm:
+            self.api.get_zone('nonexistent.example')
+        self.assertEqual(cm.exception.status_code, 404)
+        with self.assertRaises(HTTPStatusError) as cm:
+            list(self.api.iter_rrsets('nonexistent.example'))
+        self.assertEqual(cm.exception.status_code, 404)
+
+    def test_zones(self):
+        self.assertIn(self.zone, [zone.id for zone in self.api.get_zones()])
+        zone = self.api.get_zone(self.zone)
+        # SOA, NS and the A records
+        self.assertEqual(len(zone.rrsets), 22)
+        self.assertEqual(sum(1 for _ in self.api.iter_rrsets(self.zone)), 22)
+
+    def test_get_rrset(self):
+        soa = self.api.get_rrset(self.zone, self.zone, 'SOA')
+        self.assertEqual(soa.records[0].content.split(' ')[2], '1')
+        self.assertIsNone(self.api.get_rrset(self.zone, 'nonexistent.' + self.zone, 'A'))
+
+    def test_bump_soa(self):
+        self.api.bump_soa(self.zone, readback=False)
+        self.assertEqual(self.server.zones[self.zone].serial, 2)
+        zone = self.api.bump_soa(self.zone)
+        self.assertEqual(zone.serial, 3)
+
+    def test_patch(self):
+        self.api.patch_rrsets(self.zone, [
+            {'name': 'new.' + self.zone, 'type': 'A', 'ttl': 60, 'changetype': 'REPLACE',
+             'records': [{'content': '192.0.2.1', 'disabled': False}]},
+            {'name': 'host0.' + self.zone, 'type': 'A', 'changetype': 'DELETE'},
+        ])
+        self.assertEqual(self.api.get_rrset(self.zone, 'new.' + self.zone, 'A').ttl, 60)
+        self.assertIsNone(self.api.get_rrset(self.zone, 'host0.' + self.zone, 'A'))
+        # Changes that do not touch the SOA bump the serial
+        self.assertEqual(self.server.zones[self.zone].serial, 2)
+
+    def test_patch_invalid(self):
+        with self.assertRaises(ConnectionError):
+            self.api.patch_rrsets(self.zone, [{'name': self.zone, 'type': 'A', 'changetype': 'BOGUS'}])
+
+    def test_cryptokeys(self):
+        keys = self.api.get_cryptokeys(self.zone)
+        self.assertEqual(sorted(k.keytype for k in keys), ['ksk', 'zsk'])
+        key = self.api.add_cryptokey(self.zone, 'zsk', active=False, algo=13)
+        self.assertFalse(key.active)
+        self.assertTrue(self.api.set_cryptokey_active(self.zone, key.id).active)
+        self.api.delete_cryptokey(self.zone, key.id)
+        self.assertEqual(len(self.api.get_cryptokeys(self.zone)), 2)
+
+    def test_metadata(self):
+        self.api.set_zone_metadata(self.zone, 'X-TEST', 'value')
+        self.assertEqual(self.api.get_zone_metadata(self.zone, 'X-TEST').metadata, ['value'])
+        self.assertEqual([m.kind for m in self.api.get_zone_metadata(self.zone)], ['X-TEST'])
+        self.api.delete_zone_metadata(self.zone, 'X-TEST')
+        self.assertEqual(self.api.get_zone_metadata(self.zone, 'X-TEST').metadata, [])
+
+    def test_export(self):
+        fp = io.StringIO()
+        self.api.export_zone(self.zone, fp)
+        self.assertEqual(len(fp.getvalue().splitlines()), 23)
+
+    def test_search(self):
+        results = self.api.search('host1.' + self.zone)
+        self.assertEqual([r.name for r in results], ['host1.' + self.zone])
+
+    def test_statistics(self):
+        self.assertIn('uptime', self.api.get_statistics())
+
+    def test_flush_cache(self):
+        self.assertEqual(self.api.flush_cache('host1.' + self.zone), 1)
+
+    def test_latency(self):
+        self.server.latency = 0.05
+        try:
+            self.api.get_zone_metadata(self.zone, 'X-TEST')
+        finally:
+            self.server.latency = 0
+        stats = self.api.metrics.snapshot()['GET /zones/{zone}/metadata/{kind}']
+        self.assertGreaterEqual(stats['duration_sum'], 0.05)
+
+
+class MockPDNSApiTestCase(unittest.TestCase):
+    """
+    The in-process client must behave like the real one against the same server
+    """
+
+    def setUp(self):
+        self.api = MockPDNSApi(latency=0.01)
+        self.mock = self.api.mock
+        self.zone = self.mock.add_zone('example.com', records=5)
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def test_requests(self):
+        self.assertEqual([zone.id for zone in self.api.get_zones()], [self.zone])
+        self.assertEqual(len(self.api.get_zone(self.zone).rrsets), 7)
+        self.assertEqual(sum(1 for _ in self.api.iter_rrsets(self.zone)), 7)
+        self.api.bump_soa(self.zone, readback=False)
+        self.assertEqual(self.mock.zones[self.zone].serial, 2)
+        self.assertEqual(self.mock.requests, 5)
+
+    def test_errors(self):
+        with self.assertRaises(ConnectionError):
+            self.api.get_zone('nonexistent.example')
+        with self.assertRaises(ConnectionError):
+            list(self.api.iter_rrsets('nonexistent.example'))
+
+    def test_metrics(self):
+        self.api.get_cryptokeys(self.zone)
+        with self.assertRaises(ConnectionError):
+            self.api.get_zone('nonexistent.example')
+        snapshot = self.api.metrics.snapshot()
+        cryptokeys = snapshot['GET /zones/{zone}/cryptokeys']
+        self.assertEqual(cryptokeys['count'], 1)
+        self.assertAlmostEqual(cryptokeys['duration_sum'], 0.01, places=2)
+        self.assertEqual(snapshot['GET /zones/{zone}']['errors'], {'http_4xx': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
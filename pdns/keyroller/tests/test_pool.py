@@ -0,0 +1,94 @@
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from pdnsapi.api import PDNSApi
+from pdnsapi.pool import PDNSApiPool
+from tests.support.mockserver import MockPDNSServer, MockPDNSApi
+
+
+class PDNSApiPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.primary = MockPDNSApi()
+        self.secondary = MockPDNSApi()
+        self.zone = self.primary.mock.add_zone('example.com', records=2, serial=5)
+        self.secondary.mock.add_zone('example.com', records=2, serial=5)
+        # Same key material, different ids
+        keys = self.primary.mock.zones[self.zone].cryptokeys
+        self.secondary.mock.zones[self.zone].cryptokeys = OrderedDict(
+            (keyid + 100, dict(key, id=keyid + 100)) for keyid, key in keys.items())
+        self.pool = PDNSApiPool(OrderedDict([('primary', self.primary), ('secondary', self.secondary)]))
+        self.addCleanup(self.pool.close)
+
+    def test_apis(self):
+        with self.assertRaises(ValueError):
+            PDNSApiPool([])
+        with self.assertRaises(Exception):
+            PDNSApiPool({'server': object()})
+        self.assertEqual(list(PDNSApiPool([self.primary]).apis), [self.primary._baseurl])
+
+    def test_fan_out(self):
+        results = self.pool.fan_out('get_zone', 'nonexistent.example.')
+        self.assertEqual(list(results), ['primary', 'secondary'])
+        self.assertTrue(all(r.error is not None and r.result is None for r in results.values()))
+        self.assertEqual(list(PDNSApiPool.latencies(results)), ['primary', 'secondary'])
+
+    def test_compare_serials(self):
+        self.assertTrue(self.pool.compare_serials(self.zone)['consistent'])
+        self.primary.bump_soa(self.zone, readback=False)
+        self.primary.bump_soa(self.zone, readback=False)
+        with self.secondary.mock._lock:
+            del self.secondary.mock.zones[self.zone]
+        self.pool.apis['third'] = MockPDNSApi(self.primary.mock)
+        ret = self.pool.compare_serials(self.zone)
+        self.assertEqual(ret['serials'], OrderedDict([('primary', 7), ('secondary', None), ('third', 7)]))
+        self.assertEqual(ret['missing'], ['secondary'])
+        self.assertFalse(ret['consistent'])
+
+    def test_compare_cryptokeys(self):
+        self.assertTrue(self.pool.compare_cryptokeys(self.zone)['consistent'])
+
+    def test_compare_cryptokeys_published(self):
+        key = next(iter(self.primary.mock.zones[self.zone].cryptokeys.values()))
+        self.primary.unpublish_cryptokey(self.zone, key['id'], readback=False)
+        ret = self.pool.compare_cryptokeys(self.zone)
+        self.assertEqual(ret['differing_state'], [key['dnskey']])
+        self.assertFalse(ret['consistent'])
+
+    def test_compare_cryptokeys_missing(self):
+        key = self.primary.add_cryptokey(self.zone, 'zsk')
+        with self.secondary.mock._lock:
+            self.secondary.mock.zones.pop(self.zone)
+        ret = self.pool.compare_cryptokeys(self.zone)
+        self.assertEqual(list(ret['errors']), ['secondary'])
+        self.assertNotIn(key.dnskey, ret['missing']['primary'])
+        self.assertFalse(ret['consistent'])
+
+
+class FromConfigsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MockPDNSServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def test_from_configs(self):
+        configs = OrderedDict((name, {'apikey': self.server.apikey, 'baseurl': self.server.baseurl})
+                              for name in ('a', 'b'))
+        with PDNSApiPool.from_configs(configs) as pool:
+            self.assertEqual(list(pool.apis), ['a', 'b'])
+
+    def test_failure_closes_sessions(self):
+        configs = OrderedDict([
+            ('a', {'apikey': self.server.apikey, 'baseurl': self.server.baseurl}),
+            ('b', {'apikey': 'wrong', 'baseurl': self.server.baseurl}),
+            ('c', {'apikey': self.server.apikey, 'baseurl': self.server.baseurl}),
+        ])
+        closed = []
+        with mock.patch.object(PDNSApi, 'close', autospec=True, side_effect=closed.append):
+            with self.assertRaises(ConnectionError):
+                PDNSApiPool.from_configs(configs)
+        self.assertEqual(len(closed), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import datetime
+import json
+import unittest
+from unittest import mock
+
+from pdnskeyroller import clock
+from pdnskeyroller.prepublishkeyroll import PrePublishKeyRoll
+from tests.support.clock import VirtualClock
+from tests.support.mockserver import MockPDNSApi
+
+
+class HighestTTLTestCase(unittest.TestCase):
+    """
+    The highest TTL of the zone is kept in the roll with the serial it was found at, and only looked up again when the
+    serial changed
+    """
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2020, 1, 1))
+        clock.set_clock(self.clock)
+        self.addCleanup(clock.set_clock, None)
+
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=3, ttl=300)
+        self.roll = PrePublishKeyRoll()
+        self.roll.initiate(self.zone, self.api, 'zsk', 13)
+        self.assertEqual((self.roll.max_ttl, self.roll.max_ttl_serial), (300, self.api.mock.zones[self.zone].serial))
+        self.clock.advance(300)
+        self.scan = mock.patch.object(self.api, 'iter_rrsets', wraps=self.api.iter_rrsets).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_unchanged_zone(self):
+        self.roll.step(self.zone, self.api)
+        self.assertEqual(self.roll.current_step, 2)
+        self.assertEqual(self.roll.current_step_datetime, self.clock() + datetime.timedelta(seconds=300))
+        self.assertEqual(self.scan.call_count, 0)
+
+    def test_stale_summary(self):
+        # Someone else added a record with a higher TTL, which changed the serial
+        MockPDNSApi(self.api.mock).patch_rrsets(self.zone, [{
+            'name': 'slow.' + self.zone, 'type': 'TXT', 'ttl': 7200, 'changetype': 'REPLACE',
+            'records': [{'content': '"slow"', 'disabled': False}]}])
+        self.roll.step(self.zone, self.api)
+        self.assertEqual(self.scan.call_count, 1)
+        # The wait for the next step is based on the new highest TTL
+        self.assertEqual(self.roll.current_step_datetime, self.clock() + datetime.timedelta(seconds=7200))
+        self.assertEqual((self.roll.max_ttl, self.roll.max_ttl_serial), (7200, self.api.mock.zones[self.zone].serial))
+
+    def test_summary_is_stored(self):
+        stored = PrePublishKeyRoll(**json.loads(str(self.roll)))
+        self.assertEqual((stored.max_ttl, stored.max_ttl_serial), (self.roll.max_ttl, self.roll.max_ttl_serial))
+        stored.step(self.zone, self.api)
+        self.assertEqual(self.scan.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import datetime
+import unittest
+
+from pdnskeyroller import PDNSKEYROLLER_CONFIG_metadata_kind
+from pdnskeyroller.daemon import Daemon
+from pdnskeyroller.domainconfig import DomainConfig
+from tests.test_daemon import DaemonTestCase
+
+
+class ReloadTestCase(DaemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.configured = self.add_zone('configured.example', last_roll=datetime.timedelta(days=1))
+        self.unconfigured = self.mock.add_zone('unconfigured.example', records=2)
+        self.daemon = Daemon(self.configfile, api=self.api)
+        self.assertEqual(self.daemon.metrics()['domains'], 1)
+
+    def metadata_reads(self):
+        return self.requests('GET', '/zones/{zone}/metadata')
+
+    def test_unchanged(self):
+        reads = self.metadata_reads()
+        self.daemon.update_config()
+        self.assertEqual(self.metadata_reads(), reads)
+
+    def test_added(self):
+        reads = self.metadata_reads()
+        added = self.add_zone('added.example', last_roll=datetime.timedelta(weeks=7))
+        self.daemon.update_config()
+        self.assertEqual(self.metadata_reads(), reads + 1)
+        self.assertEqual(self.daemon.metrics()['domains'], 2)
+        # Scheduled right away
+        self.assertEqual(self.daemon.metrics()['next_deadline'], self.stored_state(added).last_zsk_roll_datetime +
+                         datetime.timedelta(weeks=6))
+
+    def test_removed(self):
+        with self.mock._lock:
+            del self.mock.zones[self.configured]
+        self.daemon.update_config()
+        self.assertEqual(self.daemon.metrics()['domains'], 0)
+        self.assertEqual(self.daemon.metrics()['scheduled'], 0)
+
+    def test_configured(self):
+        # Setting metadata does not change the serial, only a full reload notices
+        self.mock.zones[self.unconfigured].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [str(DomainConfig())]
+        self.daemon.update_config()
+        self.assertEqual(self.daemon.metrics()['domains'], 1)
+        self.daemon.update_config(full=True)
+        self.assertEqual(self.daemon.metrics()['domains'], 2)
+
+    def test_reconfigured(self):
+        keyrollerdomain = self.daemon._domains[self.configured]
+        state = str(keyrollerdomain.state)
+        self.mock.zones[self.configured].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [
+            str(DomainConfig(zsk_frequency='1w'))]
+        self.mock.zones[self.configured].serial += 1
+        self.daemon.update_config()
+        self.assertIs(self.daemon._domains[self.configured], keyrollerdomain)
+        self.assertEqual(keyrollerdomain.config.zsk_frequency, '1w')
+        self.assertEqual(str(keyrollerdomain.state), state)
+
+    def test_unconfigured(self):
+        del self.mock.zones[self.configured].metadata[PDNSKEYROLLER_CONFIG_metadata_kind]
+        self.mock.zones[self.configured].serial += 1
+        self.daemon.update_config()
+        self.assertEqual(self.daemon.metrics()['domains'], 0)
+
+    def test_failed_zones_are_read_again(self):
+        self.mock.zones[self.configured].serial += 1
+        self.api.failing.add(self.configured)
+        self.daemon.update_config()
+        self.api.failing.clear()
+        reads = self.metadata_reads()
+        self.daemon.update_config()
+        self.assertEqual(self.metadata_reads(), reads + 1)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
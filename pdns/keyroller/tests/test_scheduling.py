@@ -0,0 +1,72 @@
+import datetime
+import unittest
+
+from pdnskeyroller import PDNSKEYROLLER_CONFIG_metadata_kind
+from pdnskeyroller.daemon import Daemon
+from pdnskeyroller.domainconfig import DomainConfig
+from tests.test_daemon import DaemonTestCase
+
+
+class SchedulingTestCase(DaemonTestCase):
+    def setUp(self):
+        super().setUp()
+        # ZSK rolls every 6 weeks, 'now' is due right away and 'later' in an hour
+        self.now = self.add_zone('now.example', last_roll=datetime.timedelta(weeks=7))
+        self.later = self.add_zone('later.example', last_roll=datetime.timedelta(weeks=6, hours=-1))
+        self.daemon = Daemon(self.configfile, api=self.api)
+
+    def last_tick(self):
+        return self.daemon.metrics()['recent_ticks'][-1]
+
+    def test_only_due_zones(self):
+        wait = self.daemon.tick()
+        self.assertEqual(self.last_tick().due, 1)
+        self.assertTrue(self.stored_state(self.now).is_rolling)
+        self.assertFalse(self.stored_state(self.later).is_rolling)
+        # The next step of the started roll waits for the TTL of the zone
+        self.assertEqual(wait, 60)
+
+        self.clock.advance(3600)
+        self.assertEqual(self.daemon.tick(), 60)
+        self.assertEqual(self.last_tick().due, 2)
+        self.assertTrue(self.stored_state(self.later).is_rolling)
+        self.assertEqual(self.daemon.metrics()['ticks'], 2)
+
+    def test_nothing_due(self):
+        self.daemon.tick()
+        self.clock.advance(30)
+        self.assertEqual(self.daemon.tick(), 30)
+        self.assertEqual(self.daemon.metrics()['ticks'], 1)
+
+    def test_retry(self):
+        self.api.failing.add(self.now)
+        self.assertEqual(self.daemon.tick(), 300)
+        self.assertEqual(self.last_tick().failed, [self.now])
+        self.assertEqual(self.daemon.metrics()['scheduled'], 2)
+
+        self.api.failing.clear()
+        self.clock.advance(299)
+        self.daemon.tick()
+        self.assertEqual(self.daemon.metrics()['ticks'], 1)
+        self.clock.advance(1)
+        self.daemon.tick()
+        self.assertEqual(self.last_tick().failed, [])
+        self.assertTrue(self.stored_state(self.now).is_rolling)
+
+    def test_rescheduled_zones(self):
+        self.daemon.tick()
+        # Rolling less often moves the next roll of 'later' two weeks ahead, its entry in an hour is stale
+        self.mock.zones[self.later].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [
+            str(DomainConfig(zsk_frequency='8w'))]
+        self.mock.zones[self.later].serial += 1
+        self.daemon.update_config()
+
+        self.clock.advance(3600)
+        self.daemon.tick()
+        self.assertEqual(self.last_tick().due, 1)
+        self.assertFalse(self.stored_state(self.later).is_rolling)
+        self.assertEqual(self.daemon.metrics()['scheduled'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from pdnsapi import search
+from tests.support.mockserver import MockPDNSApi
+
+
+class NarrowTestCase(unittest.TestCase):
+    def test_narrow(self):
+        self.assertEqual(search.narrow('foo*', 'ab'), ['foo', 'fooa*', 'foob*'])
+        # No prefix to search for on its own
+        self.assertEqual(search.narrow('*', 'ab'), ['a*', 'b*'])
+        self.assertEqual(search.narrow('**', 'ab'), ['*a*', '*b*'])
+        self.assertEqual(search.narrow('foo'), [])
+        self.assertEqual(search.narrow('f*o'), [])
+
+    def test_to_result(self):
+        self.assertEqual(search.to_result({'object_type': 'zone', 'name': 'example.com.', 'zone_id': 'example.com.'}),
+                         search.SearchResult('zone', 'example.com.', 'example.com.', None, None, None, None))
+
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=30)
+        self.names = set('host{}.example.com.'.format(i) for i in range(30))
+
+    def search_data_requests(self):
+        return self.api.metrics.snapshot()['GET /search-data']['count']
+
+    def test_search(self):
+        results = list(self.api.search('HOST1*'))
+        self.assertEqual(set(r.name for r in results),
+                         {'host1.example.com.'} | set('host1{}.example.com.'.format(i) for i in range(10)))
+        self.assertTrue(all(r.object_type == 'record' and r.zone == self.zone and r.type == 'A' for r in results))
+        self.assertEqual(self.search_data_requests(), 1)
+
+    def test_narrowing(self):
+        results = list(self.api.search('host*', page_size=4))
+        self.assertEqual(set(r.name for r in results), self.names)
+        self.assertGreater(self.search_data_requests(), 1)
+
+    def test_deduplication(self):
+        # The narrower searches return the results of the search that hit the page size again
+        results = list(self.api.search('host*', page_size=4))
+        self.assertEqual(len(results), len(set(results)))
+        self.assertEqual(len(results), 30)
+
+    def test_max_results(self):
+        self.assertEqual(len(list(self.api.search('host*', max_results=7))), 7)
+        self.assertEqual(len(list(self.api.search('host*', max_results=7, page_size=4))), 7)
+
+    def test_object_type(self):
+        self.assertEqual([r.object_type for r in self.api.search('example.com*', object_type='zone')], ['zone'])
+        results = list(self.api.search('example.com*', object_type='record'))
+        self.assertEqual(set(r.type for r in results), {'SOA', 'NS'})
+        self.assertEqual(list(self.api.search('*', object_type='comment')), [])
+        with self.assertRaises(ValueError):
+            list(self.api.search('*', object_type='rrset'))
+
+    def test_not_narrowable(self):
+        with self.assertLogs('pdnsapi.api', 'WARNING'):
+            results = list(self.api.search('host?.example.com.', page_size=4))
+        self.assertEqual(len(results), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import struct
+import threading
+import unittest
+
+from pdnsapi import dnswire
+from pdnsapi.serialwatch import SerialWatcher, query_serials
+from tests.support.mockserver import MockPDNSServer, MockPDNSApi
+
+
+class DNSWireTestCase(unittest.TestCase):
+    def test_encode_name(self):
+        self.assertEqual(dnswire.encode_name('example.com.'), b'\x07example\x03com\x00')
+        self.assertEqual(dnswire.encode_name('example.com'), b'\x07example\x03com\x00')
+        self.assertEqual(dnswire.encode_name('.'), b'\x00')
+        with self.assertRaises(ValueError):
+            dnswire.encode_name('{}.example.'.format('a' * 64))
+
+    def test_soa_query(self):
+        query = dnswire.soa_query(0x1234, 'Example.com.')
+        self.assertEqual(query, b'\x12\x34\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00' +
+                         b'\x07Example\x03com\x00\x00\x06\x00\x01')
+
+    def test_parse_soa_response(self):
+        query = dnswire.soa_query(4711, 'example.com.')
+        self.assertEqual(dnswire.parse_soa_response(dnswire.soa_response(query, 2020010100)),
+                         (4711, 'example.com.', dnswire.RCODE_NOERROR, dnswire.FLAG_QR | dnswire.FLAG_AA, 2020010100))
+        qid, qname, rcode, _, serial = dnswire.parse_soa_response(
+            dnswire.soa_response(query, rcode=dnswire.RCODE_REFUSED))
+        self.assertEqual((qid, qname, rcode, serial), (4711, 'example.com.', dnswire.RCODE_REFUSED, None))
+
+    def test_mismatched_id(self):
+        # The id is reported as is, query_serials matches it with the queries in flight
+        response = bytearray(dnswire.soa_response(dnswire.soa_query(1, 'example.com.'), 7))
+        struct.pack_into('!H', response, 0, 2)
+        self.assertEqual(dnswire.parse_soa_response(bytes(response))[0], 2)
+
+    def test_malformed(self):
+        query = dnswire.soa_query(1, 'example.com.')
+        response = dnswire.soa_response(query, 7)
+        for size in range(len(response)):
+            with self.subTest(size=size):
+                with self.assertRaises(ValueError):
+                    dnswire.parse_soa_response(response[:size])
+        with self.assertRaises(ValueError):
+            # Not a response
+            dnswire.parse_soa_response(query)
+        # A compression pointer to itself
+        loop = response[:12] + b'\xc0\x0c' + response[-len(query) + 12 + 13:]
+        with self.assertRaises(ValueError):
+            dnswire.parse_soa_response(loop)
+
+    def test_decode_name(self):
+        data = b'\x07example\x03com\x00\x03www\xc0\x00'
+        self.assertEqual(dnswire.decode_name(data, 0), ('example.com.', 13))
+        self.assertEqual(dnswire.decode_name(data, 13), ('www.example.com.', 19))
+
+
+class QuerySerialsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockPDNSServer(dns_port=0)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.zones = [self.mock.add_zone('zone{}.example'.format(i), records=0, serial=i + 1) for i in range(20)]
+        self.server, self.port = self.mock.dns_address
+
+    def query(self, zones, **kwargs):
+        kwargs.setdefault('timeout', 0.05)
+        return query_serials(zones, self.server, self.port, **kwargs)
+
+    def test_serials(self):
+        stats = {}
+        serials = self.query([zone.upper().rstrip('.') for zone in self.zones], window=4, stats=stats)
+        self.assertEqual(list(serials.items()), [(zone, i + 1) for i, zone in enumerate(self.zones)])
+        self.assertEqual(stats['timeouts'], 0)
+        self.assertGreater(stats['bytes_in'], stats['bytes_out'])
+
+    def test_failures(self):
+        self.mock.dns_drop.add(self.zones[0])
+        stats = {}
+        serials = self.query(self.zones[:2] + ['nonexistent.example.'], retries=1, stats=stats)
+        self.assertEqual(list(serials.values()), [None, 2, None])
+        self.assertEqual(stats['timeouts'], 2)
+
+    def test_empty(self):
+        self.assertEqual(self.query([]), {})
+
+
+class SerialWatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockPDNSServer(dns_port=0)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.api = MockPDNSApi(self.mock)
+        self.zones = [self.mock.add_zone('zone{}.example'.format(i), records=0) for i in range(10)]
+        server, port = self.mock.dns_address
+        self.watcher = SerialWatcher(self.api, self.zones, server=server, port=port, timeout=0.05, retries=0,
+                                     fallback_workers=4)
+
+    def test_changes(self):
+        self.assertEqual(self.watcher.poll().changed, [])
+        self.api.bump_soa(self.zones[3], readback=False)
+        changes = self.watcher.changes()
+        self.assertEqual(list(changes), [self.zones[3]])
+        self.assertEqual(changes[self.zones[3]].serial, 2)
+        self.assertEqual(self.watcher.poll().changed, [])
+
+    def test_failed_zones_keep_their_serial(self):
+        self.watcher.fallback = False
+        self.watcher.poll()
+        self.mock.dns_drop.add(self.zones[0])
+        self.api.bump_soa(self.zones[0], readback=False)
+        result = self.watcher.poll()
+        self.assertEqual(result.failed, [self.zones[0]])
+        self.assertEqual(self.watcher.serials[self.zones[0]], 1)
+        self.mock.dns_drop.clear()
+        self.assertEqual(self.watcher.poll().changed, [self.zones[0]])
+
+    def test_fallback(self):
+        self.watcher.poll()
+        self.mock.dns_drop.update(self.zones)
+        self.api.bump_soa(self.zones[0], readback=False)
+        result = self.watcher.poll()
+        self.assertEqual(result.failed, [])
+        self.assertEqual(result.changed, [self.zones[0]])
+
+    def test_fallback_is_concurrent(self):
+        self.mock.dns_drop.update(self.zones)
+        lock = threading.Lock()
+        in_flight = [0, 0]
+        api_serial = self.watcher._api_serial
+
+        def slow_api_serial(zone):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            try:
+                threading.Event().wait(0.01)
+                return api_serial(zone)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        self.watcher._api_serial = slow_api_serial
+        result = self.watcher.poll()
+        self.assertEqual(list(result.serials.values()), [1] * len(self.zones))
+        self.assertEqual(in_flight[1], 4)
+
+    def test_watch(self):
+        self.watcher.unwatch(self.zones[1:])
+        self.watcher.watch(['New.example'])
+        self.assertEqual(list(self.watcher.serials), [self.zones[0], 'new.example.'])
+
+
+if __name__ == '__main__':
+    unittest.main()
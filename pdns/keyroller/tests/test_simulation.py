@@ -0,0 +1,31 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from tests import simulation
+
+
+class SimulationTestCase(unittest.TestCase):
+    def test_run(self):
+        report = simulation.Simulation(zones=10, zsk_frequency='4d', ksk_frequency='6d', ttl=600, ds_delay='1d',
+                                       concurrency=1, resolution=600).run('10d')
+        self.assertEqual(report.errors, 0)
+        self.assertGreater(report.rolls_completed, 10)
+        self.assertLessEqual(report.rolls_started - report.rolls_completed, report.zones)
+        self.assertEqual(sum(report.requests_per_hour.values()), report.requests)
+
+    def test_ksk_rolls_are_stepped(self):
+        # Without an operator stepping them, KSK rolls never complete
+        report = simulation.Simulation(zones=5, zsk_frequency=0, ksk_frequency='3d', ttl=600, ds_delay='12h',
+                                       spread=False).run('2d')
+        self.assertEqual((report.rolls_started, report.rolls_completed), (5, 5))
+
+    def test_main(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(simulation.main(['--zones', '5', '--duration', '7d', '--zsk-frequency', '2d']), 0)
+        self.assertIn('Simulated 5 zones', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+from pdnskeyroller.snapshot import TTLSummary, ZoneSnapshot
+from tests.support.mockserver import MockPDNSApi
+
+
+class ZoneSnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.mock = self.api.mock
+        self.zone = self.mock.add_zone('example.com', records=3, serial=10, ttl=300)
+        self.mock.zones[self.zone].rrsets[('slow.example.com.', 'TXT')] = (7200, ['"slow"'])
+        self.snapshot = ZoneSnapshot(self.zone, self.api)
+        self.scan = mock.patch.object(self.api, 'iter_rrsets', wraps=self.api.iter_rrsets).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_scan(self):
+        self.assertEqual(self.snapshot.ttl_summary, TTLSummary(10, 7200))
+        self.assertEqual(self.snapshot.max_ttl, 7200)
+        self.assertEqual(self.scan.call_count, 1)
+        # The SOA came with the scan
+        requests = self.mock.requests
+        self.assertEqual(self.snapshot.serial, 10)
+        self.assertEqual(self.mock.requests, requests)
+
+    def test_unchanged_serial(self):
+        self.snapshot.remember_ttl(10, 5000)
+        self.assertEqual(self.snapshot.max_ttl, 5000)
+        self.assertEqual(self.scan.call_count, 0)
+
+    def test_changed_serial(self):
+        self.snapshot.remember_ttl(9, 5000)
+        self.assertEqual(self.snapshot.ttl_summary, TTLSummary(10, 7200))
+        self.assertEqual(self.scan.call_count, 1)
+
+    def test_remember_after_scan(self):
+        self.snapshot.max_ttl
+        self.snapshot.remember_ttl(10, 1)
+        self.assertEqual(self.snapshot.max_ttl, 7200)
+
+    def test_bump(self):
+        self.snapshot.max_ttl
+        self.snapshot.bump_soa()
+        self.assertEqual(self.mock.zones[self.zone].serial, 11)
+        # The summary follows the bump without another scan, the SOA is read again
+        self.assertEqual(self.snapshot.ttl_summary, TTLSummary(11, 7200))
+        self.assertEqual(self.scan.call_count, 1)
+        self.assertEqual(self.snapshot.serial, 11)
+
+    def test_bump_uses_the_sent_serial(self):
+        # The serial is not necessarily the old one plus one, e.g. with date based serials
+        bump_soa = self.api.bump_soa
+
+        def date_serial(zone, serial=None, readback=True, soa=None):
+            return bump_soa(zone, serial='2020010100', readback=readback, soa=soa)
+
+        self.snapshot.remember_ttl(10, 5000)
+        self.snapshot.max_ttl
+        with mock.patch.object(self.api, 'bump_soa', side_effect=date_serial):
+            self.snapshot.bump_soa()
+        self.assertEqual(self.snapshot.ttl_summary, TTLSummary(2020010100, 5000))
+        self.assertEqual(self.snapshot.serial, 2020010100)
+        self.assertEqual(self.scan.call_count, 0)
+
+    def test_bump_without_summary(self):
+        self.snapshot.bump_soa()
+        self.assertEqual(self.snapshot.ttl_summary, TTLSummary(11, 7200))
+        self.assertEqual(self.scan.call_count, 1)
+
+    def test_cryptokeys(self):
+        self.assertEqual([k.keytype for k in self.snapshot.cryptokeys], ['ksk', 'zsk'])
+        self.assertEqual(len(self.snapshot.keys_of_type('ZSK')), 1)
+        with self.assertRaises(Exception):
+            self.snapshot.keys_of_type('xsk')
+        requests = self.mock.requests
+        self.snapshot.cryptokeys
+        self.assertEqual(self.mock.requests, requests)
+        new_key = self.snapshot.add_cryptokey('zsk', active=False, algo=13)
+        self.assertEqual([k.id for k in self.snapshot.keys_of_type('zsk')][-1], new_key.id)
+        self.snapshot.delete_cryptokey(new_key.id)
+        self.assertEqual(len(self.snapshot.keys_of_type('zsk')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
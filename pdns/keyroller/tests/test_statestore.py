@@ -0,0 +1,164 @@
+import os
+import datetime
+import sqlite3
+import tempfile
+import unittest
+
+from pdnskeyroller import PDNSKEYROLLER_CONFIG_metadata_kind, PDNSKEYROLLER_STATE_metadata_kind
+from pdnskeyroller.daemon import Daemon
+from pdnskeyroller.domainconfig import DomainConfig
+from pdnskeyroller.statestore import StateStore, StoredZone, config_hash
+from tests.support.mockserver import MockPDNSApi
+from tests.test_daemon import DaemonTestCase
+
+
+class StateStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, 'state.sqlite')
+        self.store = StateStore(self.path)
+        self.addCleanup(self.store.close)
+
+    def test_zones(self):
+        config = str(DomainConfig())
+        when = datetime.datetime(2020, 1, 1)
+        self.store.put_zones([StoredZone('a.example.', 1, config_hash([config]), config, None, when),
+                              StoredZone('b.example.', 7, None, None, None, None)])
+        self.assertEqual(self.store.get('a.example.').next_action, when)
+        self.assertEqual(set(self.store.zones()), {'a.example.', 'b.example.'})
+        self.assertIsNone(self.store.get('c.example.'))
+
+        self.store.set_serials({'b.example.': 8})
+        self.assertEqual(self.store.get('b.example.').serial, 8)
+        self.store.forget(['b.example.'])
+        self.assertEqual(set(self.store.zones()), {'a.example.'})
+
+    def test_config_clears_serial(self):
+        self.store.put_zones([StoredZone('a.example.', 1, None, None, None, None)])
+        self.store.put_config('a.example.', str(DomainConfig()))
+        row = self.store.get('a.example.')
+        self.assertIsNone(row.serial)
+        self.assertEqual(row.config_hash, config_hash([str(DomainConfig())]))
+
+    def test_due(self):
+        start = datetime.datetime(2020, 1, 1)
+        self.store.put_zones([StoredZone('a.example.', 1, None, None, None, None)])
+        self.store.put_state('b.example.', '{}')
+        self.store.put_state('c.example.', '{}')
+        self.store.set_next_actions({'a.example.': start + datetime.timedelta(hours=2),
+                                     'b.example.': start + datetime.timedelta(hours=1),
+                                     'c.example.': None})
+        self.assertEqual(self.store.due(start), [])
+        self.assertEqual([zone for zone, _ in self.store.due(start + datetime.timedelta(hours=2))],
+                         ['b.example.', 'a.example.'])
+
+    def test_schema_version(self):
+        self.store.close()
+        with sqlite3.connect(self.path) as conn:
+            conn.execute('PRAGMA user_version = 99')
+        with self.assertRaises(ValueError):
+            StateStore(self.path)
+
+
+class RestoreTestCase(DaemonTestCase):
+    """
+    A daemon with a store only reads the zones that changed since the previous daemon stopped
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.write_config(state_db=os.path.join(self.tmpdir.name, 'state.sqlite'))
+
+        self.configured = self.add_zone('configured.example', last_roll=datetime.timedelta(weeks=7))
+        self.unconfigured = self.mock.add_zone('unconfigured.example', records=2)
+        self.daemon = Daemon(self.configfile, api=self.api)
+        self.addCleanup(self.daemon._store.close)
+
+    def restart(self, full_load=False):
+        api = MockPDNSApi(self.mock)
+        daemon = Daemon(self.configfile, api=api, full_load=full_load)
+        self.addCleanup(daemon._store.close)
+        reads = api.metrics.snapshot().get('GET /zones/{zone}/metadata', {}).get('count', 0)
+        return daemon, reads
+
+    def test_restore(self):
+        daemon, reads = self.restart()
+        self.assertEqual(reads, 0)
+        self.assertEqual(daemon.metrics()['domains'], 1)
+        self.assertEqual(str(daemon._domains[self.configured].state),
+                         str(self.daemon._domains[self.configured].state))
+
+    def test_write_through(self):
+        self.daemon.run()
+        state = self.mock.zones[self.configured].metadata[PDNSKEYROLLER_STATE_metadata_kind]
+        row = self.daemon._store.get(self.configured)
+        self.assertEqual([row.state], state)
+        self.assertEqual(row.next_action, self.daemon._domains[self.configured].next_action_datetime)
+        self.assertEqual([zone for zone, _ in self.daemon._store.due(row.next_action)], [self.configured])
+
+        # Starting the roll bumped the serial, the zone is read again and agrees with the store
+        daemon, reads = self.restart()
+        self.assertEqual(reads, 1)
+        self.assertEqual(daemon._store.get(self.configured).state, row.state)
+        self.assertTrue(daemon._domains[self.configured].state.is_rolling)
+
+    def test_serial_mismatch(self):
+        # Configured while the daemon was not running
+        self.mock.zones[self.unconfigured].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [str(DomainConfig())]
+        self.mock.zones[self.unconfigured].serial += 1
+        daemon, reads = self.restart()
+        self.assertEqual(reads, 1)
+        self.assertEqual(daemon.metrics()['domains'], 2)
+        self.assertEqual(daemon._store.get(self.unconfigured).serial, 2)
+
+    def test_metadata_without_serial_change(self):
+        # Only noticed on a full reload
+        self.mock.zones[self.unconfigured].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [str(DomainConfig())]
+        daemon, reads = self.restart()
+        self.assertEqual(daemon.metrics()['domains'], 1)
+        daemon.update_config(full=True)
+        self.assertEqual(daemon.metrics()['domains'], 2)
+        self.assertEqual(daemon._store.get(self.unconfigured).config, str(DomainConfig()))
+
+    def test_full_load(self):
+        # A single run does not trust the store, it has no full reload to notice this later
+        self.mock.zones[self.unconfigured].metadata[PDNSKEYROLLER_CONFIG_metadata_kind] = [str(DomainConfig())]
+        daemon, reads = self.restart(full_load=True)
+        self.assertEqual(reads, 2)
+        self.assertEqual(daemon.metrics()['domains'], 2)
+        self.assertEqual(daemon._store.get(self.unconfigured).config, str(DomainConfig()))
+        # The store is still kept up to date for the next run
+        daemon, reads = self.restart()
+        self.assertEqual(reads, 0)
+        self.assertEqual(daemon.metrics()['domains'], 2)
+
+    def test_full_load_forgets_removed_zones(self):
+        with self.mock._lock:
+            del self.mock.zones[self.configured]
+        daemon, reads = self.restart(full_load=True)
+        self.assertIsNone(daemon._store.get(self.configured))
+
+    def test_forget_removed_zones(self):
+        with self.mock._lock:
+            del self.mock.zones[self.configured]
+        daemon, reads = self.restart()
+        self.assertEqual(daemon.metrics()['domains'], 0)
+        self.assertIsNone(daemon._store.get(self.configured))
+
+    def test_forget_on_reload(self):
+        with self.mock._lock:
+            del self.mock.zones[self.configured]
+        self.daemon.update_config()
+        self.assertIsNone(self.daemon._store.get(self.configured))
+        self.assertIsNotNone(self.daemon._store.get(self.unconfigured))
+
+    def test_unreadable_state(self):
+        self.daemon._store.put_state(self.configured, 'not json')
+        daemon, reads = self.restart()
+        self.assertEqual(reads, 1)
+        self.assertEqual(daemon.metrics()['domains'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
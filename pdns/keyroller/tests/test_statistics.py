@@ -0,0 +1,113 @@
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from pdnsapi import statistics
+from pdnsapi.statistics import StatisticsPoller
+from tests.support.mockserver import MockPDNSApi
+
+
+class RatesTestCase(unittest.TestCase):
+    def test_rates(self):
+        previous = {('udp-queries', None): 100, ('response-by-qtype', 'SOA'): 10, ('latency', None): 50}
+        current = {('udp-queries', None): 300, ('response-by-qtype', 'SOA'): 10, ('latency', None): 80,
+                   ('new-counter', None): 5}
+        self.assertEqual(statistics.rates(previous, current, 10),
+                         {('udp-queries', None): 20.0, ('response-by-qtype', 'SOA'): 0.0})
+
+    def test_counter_reset(self):
+        # The server restarted, everything since is the increase
+        self.assertEqual(statistics.rates({('udp-queries', None): 1000}, {('udp-queries', None): 40}, 2),
+                         {('udp-queries', None): 20.0})
+
+    def test_no_time_passed(self):
+        self.assertEqual(statistics.rates({('udp-queries', None): 1}, {('udp-queries', None): 2}, 0), {})
+
+    def test_parse(self):
+        parsed = statistics.parse_statistics([
+            {'type': 'StatisticItem', 'name': 'uptime', 'value': '12'},
+            {'type': 'StatisticItem', 'name': 'security-status', 'value': 'unknown'},
+            {'type': 'MapStatisticItem', 'name': 'response-by-qtype', 'value': [{'name': 'SOA', 'value': '3'}]},
+            {'type': 'RingStatisticItem', 'name': 'queries', 'size': 10, 'value': [{'name': 'a.', 'value': '1.5'}]},
+        ])
+        self.assertEqual(parsed, OrderedDict([('uptime', 12), ('security-status', 'unknown'),
+                                              ('response-by-qtype', {'SOA': 3}), ('queries', [('a.', 1.5)])]))
+        self.assertEqual(statistics.flatten(parsed),
+                         OrderedDict([(('uptime', None), 12), (('security-status', None), 'unknown'),
+                                      (('response-by-qtype', 'SOA'), 3)]))
+
+
+class StatisticsPollerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.apis = OrderedDict((name, MockPDNSApi()) for name in ('primary', 'secondary'))
+        self.poller = StatisticsPoller(self.apis, statistics=['udp-queries', 'latency', 'response-by-qtype'])
+        self.addCleanup(self.poller.pool.close)
+
+    def test_rates(self):
+        self.poller.poll()
+        self.apis['primary'].mock.dns_queries += 50
+        snapshot = self.poller.poll()['primary']
+        self.assertEqual(snapshot.values[('udp-queries', None)], 50)
+        self.assertGreater(snapshot.rates[('udp-queries', None)], 0)
+        self.assertNotIn(('latency', None), snapshot.rates)
+        history = self.poller.history('primary', 'udp-queries')
+        self.assertEqual([sample.value for sample in history], [0, 50])
+        self.assertIsNone(history[0].rate)
+
+    def test_prometheus(self):
+        self.poller.poll()
+        self.poller.poll()
+        lines = self.poller.prometheus().splitlines()
+        self.assertIn('# TYPE pdns_auth_udp_queries counter', lines)
+        self.assertIn('pdns_auth_udp_queries{server="primary"} 0', lines)
+        self.assertIn('# TYPE pdns_auth_latency gauge', lines)
+        self.assertIn('pdns_auth_response_by_qtype{server="secondary",key="SOA"} 0', lines)
+        self.assertIn('pdns_auth_udp_queries_rate{server="secondary"} 0.0', lines)
+        self.assertFalse(any(line.startswith('pdns_auth_latency_rate') for line in lines))
+        self.assertIn('pdns_auth_poll_up{server="primary"} 1', lines)
+        self.assertIn('pdns_auth_poll_errors_total{server="primary"} 0', lines)
+
+    def test_failed_poll_keeps_snapshot(self):
+        self.poller.poll()
+        self.apis['primary'].mock.dns_queries += 50
+        good = self.poller.poll()['primary']
+        with mock.patch.object(self.apis['primary'], 'get_statistics', side_effect=ConnectionError('down')):
+            with self.assertLogs('pdnsapi.statistics', 'WARNING'):
+                failed = self.poller.poll()['primary']
+        self.assertIsNotNone(failed.error)
+        self.assertIs(self.poller.snapshots['primary'], good)
+
+        lines = self.poller.prometheus().splitlines()
+        self.assertIn('pdns_auth_udp_queries{server="primary"} 50', lines)
+        self.assertTrue(any(line.startswith('pdns_auth_udp_queries_rate{server="primary"}') for line in lines))
+        self.assertIn('pdns_auth_poll_up{server="primary"} 0', lines)
+        self.assertIn('pdns_auth_poll_up{server="secondary"} 1', lines)
+        self.assertIn('pdns_auth_poll_errors_total{server="primary"} 1', lines)
+
+        # The rate after the failure covers the time since the last successful poll
+        self.apis['primary'].mock.dns_queries += 50
+        snapshot = self.poller.poll()['primary']
+        self.assertGreater(snapshot.rates[('udp-queries', None)], 0)
+        self.assertIn('pdns_auth_poll_up{server="primary"} 1', self.poller.prometheus().splitlines())
+
+    def test_never_polled(self):
+        with mock.patch.object(self.apis['secondary'], 'get_statistics', side_effect=ConnectionError('down')):
+            with self.assertLogs('pdnsapi.statistics', 'WARNING'):
+                self.poller.poll()
+        lines = self.poller.prometheus().splitlines()
+        self.assertFalse(any('server="secondary"' in line for line in lines if not line.startswith('pdns_auth_poll')))
+        self.assertIn('pdns_auth_poll_up{server="secondary"} 0', lines)
+
+    def test_filter(self):
+        self.poller.filter_threshold = 0
+        self.assertEqual(set(self.poller.poll()['primary'].values),
+                         {('udp-queries', None), ('latency', None), ('response-by-qtype', 'SOA')})
+
+    def test_run(self):
+        self.poller.interval = 0
+        self.poller.run(polls=3)
+        self.assertEqual(len(self.poller.history('secondary', 'udp-queries')), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import io
+import json
+import unittest
+
+from pdnsapi.stream import iter_array
+from tests.support.mockserver import MockPDNSApi
+
+DOCUMENT = ('{"before": -12e3, "rrsets": [1.25, -3e-2, -0.5E+10, 0, 10, {"ttl": -1, "x": [2.5e1]}, "1.5", true, null],'
+            ' "x": 1.25, "y": -7, "z": 6.02E23}')
+
+
+def split(data, *offsets):
+    offsets = (0,) + offsets + (len(data),)
+    return [data[a:b] for a, b in zip(offsets, offsets[1:])]
+
+
+class IterArrayTestCase(unittest.TestCase):
+    def check(self, chunks):
+        expected = json.loads(DOCUMENT)
+        members = {}
+        self.assertEqual(list(iter_array(chunks, 'rrsets', members)), expected.pop('rrsets'))
+        self.assertEqual(members, expected)
+
+    def test_one_chunk(self):
+        self.check([DOCUMENT.encode()])
+
+    def test_split_everywhere(self):
+        data = DOCUMENT.encode()
+        for offset in range(1, len(data)):
+            with self.subTest(offset=offset):
+                self.check(split(data, offset))
+
+    def test_small_chunks(self):
+        data = DOCUMENT.encode()
+        for size in range(1, 8):
+            with self.subTest(size=size):
+                self.check([data[i:i + size] for i in range(0, len(data), size)])
+
+    def test_fraction_in_next_chunk(self):
+        members = {}
+        self.assertEqual(list(iter_array([b'{"rrsets":[],"x":1', b'.', b'25}'], 'rrsets', members)), [])
+        self.assertEqual(members, {'x': 1.25})
+
+    def test_multibyte_split(self):
+        data = '{"rrsets": ["été"]}'.encode()
+        for offset in range(1, len(data)):
+            with self.subTest(offset=offset):
+                self.assertEqual(list(iter_array(split(data, offset), 'rrsets')), ['été'])
+
+    def test_invalid(self):
+        for document in (b'[]', b'{"rrsets": [1 2]}', b'{"rrsets": [1.]}', b'{"rrsets": [1e]}', b'{"rrsets": [1'):
+            with self.subTest(document=document):
+                with self.assertRaises(ValueError):
+                    list(iter_array([document[i:i + 1] for i in range(len(document))], 'rrsets'))
+
+
+class ApiStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=3, ttl=86400)
+        self.api.patch_rrsets(self.zone, [
+            {'name': 'txt.' + self.zone, 'type': 'TXT', 'ttl': 1, 'changetype': 'REPLACE',
+             'records': [{'content': '"-1.5e3 été"', 'disabled': False}]}])
+
+    def test_iter_rrsets(self):
+        expected = [(r.name, r.rtype, r.ttl) for r in self.api.get_zone(self.zone).rrsets]
+        for size in (1, 2, 3, 7):
+            with self.subTest(chunk_size=size):
+                self.assertEqual([(r.name, r.rtype, r.ttl) for r in self.api.iter_rrsets(self.zone, chunk_size=size)],
+                                 expected)
+
+    def test_export_zone(self):
+        expected = io.StringIO()
+        self.api.export_zone(self.zone, expected)
+        self.assertIn('été', expected.getvalue())
+        for size in (1, 2, 3, 7):
+            with self.subTest(chunk_size=size):
+                fp = io.StringIO()
+                self.api.export_zone(self.zone, fp, chunk_size=size)
+                self.assertEqual(fp.getvalue(), expected.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import sys
+import unittest
+
+from pdnsapi.zone import Zone, RRSet, Record, Comment
+
+RECORDS = [{'content': '192.0.2.1', 'disabled': False}, {'content': '192.0.2.2', 'disabled': True}]
+COMMENTS = [{'content': 'moved', 'account': 'ops', 'modified_at': 1600000000}]
+
+
+class RRSetTestCase(unittest.TestCase):
+    def rrset(self, **kwargs):
+        return RRSet(''.join(['www.', 'example.com.']), 'A', 60, RECORDS, **kwargs)
+
+    def test_records_are_built_on_access(self):
+        rrset = self.rrset()
+        self.assertIsInstance(rrset._records, tuple)
+        self.assertEqual(rrset.record_contents, ['192.0.2.1', '192.0.2.2'])
+        self.assertEqual(len(rrset), 2)
+        self.assertIsInstance(rrset._records, tuple)
+
+        records = rrset.records
+        self.assertEqual([(r.content, r.disabled) for r in records], [('192.0.2.1', False), ('192.0.2.2', True)])
+        # Built once, changes to the list stick
+        self.assertIs(rrset.records, records)
+        records.append(Record('192.0.2.3', False))
+        self.assertEqual(rrset.record_contents, ['192.0.2.1', '192.0.2.2', '192.0.2.3'])
+
+    def test_comments_are_built_on_access(self):
+        rrset = self.rrset(comments=COMMENTS)
+        self.assertIsInstance(rrset._comments, tuple)
+        comment, = rrset.comments
+        self.assertIsInstance(comment, Comment)
+        self.assertEqual(str(comment), 'moved by ops on 1600000000')
+        self.assertIs(rrset.comments[0], comment)
+
+    def test_objects(self):
+        records = [Record('192.0.2.1', 0)]
+        rrset = RRSet('www.example.com.', 'A', 60, records)
+        self.assertIs(rrset.records, records)
+        self.assertIs(records[0].disabled, False)
+
+    def test_interned(self):
+        rrset = self.rrset()
+        self.assertIs(rrset.name, sys.intern('www.example.com.'))
+        self.assertIs(rrset.rtype, sys.intern('A'))
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.rrset().extra = 1
+        with self.assertRaises(AttributeError):
+            Record('192.0.2.1', False).extra = 1
+
+    def test_invalid(self):
+        with self.assertRaises(Exception):
+            RRSet('www.example.com.', 'A', 60, RECORDS[0])
+        with self.assertRaises(Exception):
+            RRSet('www.example.com.', 'A', 60, [RECORDS[0], Record('192.0.2.2', False)])
+        with self.assertRaises(Exception):
+            RRSet('www.example.com.', 'A', 60, ['192.0.2.1'])
+
+    def test_equality(self):
+        # Like before, objects are only equal to themselves
+        self.assertNotEqual(Record('192.0.2.1', False), Record('192.0.2.1', False))
+        self.assertNotEqual(self.rrset(), self.rrset())
+
+    def test_repr(self):
+        self.assertEqual(repr(self.rrset()), 'RRSet("www.example.com.", "A", 60, [Record("192.0.2.1", "False"), '
+                                             'Record("192.0.2.2", "True")], [])')
+        self.assertEqual(repr(Comment('moved', 1600000000, 'ops')), 'Comment("moved", "1600000000", "ops)')
+
+    def test_str(self):
+        self.assertEqual(str(self.rrset(comments=COMMENTS)),
+                         '; moved by ops on 1600000000\n'
+                         'www.example.com.\tIN\tA\t192.0.2.1\n'
+                         ';www.example.com.\tIN\tA\t192.0.2.2')
+
+
+class ZoneTestCase(unittest.TestCase):
+    def zone(self):
+        return Zone(id='example.com.', name='example.com.', kind='Native', serial=1, unknown='ignored',
+                    rrsets=[{'name': 'www.example.com.', 'type': 'A', 'ttl': 60, 'records': RECORDS}])
+
+    def test_rrsets(self):
+        zone = self.zone()
+        rrset, = zone.rrsets
+        self.assertIsInstance(rrset, RRSet)
+        self.assertEqual(rrset.record_contents, ['192.0.2.1', '192.0.2.2'])
+        # Not shared between zones
+        self.assertEqual(Zone(id='other.').rrsets, [])
+        self.assertIsNot(Zone().rrsets, Zone().rrsets)
+
+    def test_kind(self):
+        self.assertEqual(Zone().kind, '')
+        with self.assertRaises(Exception):
+            Zone(kind='Primary')
+
+    def test_slots(self):
+        zone = self.zone()
+        self.assertFalse(hasattr(zone, 'unknown'))
+        self.assertFalse(hasattr(zone, 'account'))
+        with self.assertRaises(AttributeError):
+            zone.extra = 1
+
+    def test_repr(self):
+        self.assertTrue(repr(self.zone()).startswith('Zone(id="example.com.", name="example.com.", kind="Native", '
+                                                     'serial="1", rrsets="[RRSet('))
+
+    def test_str(self):
+        self.assertEqual(str(self.zone()).splitlines(), [
+            '; id = example.com.', '; name = example.com.', '; kind = Native', '; serial = 1',
+            'www.example.com.\tIN\tA\t192.0.2.1', ';www.example.com.\tIN\tA\t192.0.2.2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
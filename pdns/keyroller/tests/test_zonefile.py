@@ -0,0 +1,82 @@
+import io
+import unittest
+
+from pdnsapi import zonefile
+from tests.support.mockserver import MockPDNSApi
+
+
+class ParserTestCase(unittest.TestCase):
+    def test_records(self):
+        records = list(zonefile.iter_records([
+            '$ORIGIN example.com.',
+            '$TTL 1h',
+            '@ IN SOA ns1 hostmaster ( 1 3h 1h 1w',
+            '    1h ) ; multi-line',
+            'www 60 A 192.0.2.1',
+            '    IN A 192.0.2.2',
+            'mail MX 10 mx.example.net.',
+        ]))
+        self.assertEqual(records, [
+            ('example.com.', 3600, 'SOA', 'ns1.example.com. hostmaster.example.com. 1 10800 3600 604800 3600'),
+            ('www.example.com.', 60, 'A', '192.0.2.1'),
+            ('www.example.com.', 3600, 'A', '192.0.2.2'),
+            ('mail.example.com.', 3600, 'MX', '10 mx.example.net.'),
+        ])
+
+    def test_errors(self):
+        for lines in (['$INCLUDE other'], ['www A'], ['www A ( 192.0.2.1'], ['  A 192.0.2.1']):
+            with self.assertRaises(ValueError, msg=lines):
+                list(zonefile.iter_records(lines))
+
+    def test_rrsets(self):
+        rrsets = list(zonefile.iter_rrsets(['a 60 A 192.0.2.1', 'a 60 A 192.0.2.2', 'b 60 A 192.0.2.3'],
+                                           origin='example.com'))
+        self.assertEqual([(r.name, len(r.records)) for r in rrsets], [('a.example.com.', 2), ('b.example.com.', 1)])
+        with self.assertRaises(ValueError):
+            list(zonefile.iter_rrsets(['a 60 A 192.0.2.1', 'b 60 A 192.0.2.3', 'a 60 A 192.0.2.2']))
+
+
+class ExportImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = MockPDNSApi()
+        self.addCleanup(self.api.mock.stop)
+        self.zone = self.api.mock.add_zone('example.com', records=3)
+        self.mock_zone = self.api.mock.zones[self.zone]
+
+    def test_export_text(self):
+        self.mock_zone.rrsets[('txt.example.com.', 'TXT')] = (60, ['"café ☃"'])
+        fp = io.StringIO()
+        # Every multi-byte character is split over chunks
+        self.api.export_zone(self.zone, fp, chunk_size=1)
+        self.assertIn('"café ☃"', fp.getvalue())
+
+    def test_export_binary(self):
+        fp = io.BytesIO()
+        written = self.api.export_zone(self.zone, fp)
+        self.assertEqual(written, len(fp.getvalue()))
+        self.assertEqual(len(fp.getvalue().splitlines()), 6)
+
+    def test_roundtrip(self):
+        fp = io.StringIO()
+        self.api.export_zone(self.zone, fp)
+        before = dict(self.mock_zone.rrsets)
+        self.api.patch_rrsets(self.zone, [{'name': 'host0.example.com.', 'type': 'A', 'changetype': 'DELETE'}])
+        fp.seek(0)
+        results = self.api.import_zonefile(self.zone, fp, max_changes=2)
+        # SOA, NS and 3 A RRSets
+        self.assertEqual([r.changes for r in results], [2, 2, 1])
+        self.assertEqual(self.mock_zone.rrsets[('host0.example.com.', 'A')], before[('host0.example.com.', 'A')])
+
+    def test_import_failure_raises(self):
+        with self.assertRaises(ConnectionError):
+            self.api.import_zonefile('nonexistent.example.', ['www 60 A 192.0.2.1'], retries=0)
+
+    def test_import_is_not_atomic(self):
+        lines = ['a 60 A 192.0.2.1', 'b 60 A 192.0.2.2', 'a 60 A 192.0.2.3']
+        with self.assertRaises(ValueError):
+            self.api.import_zonefile(self.zone, lines, max_changes=1)
+        self.assertEqual(self.mock_zone.rrsets[('a.example.com.', 'A')], (60, ['192.0.2.1']))
+
+
+if __name__ == '__main__':
+    unittest.main()